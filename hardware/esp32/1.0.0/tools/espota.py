@@ -36,23 +36,77 @@
 # - Incorporated exception handling to catch and handle potential errors.
 # - Made variable names more descriptive for better readability.
 # - Introduced constants for better code maintainability.
+#
+# Changes
+# 2026-10-19:
+# - Added windowed upload (-c chunk size, -w chunks in flight); acks are read
+#   independently of sending instead of one blocking recv per chunk.
+# - Added fleet mode (-F ips or file): concurrent asyncio sessions on ephemeral
+#   ports with a concurrency cap, retry with backoff and a summary table.
+# - The image is mmap'ed once, hashed in 1 MB blocks (MD5 cached by path,
+#   mtime and size) and sent as memoryview slices instead of being read twice.
+# - Added resumable uploads: retries (-R) re-invite with command RESUME + cmd and
+#   the confirmed offset ("<cmd> <port> <size> <md5> <offset>"). A receiver that
+#   kept the partial image answers "OK <offset>" and the upload continues from
+#   there; a stock receiver ignores the command and the full image is sent.
+# - Added delta uploads (--delta): the image last flashed to each device is
+#   cached (espota_delta.py); when a patch is clearly smaller it is offered with
+#   command DELTA + cmd ("<cmd> <port> <patch size> <patch md5> <base md5>
+#   <target md5>"). A receiver running the base answers as usual, one that runs
+#   something else answers "NOBASE", and stock receivers stay silent; in both
+#   cases the full image follows.
+# - Invitations go out from the routed interface and are repeated on a
+#   retransmission timer that adapts to the measured round trip (RFC 6298),
+#   within one TIMEOUT overall instead of ten; the repeats also go out from
+#   the host's other interfaces. Resume and delta probes give up after a few
+#   round trips. The nonce-independent part of the AUTH response is prepared
+#   before inviting.
 
 from __future__ import print_function
+import asyncio
+import collections
 import socket
 import sys
 import os
 import argparse
 import logging
 import hashlib
+import mmap
 import random
+import select
+import time
 
 # Commands
 FLASH = 0
 SPIFFS = 100
 AUTH = 200
+RESUME = 300  # added to FLASH / SPIFFS: invitation carries the offset to continue from
+DELTA = 500  # added to FLASH / SPIFFS: the upload is an espota_delta patch against the running image
 
 # Constants
 PROGRESS_BAR_LENGTH = 60
+PROGRESS = False  # progress bar instead of dots (-r)
+TIMEOUT = 10  # s to wait for the ESP32 to accept the invitation (-t)
+CHUNK_SIZE = 1024
+WINDOW = 1  # chunks in flight; 1 is the classic send/ack lock-step
+DEVICE_READ_MAX = 1460  # ArduinoOTA reads at most one TCP segment per ack
+ACK_STALL = 0.5  # s of ack silence with a full window before sending anyway
+HASH_BLOCK = 1 << 20
+FLEET_JOBS = 8  # devices updated at the same time
+FLEET_RETRIES = 2
+RETRY_BACKOFF = 2.0  # s before the first retry, doubled each time
+INITIAL_RTO = 1.0  # s before the first invitation is repeated, until a round trip was measured
+MIN_RTO = 0.5  # WiFi power save alone can hold a reply for a few hundred ms
+PROBE_RTOS = 3  # round trips an unanswered resume / delta invitation gets before the full image is offered
+
+# MD5 per (path, mtime, size): retries and repeated invitations skip rehashing
+_md5_cache = {}
+
+# UploadSession per (device, image MD5): what a failed attempt got confirmed
+_sessions = {}
+
+# (smoothed RTT, RTT variation) per device, from answered invitations
+_rtt = {}
 
 
 # update_progress(): Displays or updates a console progress bar
@@ -81,7 +135,446 @@ def update_progress(progress):
         sys.stderr.flush()
 
 
-def serve(remote_addr, local_addr, remote_port, local_port, password, filename, command=FLASH):  # noqa: C901
+def auth_prepare(password, filename, content_size, file_md5, remote_addr):
+    """(cnonce, password hash): the part of the AUTH response that does not depend on the device nonce."""
+    # Generate client nonce (cnonce)
+    cnonce_text = "%s%u%s%s" % (filename, content_size, file_md5, remote_addr)
+    cnonce = hashlib.sha256(cnonce_text.encode()).hexdigest()
+
+    # PBKDF2-HMAC-SHA256 challenge/response protocol
+    # The ESP32 stores the password as SHA256 hash, so we need to hash the password first
+    # 1. Hash the password with SHA256 (to match ESP32 storage)
+    return cnonce, hashlib.sha256(password.encode()).hexdigest()
+
+
+def auth_response(password, nonce, filename, content_size, file_md5, remote_addr, prepared=None):
+    """(cnonce, response) answering the device's "AUTH <nonce>" challenge.
+
+    `prepared` is auth_prepare() for the same arguments, computed while waiting for the nonce.
+    """
+    cnonce, password_hash = prepared or auth_prepare(password, filename, content_size, file_md5, remote_addr)
+
+    # 2. Derive key using PBKDF2-HMAC-SHA256 with the password hash
+    salt = nonce + ":" + cnonce
+    derived_key = hashlib.pbkdf2_hmac("sha256", password_hash.encode(), salt.encode(), 10000)
+    derived_key_hex = derived_key.hex()
+
+    # 3. Create challenge response
+    challenge = derived_key_hex + ":" + nonce + ":" + cnonce
+    return cnonce, hashlib.sha256(challenge.encode()).hexdigest()
+
+
+class FirmwareImage(object):
+    """Read-only mmap of an image file; uploads slice it without copying."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        st = os.fstat(self._file.fileno())
+        self.size = st.st_size
+        self.mtime = st.st_mtime
+        # mmap cannot map an empty file
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+
+    def view(self):
+        """A memoryview of the whole image; use it in a with block to release it."""
+        return memoryview(self._map if self._map is not None else b"")
+
+    @property
+    def md5(self):
+        key = (os.path.abspath(self.path), self.mtime, self.size)
+        digest = _md5_cache.get(key)
+        if digest is None:
+            md5 = hashlib.md5()
+            with self.view() as view:
+                for pos in range(0, self.size, HASH_BLOCK):
+                    md5.update(view[pos:pos + HASH_BLOCK])
+            digest = _md5_cache[key] = md5.hexdigest()
+        return digest
+
+    def close(self):
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                pass  # a slice is still referenced (e.g. by a traceback); unmapped when it goes
+            self._map = None
+        self._file.close()
+
+
+class UploadSession(object):
+    """How far one image got on one device, so a retry can resume instead of restarting.
+
+    `offset` is the host's record of confirmed bytes; the device's "OK <offset>"
+    answer to a resume invitation is authoritative.
+    """
+
+    def __init__(self, remote_addr, md5, size):
+        self.remote_addr = remote_addr
+        self.md5 = md5
+        self.size = size
+        self.offset = 0
+
+    @classmethod
+    def get(cls, remote_addr, image):
+        key = (remote_addr, image.md5, image.size)
+        if key not in _sessions:
+            _sessions[key] = cls(remote_addr, image.md5, image.size)
+        return _sessions[key]
+
+    def confirm(self, offset):
+        self.offset = max(0, min(int(offset), self.size))
+
+    def finish(self):
+        _sessions.pop((self.remote_addr, self.md5, self.size), None)
+
+
+def invitation(command, local_port, image, offset=0):
+    if getattr(image, "base_md5", None):
+        return "%d %d %d %s %s %s\n" % (
+            DELTA + command, local_port, image.size, image.md5, image.base_md5, image.target_md5
+        )
+    if offset:
+        return "%d %d %d %s %d\n" % (RESUME + command, local_port, image.size, image.md5, offset)
+    return "%d %d %d %s\n" % (command, local_port, image.size, image.md5)
+
+
+def offers(command, local_port, image, session, delta=None):
+    """(payload, invitation, offset, probe) in the order they are tried: delta, resume, full image.
+
+    Probes are invitations stock firmware ignores; they get InviteTimer.probe_timeout() instead of TIMEOUT.
+    """
+    out = []
+    if delta is not None:
+        out.append((delta, invitation(command, local_port, delta), 0, True))
+    if session.offset:
+        out.append((image, invitation(command, local_port, image, session.offset), session.offset, True))
+    out.append((image, invitation(command, local_port, image), 0, False))
+    return out
+
+
+class InviteTimer(object):
+    """Retransmission timer for invitations to one device (RFC 6298 without the clock granularity term).
+
+    The RTO starts at INITIAL_RTO, follows the smoothed round trip of answered
+    invitations (kept per device for retries and the rest of the fleet run)
+    and doubles on every repeat. Only invitations answered without a repeat
+    are sampled (Karn), as a late answer cannot be matched to its send.
+    """
+
+    def __init__(self, remote_addr):
+        self.remote_addr = remote_addr
+        self.rto = self._rto()
+
+    def _rto(self):
+        if self.remote_addr not in _rtt:
+            return min(INITIAL_RTO, TIMEOUT)
+        srtt, rttvar = _rtt[self.remote_addr]
+        return min(max(srtt + 4 * rttvar, MIN_RTO), TIMEOUT)
+
+    def sample(self, rtt):
+        if self.remote_addr in _rtt:
+            srtt, rttvar = _rtt[self.remote_addr]
+            rttvar = 0.75 * rttvar + 0.25 * abs(srtt - rtt)
+            srtt = 0.875 * srtt + 0.125 * rtt
+        else:
+            srtt, rttvar = rtt, rtt / 2
+        _rtt[self.remote_addr] = (srtt, rttvar)
+        self.rto = self._rto()
+
+    def backoff(self):
+        self.rto = min(self.rto * 2, TIMEOUT)
+
+    def probe_timeout(self):
+        return min(PROBE_RTOS * self.rto, TIMEOUT)
+
+
+def resolve(remote_addr, remote_port):
+    """(ip, port) of the device; raises socket.gaierror if the name does not resolve."""
+    return socket.getaddrinfo(remote_addr, int(remote_port), socket.AF_INET, socket.SOCK_DGRAM)[0][4]
+
+
+def local_addresses(remote_ip, local_addr):
+    """Local IPv4 addresses to invite from: `local_addr` if it is one, else the routed one and the host's others.
+
+    The device answers and connects back to the source of the invitation, so
+    on a host with several interfaces (Ethernet and WiFi, a VPN) the first
+    one that gets an answer wins. The routed address comes first; _invite()
+    only adds the others to its repeats.
+    """
+    if local_addr not in ("", "0.0.0.0"):
+        return [local_addr]
+    found = []
+    probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        probe.connect((remote_ip, 9))  # no packet is sent; picks the source address of the route
+        found.append(probe.getsockname()[0])
+    except OSError:
+        pass
+    finally:
+        probe.close()
+    try:
+        found += socket.gethostbyname_ex(socket.gethostname())[2]
+    except OSError:
+        pass
+    loopback = remote_ip.startswith("127.")
+    out = [a for i, a in enumerate(found) if a not in found[:i] and a.startswith("127.") == loopback]
+    return out or ["0.0.0.0"]
+
+
+def accepted_offset(reply):
+    """None unless the device said "OK"; else where it continues ("OK <offset>" after a resume invitation)."""
+    parts = reply.split()
+    if not parts or parts[0] != "OK":
+        return None
+    return int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
+
+
+class AckCounter(object):
+    """Bytes confirmed by the device, decoded from its ack stream.
+
+    ArduinoOTA answers every read with the number of bytes it wrote, printed
+    in decimal without a separator, and sends "OK" once the image checks out.
+    With several chunks in flight the numbers run together ("14601460512").
+    They are split so each is 1..DEVICE_READ_MAX without a leading zero,
+    preferring the split with the largest total; an overestimate only lets
+    the sender run a little further ahead, which TCP flow control absorbs.
+    The count paces the sender; success is still decided by "OK".
+    """
+
+    LOOKAHEAD = 16  # digits kept undecided so a split can still change
+
+    def __init__(self, max_ack=DEVICE_READ_MAX):
+        self.max_digits = len(str(max_ack))
+        self.max_ack = max_ack
+        self.confirmed = 0
+        self.digits = ""
+        self.ok = False
+        self._tail = ""
+
+    @property
+    def acked(self):
+        return self.confirmed + sum(self._split(self.digits))
+
+    def feed(self, data):
+        text = data.decode("ascii", "replace")
+        if "OK" in self._tail + text:  # "OK" may be split across two reads
+            self.ok = True
+        self._tail = text[-1:]
+        self.digits += "".join(c for c in text if c.isdigit())
+        if len(self.digits) > 2 * self.LOOKAHEAD:
+            keep = len(self.digits) - self.LOOKAHEAD
+            used = 0
+            for n in self._split(self.digits):
+                width = len(str(n))
+                if used + width > keep:
+                    break
+                self.confirmed += n
+                used += width
+            self.digits = self.digits[used:]
+
+    def _split(self, d):
+        # best[i]: (largest total, first number) for a valid split of d[i:]
+        best = [None] * len(d) + [(0, None)]
+        for i in range(len(d) - 1, -1, -1):
+            if d[i] == "0":
+                continue
+            for n in range(1, min(self.max_digits, len(d) - i) + 1):
+                v = int(d[i:i + n])
+                rest = best[i + n]
+                if v <= self.max_ack and rest is not None and (best[i] is None or rest[0] + v > best[i][0]):
+                    best[i] = (rest[0] + v, v)
+        out, i = [], 0
+        while i < len(d):
+            if best[i] is None:  # garbled stream: skip a digit rather than stall
+                i += 1
+                continue
+            out.append(best[i][1])
+            i += len(str(best[i][1]))
+        return out
+
+
+def upload_windowed(connection, view, chunk_size, window, acks, timeout=10, start=0):
+    """Send the image with up to `window` chunks unacknowledged.
+
+    Acks are drained whenever they arrive, so a slow device only stalls the
+    sender once the window is full. If the acks go quiet with a full window
+    (an undercounted ack stream), one more chunk is let through; TCP flow
+    control still bounds what the device has to buffer. Raises socket.timeout
+    when nothing moves for `timeout` seconds and socket.error when the device
+    hangs up. Sending begins at byte `start`; acks count from there.
+    """
+    content_size = len(view)
+    limit = chunk_size * window
+    pending = view[0:0]
+    sent = start
+    stalled = False
+    connection.setblocking(False)
+    try:
+        while sent < content_size:
+            can_send = bool(pending) or stalled or sent - start - min(acks.acked, sent - start) < limit
+            wait = timeout if can_send else min(ACK_STALL, timeout)
+            readable, writable, _ = select.select([connection], [connection] if can_send else [], [], wait)
+            if not readable and not writable:
+                if can_send:
+                    raise socket.timeout("no progress for %d s" % timeout)
+                stalled = True
+                continue
+            if readable:
+                data = connection.recv(4096)
+                if not data:
+                    raise socket.error("connection closed by device")
+                acks.feed(data)
+            if writable:
+                if not pending:
+                    pending = view[sent:sent + chunk_size]
+                n = connection.send(pending)
+                pending = pending[n:]
+                stalled = False
+                sent += n
+                if not pending:
+                    update_progress(sent / float(content_size))
+    finally:
+        pending.release()
+        connection.setblocking(True)
+    return acks.ok
+
+
+def serve(
+    remote_addr,
+    local_addr,
+    remote_port,
+    local_port,
+    password,
+    filename,
+    command=FLASH,
+    chunk_size=CHUNK_SIZE,
+    window=WINDOW,
+    retries=0,
+    delta_cache=None,
+    device_id=None,
+):
+    try:
+        image = FirmwareImage(filename)
+    except (IOError, OSError) as e:
+        logging.error("Cannot read image: %s", str(e))
+        return 1
+    try:
+        session = UploadSession.get(remote_addr, image)
+        device_id = device_id or remote_addr
+        delta = _delta_for(delta_cache, device_id, image)
+        for attempt in range(retries + 1):
+            if attempt:
+                delay = RETRY_BACKOFF * 2 ** (attempt - 1)
+                logging.warning("Retrying in %.0f s (%d of %d bytes confirmed)", delay, session.offset, image.size)
+                time.sleep(delay)
+                local_port = 0  # the old port may still be in TIME_WAIT
+            rc = _serve(
+                remote_addr,
+                local_addr,
+                remote_port,
+                local_port,
+                password,
+                image,
+                command,
+                chunk_size,
+                window,
+                session,
+                delta,
+            )
+            if rc == 0:
+                session.finish()
+                _record_flashed(delta_cache, device_id, image, command)
+                return 0
+        return rc
+    finally:
+        image.close()
+
+
+def _delta_for(delta_cache, device_id, image):
+    if delta_cache is None:
+        return None
+    import espota_delta
+
+    try:
+        delta = espota_delta.delta_for(delta_cache, device_id, image)
+    except (IOError, OSError, ValueError) as e:
+        logging.warning("No delta for %s: %s", device_id, str(e))
+        return None
+    if delta is not None:
+        logging.info("Delta for %s: %d bytes instead of %d", device_id, delta.size, image.size)
+    return delta
+
+
+def _record_flashed(delta_cache, device_id, image, command):
+    if delta_cache is None or command != FLASH:
+        return
+    try:
+        delta_cache.record(device_id, image.path, image.md5)
+    except (IOError, OSError) as e:
+        logging.warning("Could not cache the image for %s: %s", device_id, str(e))
+
+
+def _invite(message, remote_address, sources, timer, timeout, repeat=True):
+    """Invite from the first source address, repeating on `timer` for up to `timeout` s.
+
+    The repeats go out from every source: ArduinoOTA drops back to idle when
+    a second copy reaches it while it waits for AUTH, so the other interfaces
+    are only tried once the routed one went unanswered.
+    (socket, reply, repeated) for the first answer, or (None, None, repeated);
+    `repeated` tells whether the device may have seen the invitation twice.
+    Raises OSError if it could not be sent from any address.
+    """
+    socks = []
+    try:
+        for addr in sources:
+            sock2 = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            socks.append(sock2)
+            sock2.bind((addr, 0))
+        started = time.time()
+        deadline = started + timeout
+        sends = 0
+        while True:
+            error = None
+            for sock2 in socks[:1] if not sends else list(socks):
+                try:
+                    sock2.sendto(message.encode(), remote_address)
+                except OSError as e:  # interface without a route to the device
+                    error = e
+                    socks.remove(sock2)
+                    sock2.close()
+            if not socks:
+                raise error
+            if error is not None and not sends:
+                continue  # no route from the first address: start with the next one
+            sends += 1
+            now = time.time()
+            wait_until = min(now + timer.rto, deadline) if repeat else deadline
+            while now < wait_until:
+                readable = select.select(socks, [], [], wait_until - now)[0]
+                for sock2 in readable:
+                    try:
+                        data = sock2.recv(69).decode()  # "AUTH " + 64-char SHA256 nonce
+                    except OSError:
+                        continue  # ICMP port unreachable from this interface
+                    if sends == 1:
+                        timer.sample(time.time() - started)
+                    socks.remove(sock2)
+                    return sock2, data, sends > 1
+                now = time.time()
+            if now >= deadline:
+                return None, None, sends > 1
+            timer.backoff()
+            sys.stderr.write(".")
+            sys.stderr.flush()
+    finally:
+        for sock2 in socks:
+            sock2.close()
+
+
+def _serve(  # noqa: C901
+    remote_addr, local_addr, remote_port, local_port, password, image, command, chunk_size, window, session, delta=None
+):
     # Create a TCP/IP socket
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     server_address = (local_addr, local_port)
@@ -89,82 +582,91 @@ def serve(remote_addr, local_addr, remote_port, local_port, password, filename,
     try:
         sock.bind(server_address)
         sock.listen(1)
+        local_port = sock.getsockname()[1]
     except Exception as e:
         logging.error("Listen Failed: %s", str(e))
         return 1
 
-    content_size = os.path.getsize(filename)
-    with open(filename, "rb") as f:
-        file_md5 = hashlib.md5(f.read()).hexdigest()
-    logging.info("Upload size: %d", content_size)
-    message = "%d %d %d %s\n" % (command, local_port, content_size, file_md5)
+    logging.info("Upload size: %d", image.size)
+    if session.offset:
+        logging.info("Offering to resume at %d", session.offset)
 
     # Wait for a connection
-    inv_tries = 0
-    data = ""
     msg = "Sending invitation to %s " % remote_addr
     sys.stderr.write(msg)
     sys.stderr.flush()
-    while inv_tries < 10:
-        inv_tries += 1
-        sock2 = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        remote_address = (remote_addr, int(remote_port))
+    timer = InviteTimer(remote_addr)
+    try:
+        remote_address = resolve(remote_addr, remote_port)
+        sources = local_addresses(remote_address[0], local_addr)
+    except OSError:
+        sys.stderr.write("failed\n")
+        sys.stderr.flush()
+        logging.error("Host %s Not Found", remote_addr)
+        return 1
+    for payload, message, resume_at, probe in offers(command, local_port, image, session, delta):
+        prepared = auth_prepare(password, payload.path, payload.size, payload.md5, remote_addr)
         try:
-            sent = sock2.sendto(message.encode(), remote_address)  # noqa: F841
-        except:  # noqa: E722
+            sock2, data, repeated = _invite(
+                message, remote_address, sources, timer, timer.probe_timeout() if probe else TIMEOUT
+            )
+        except OSError:
             sys.stderr.write("failed\n")
             sys.stderr.flush()
-            sock2.close()
             logging.error("Host %s Not Found", remote_addr)
             return 1
-        sock2.settimeout(TIMEOUT)
-        try:
-            data = sock2.recv(69).decode()  # "AUTH " + 64-char SHA256 nonce
+        if data is not None and not data.startswith("NOBASE"):
             break
-        except:  # noqa: E722
-            sys.stderr.write(".")
-            sys.stderr.flush()
+        if sock2 is not None:
             sock2.close()
+        data = None
+        if payload is not image:
+            logging.info("Device does not take the delta, sending the full image")
+        elif resume_at:
+            logging.info("No resume support, sending the full image")
+            session.confirm(0)
     sys.stderr.write("\n")
     sys.stderr.flush()
-    if inv_tries == 10:
+    filename = payload.path
+    content_size = payload.size
+    file_md5 = payload.md5
+    if data is None:
         logging.error("No response from the ESP")
         return 1
-    if data != "OK":
+    if accepted_offset(data) is None:
         if data.startswith("AUTH"):
-            nonce = data.split()[1]
-
-            # Generate client nonce (cnonce)
-            cnonce_text = "%s%u%s%s" % (filename, content_size, file_md5, remote_addr)
-            cnonce = hashlib.sha256(cnonce_text.encode()).hexdigest()
-
-            # PBKDF2-HMAC-SHA256 challenge/response protocol
-            # The ESP32 stores the password as SHA256 hash, so we need to hash the password first
-            # 1. Hash the password with SHA256 (to match ESP32 storage)
-            password_hash = hashlib.sha256(password.encode()).hexdigest()
-
-            # 2. Derive key using PBKDF2-HMAC-SHA256 with the password hash
-            salt = nonce + ":" + cnonce
-            derived_key = hashlib.pbkdf2_hmac("sha256", password_hash.encode(), salt.encode(), 10000)
-            derived_key_hex = derived_key.hex()
-
-            # 3. Create challenge response
-            challenge = derived_key_hex + ":" + nonce + ":" + cnonce
-            response = hashlib.sha256(challenge.encode()).hexdigest()
-
             sys.stderr.write("Authenticating...")
             sys.stderr.flush()
-            message = "%d %s %s\n" % (AUTH, cnonce, response)
-            sock2.sendto(message.encode(), remote_address)
-            sock2.settimeout(10)
-            try:
-                data = sock2.recv(64).decode()  # SHA256 produces 64 character response
-            except:  # noqa: E722
+            while True:
+                nonce = data.split()[1]
+                cnonce, response = auth_response(
+                    password, nonce, filename, content_size, file_md5, remote_addr, prepared
+                )
+                auth = "%d %s %s\n" % (AUTH, cnonce, response)
+                sock2.sendto(auth.encode(), remote_address)
+                # after a repeated invitation a reset device never answers: give it a few round trips, not 10 s
+                sock2.settimeout(timer.probe_timeout() if repeated else 10)
+                try:
+                    data = sock2.recv(64).decode()  # SHA256 produces 64 character response
+                except:  # noqa: E722
+                    data = None
+                if not repeated or (data is not None and accepted_offset(data) is not None):
+                    break
+                # ArduinoOTA drops back to idle when an invitation arrives while it waits for AUTH, and a
+                # later copy gets a new nonce: invite once more, from the answered address and without repeats
+                logging.info("Device may have seen the invitation twice, inviting again")
+                source = sock2.getsockname()[0]
+                sock2.close()
+                sock2, data, repeated = _invite(message, remote_address, [source], timer, TIMEOUT, repeat=False)
+                if data is None or not data.startswith("AUTH"):
+                    break
+            if data is None:
                 sys.stderr.write("FAIL\n")
                 logging.error("No Answer to our Authentication")
-                sock2.close()
+                if sock2 is not None:
+                    sock2.close()
                 return 1
-            if data != "OK":
+            if accepted_offset(data) is None:
                 sys.stderr.write("FAIL\n")
                 logging.error("%s", data)
                 sock2.close()
@@ -176,6 +678,11 @@ def serve(remote_addr, local_addr, remote_port, local_port, password, filename,
             sock2.close()
             return 1
     sock2.close()
+    start = min(accepted_offset(data), content_size) if resume_at else 0
+    if payload is not image:
+        logging.info("Sending delta (%d bytes)", content_size)
+    if start:
+        logging.info("Resuming at %d", start)
 
     logging.info("Waiting for device...")
 
@@ -190,27 +697,42 @@ def serve(remote_addr, local_addr, remote_port, local_port, password, filename,
         return 1
 
     try:
-        with open(filename, "rb") as f:
+        with payload.view() as view:
             if PROGRESS:
                 update_progress(0)
             else:
                 sys.stderr.write("Uploading")
                 sys.stderr.flush()
-            offset = 0
-            while True:
-                chunk = f.read(1024)
-                if not chunk:
-                    break
+            acks = AckCounter()
+            last_response_contained_ok = False
+            if window > 1:
+                try:
+                    last_response_contained_ok = upload_windowed(
+                        connection, view, chunk_size, window, acks, start=start
+                    )
+                except Exception as e:
+                    sys.stderr.write("\n")
+                    logging.error("Error Uploading: %s", str(e))
+                    if payload is image:
+                        session.confirm(start + acks.acked)
+                    connection.close()
+                    return 1
+            offset = start
+            while window <= 1 and offset < content_size:
+                chunk = view[offset:offset + chunk_size]
                 offset += len(chunk)
                 update_progress(offset / float(content_size))
                 connection.settimeout(10)
                 try:
                     connection.sendall(chunk)
                     res = connection.recv(10)
+                    acks.feed(res)
                     last_response_contained_ok = "OK" in res.decode()
                 except Exception as e:
                     sys.stderr.write("\n")
                     logging.error("Error Uploading: %s", str(e))
+                    if payload is image:
+                        session.confirm(start + acks.acked)
                     connection.close()
                     return 1
 
@@ -223,16 +745,21 @@ def serve(remote_addr, local_addr, remote_port, local_port, password, filename,
             logging.info("Waiting for result...")
             count = 0
             while count < 5:
-                count += 1
                 connection.settimeout(60)
                 try:
-                    data = connection.recv(32).decode()
+                    acked = acks.acked
+                    res = connection.recv(32)
+                    acks.feed(res)
+                    data = res.decode()
                     logging.info("Result: %s", data)
 
-                    if "OK" in data:
+                    if acks.ok:
                         logging.info("Success")
                         connection.close()
                         return 0
+                    # Late acks from a full window do not use up the retries
+                    if not res or acks.acked == acked:
+                        count += 1
 
                 except Exception as e:
                     logging.error("Error receiving result: %s", str(e))
@@ -251,6 +778,395 @@ def serve(remote_addr, local_addr, remote_port, local_port, password, filename,
     return 1
 
 
+# ---------------------------------------------------------------------------
+# Fleet mode: the same handshake for many devices at once, on asyncio
+
+
+class OtaError(Exception):
+    """A device refused or dropped an update. `retry` is False when retrying cannot help."""
+
+    def __init__(self, message, retry=True):
+        Exception.__init__(self, message)
+        self.retry = retry
+
+
+FleetResult = collections.namedtuple("FleetResult", "ip ok attempts seconds error")
+
+
+class _InviteProtocol(asyncio.DatagramProtocol):
+    """One local address inviting the device; replies go to a queue shared by all of them."""
+
+    def __init__(self, replies):
+        self.replies = replies
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.replies.put_nowait((self, data.decode("ascii", "replace")))
+
+    def error_received(self, exc):
+        pass  # ICMP noise from an absent device; the reply timeout decides
+
+
+async def _next_reply(replies, endpoints, deadline):
+    """(endpoint, reply) of the next reply to one of `endpoints` before `deadline` (loop time), or (None, None)."""
+    loop = asyncio.get_event_loop()
+    while True:
+        try:
+            invite, data = await asyncio.wait_for(replies.get(), max(deadline - loop.time(), 0))
+        except asyncio.TimeoutError:
+            return None, None
+        if invite in endpoints:
+            return invite, data
+
+
+async def _invite_async(endpoints, replies, message, timer, timeout, repeat=True):
+    """Asyncio counterpart of _invite() over datagram `endpoints`: (endpoint, reply, repeated)."""
+    loop = asyncio.get_event_loop()
+    started = loop.time()
+    deadline = started + timeout
+    sends = 0
+    while True:
+        for invite in endpoints[:1] if not sends else endpoints:
+            invite.transport.sendto(message.encode())
+        sends += 1
+        wait_until = min(loop.time() + timer.rto, deadline) if repeat else deadline
+        invite, data = await _next_reply(replies, endpoints, wait_until)
+        if data is not None:
+            if sends == 1:
+                timer.sample(loop.time() - started)
+            return invite, data, sends > 1
+        if loop.time() >= deadline:
+            return None, None, sends > 1
+        timer.backoff()
+
+
+class FleetProgress(object):
+    """Per-device state; state changes are printed as lines, progress as one status line."""
+
+    def __init__(self, targets):
+        self.targets = list(targets)
+        self.state = dict((ip, "queued") for ip in self.targets)
+        self.percent = {}
+        self._drawn = 0
+        self._last = 0.0
+
+    def event(self, ip, text):
+        self.state[ip] = text
+        self.percent.pop(ip, None)
+        self._clear()
+        sys.stderr.write("%-15s %s\n" % (ip, text))
+        self.draw(force=True)
+
+    def progress(self, ip, fraction):
+        self.percent[ip] = int(fraction * 100)
+        self.draw()
+
+    def draw(self, force=False):
+        if not PROGRESS:
+            return
+        now = time.time()
+        if not force and now - self._last < 0.2:
+            return
+        self._last = now
+        done = sum(1 for s in self.state.values() if s.startswith(("OK", "FAILED")))
+        line = "[%d/%d done] " % (done, len(self.targets))
+        line += "  ".join("%s %d%%" % (ip, p) for ip, p in sorted(self.percent.items()))
+        line = line[:PROGRESS_BAR_LENGTH * 2]
+        self._clear()
+        sys.stderr.write(line)
+        sys.stderr.flush()
+        self._drawn = len(line)
+
+    def close(self):
+        self._clear()
+        sys.stderr.flush()
+
+    def _clear(self):
+        if self._drawn:
+            sys.stderr.write("\r" + " " * self._drawn + "\r")
+            self._drawn = 0
+
+
+async def _upload_async(reader, writer, view, chunk_size, window, acks, on_progress, start=0, timeout=10):
+    """Windowed upload over asyncio streams from byte `start` (window 1 is the classic lock-step)."""
+    content_size = len(view)
+    changed = asyncio.Event()
+
+    async def read_acks():
+        while not acks.ok:
+            data = await reader.read(4096)
+            if not data:
+                break
+            acks.feed(data)
+            changed.set()
+        changed.set()
+
+    ack_task = asyncio.ensure_future(read_acks())
+    try:
+        limit = chunk_size * window
+        sent = start
+        while sent < content_size:
+            while sent - start - min(acks.acked, sent - start) >= limit and not ack_task.done():
+                changed.clear()
+                try:
+                    await asyncio.wait_for(changed.wait(), ACK_STALL)
+                except asyncio.TimeoutError:
+                    break  # acks went quiet with a full window: send anyway (see upload_windowed)
+            if ack_task.done() and not acks.ok:
+                raise OtaError("connection closed by device")
+            chunk = view[sent:sent + chunk_size]
+            writer.write(chunk)
+            await asyncio.wait_for(writer.drain(), timeout)
+            sent += len(chunk)
+            on_progress(sent / float(content_size))
+        try:
+            await asyncio.wait_for(ack_task, 60)
+        except asyncio.TimeoutError:
+            raise OtaError("No result from device")
+        if not acks.ok:
+            raise OtaError("Error response from device")
+    finally:
+        ack_task.cancel()
+
+
+async def serve_async(
+    remote_addr,
+    local_addr,
+    remote_port,
+    password,
+    image,
+    command=FLASH,
+    chunk_size=CHUNK_SIZE,
+    window=WINDOW,
+    on_progress=lambda fraction: None,
+    on_event=lambda text: None,
+    session=None,
+    delta=None,
+):
+    """One invitation/auth/upload session on an ephemeral local port. Raises OtaError on failure.
+
+    A `delta` patch is offered first, then with a `session` that has a
+    confirmed offset a resume; the session is updated with what this attempt
+    got confirmed.
+    """
+    session = session or UploadSession(remote_addr, image.md5, image.size)
+    loop = asyncio.get_event_loop()
+    connected = loop.create_future()
+
+    def on_connect(reader, writer):
+        if connected.done():
+            writer.close()
+        else:
+            connected.set_result((reader, writer))
+
+    server = await asyncio.start_server(on_connect, local_addr, 0)
+    try:
+        local_port = server.sockets[0].getsockname()[1]
+        remote_address = await loop.run_in_executor(None, resolve, remote_addr, remote_port)
+        sources = await loop.run_in_executor(None, local_addresses, remote_address[0], local_addr)
+        replies = asyncio.Queue()
+        endpoints = []
+        try:
+            for addr in sources:
+                try:
+                    _transport, invite = await loop.create_datagram_endpoint(
+                        lambda: _InviteProtocol(replies), local_addr=(addr, 0), remote_addr=remote_address
+                    )
+                except OSError as e:  # interface without a route to the device
+                    error = e
+                else:
+                    endpoints.append(invite)
+            if not endpoints:
+                raise error
+            timer = InviteTimer(remote_addr)
+            on_event("inviting" if not session.offset else "inviting, resume at %d" % session.offset)
+            for payload, message, resume_at, probe in offers(command, local_port, image, session, delta):
+                prepared = auth_prepare(password, payload.path, payload.size, payload.md5, remote_addr)
+                while not replies.empty():
+                    replies.get_nowait()  # late answers to the previous offer
+                invite, data, repeated = await _invite_async(
+                    endpoints, replies, message, timer, timer.probe_timeout() if probe else TIMEOUT
+                )
+                if data is not None and not data.startswith("NOBASE"):
+                    break
+                data = None
+                if payload is not image:
+                    on_event("no delta support, sending the full image")
+                elif resume_at:
+                    on_event("no resume support, sending the full image")
+                    session.confirm(0)
+            if data is None:
+                raise OtaError("No response from the ESP")
+            if data.startswith("AUTH"):
+                on_event("authenticating")
+                while True:
+                    nonce = data.split()[1]
+                    cnonce, response = await loop.run_in_executor(
+                        None, auth_response, password, nonce, payload.path, payload.size, payload.md5, remote_addr,
+                        prepared
+                    )
+                    invite.transport.sendto(("%d %s %s\n" % (AUTH, cnonce, response)).encode())
+                    wait = timer.probe_timeout() if repeated else 10
+                    _invite, data = await _next_reply(replies, [invite], loop.time() + wait)
+                    if not repeated or (data is not None and accepted_offset(data) is not None):
+                        break
+                    # the device may have reset on a repeated invitation (see _serve); once more without repeats
+                    on_event("inviting again")
+                    invite, data, repeated = await _invite_async(
+                        [invite], replies, message, timer, TIMEOUT, repeat=False
+                    )
+                    if data is None or not data.startswith("AUTH"):
+                        break
+                if data is None:
+                    raise OtaError("No Answer to our Authentication")
+                if accepted_offset(data) is None:
+                    raise OtaError("Authentication failed: %s" % data, retry=False)
+            elif accepted_offset(data) is None:
+                raise OtaError("Bad Answer: %s" % data, retry=False)
+        finally:
+            for invite in endpoints:
+                invite.transport.close()
+        start = min(accepted_offset(data), image.size) if resume_at else 0
+
+        try:
+            reader, writer = await asyncio.wait_for(connected, 10)
+        except asyncio.TimeoutError:
+            raise OtaError("No response from device")
+        acks = AckCounter()
+        try:
+            if payload is not image:
+                on_event("uploading delta (%d bytes)" % payload.size)
+            else:
+                on_event("uploading" if not start else "resuming at %d" % start)
+            with payload.view() as view:
+                await _upload_async(reader, writer, view, chunk_size, window, acks, on_progress, start)
+        except BaseException:
+            if payload is image:
+                session.confirm(start + acks.acked)
+            raise
+        finally:
+            writer.close()
+        session.finish()
+    finally:
+        server.close()
+
+
+async def _serve_fleet(
+    targets, local_addr, remote_port, password, image, command, chunk_size, window, jobs, retries, delta_cache
+):
+    board = FleetProgress(targets)
+    slots = asyncio.Semaphore(jobs)
+    loop = asyncio.get_event_loop()
+
+    async def update(ip):
+        start = time.time()
+        session = UploadSession.get(ip, image)
+        for attempt in range(1, retries + 2):
+            async with slots:
+                try:
+                    delta = await loop.run_in_executor(None, _delta_for, delta_cache, ip, image)
+                    await serve_async(
+                        ip,
+                        local_addr,
+                        remote_port,
+                        password,
+                        image,
+                        command,
+                        chunk_size,
+                        window,
+                        on_progress=lambda fraction: board.progress(ip, fraction),
+                        on_event=lambda text: board.event(ip, text),
+                        session=session,
+                        delta=delta,
+                    )
+                    _record_flashed(delta_cache, ip, image, command)
+                    board.event(ip, "OK")
+                    return FleetResult(ip, True, attempt, time.time() - start, "")
+                except (OtaError, OSError, asyncio.TimeoutError) as e:
+                    error = str(e) or e.__class__.__name__
+                    if attempt > retries or not getattr(e, "retry", True):
+                        board.event(ip, "FAILED: %s" % error)
+                        return FleetResult(ip, False, attempt, time.time() - start, error)
+            delay = RETRY_BACKOFF * 2 ** (attempt - 1)
+            board.event(ip, "retry %d in %.0f s (%s)" % (attempt, delay, error))
+            await asyncio.sleep(delay)  # outside the slot, so waiting devices are not held up
+
+    try:
+        return await asyncio.gather(*[update(ip) for ip in targets])
+    finally:
+        board.close()
+
+
+def read_targets(items):
+    """Device IPs from arguments that are addresses, comma lists or files of them (# comments)."""
+    targets = []
+    for item in items:
+        if os.path.isfile(item):
+            with open(item) as f:
+                words = [w for line in f for w in line.split("#", 1)[0].replace(",", " ").split()]
+        else:
+            words = item.replace(",", " ").split()
+        for ip in words:
+            if ip not in targets:
+                targets.append(ip)
+    return targets
+
+
+def format_fleet_summary(results):
+    lines = ["%-15s %-6s %8s %8s  %s" % ("device", "result", "attempts", "time", "error")]
+    for r in results:
+        lines.append("%-15s %-6s %8d %7.1fs  %s" % (r.ip, "OK" if r.ok else "FAILED", r.attempts, r.seconds, r.error))
+    failed = sum(1 for r in results if not r.ok)
+    lines.append("%d updated, %d failed" % (len(results) - failed, failed))
+    return "\n".join(lines)
+
+
+def serve_fleet(
+    targets,
+    local_addr,
+    remote_port,
+    password,
+    filename,
+    command=FLASH,
+    chunk_size=CHUNK_SIZE,
+    window=WINDOW,
+    jobs=FLEET_JOBS,
+    retries=FLEET_RETRIES,
+    delta_cache=None,
+):
+    """Update every device in `targets`; prints a summary and returns 0 only if all succeeded."""
+    try:
+        image = FirmwareImage(filename)
+    except (IOError, OSError) as e:
+        logging.error("Cannot read image: %s", str(e))
+        return 1
+    try:
+        logging.info("Upload size: %d to %d device(s), %d at a time", image.size, len(targets), jobs)
+        image.md5  # hash once up front, shared by every session
+        results = asyncio.run(
+            _serve_fleet(
+                targets,
+                local_addr,
+                remote_port,
+                password,
+                image,
+                command,
+                chunk_size,
+                window,
+                jobs,
+                retries,
+                delta_cache,
+            )
+        )
+    finally:
+        image.close()
+    print(format_fleet_summary(results))
+    return 0 if all(r.ok for r in results) else 1
+
+
 def parse_args(unparsed_args):
     parser = argparse.ArgumentParser(description="Transmit image over the air to the ESP32 module with OTA support.")
 
@@ -304,7 +1220,70 @@ def parse_args(unparsed_args):
         dest="timeout",
         type=int,
         help="Timeout to wait for the ESP32 to accept invitation.",
-        default=10,
+        default=TIMEOUT,
+    )
+
+    # fleet
+    parser.add_argument(
+        "-F",
+        "--fleet",
+        dest="fleet",
+        nargs="+",
+        metavar="IP_OR_FILE",
+        help="Update several devices: IPs, comma lists or files with one IP per line. Host port is chosen per device.",
+        default=None,
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        dest="jobs",
+        type=int,
+        help="Devices updated at the same time in fleet mode. Default: %d" % FLEET_JOBS,
+        default=FLEET_JOBS,
+    )
+    parser.add_argument(
+        "-R",
+        "--retries",
+        dest="retries",
+        type=int,
+        help="Retries per device, with exponential backoff; resumed where the device supports it. "
+        "Default: %d in fleet mode, 0 otherwise" % FLEET_RETRIES,
+        default=None,
+    )
+
+    # delta
+    parser.add_argument(
+        "-D",
+        "--delta",
+        dest="delta",
+        action="store_true",
+        help="Send a patch against the image last flashed to the device when one is cached "
+        "($ESPOTA_CACHE, default ~/.cache/espota).",
+        default=False,
+    )
+    parser.add_argument(
+        "--device_id",
+        dest="device_id",
+        help="Key for the delta cache instead of the IP, e.g. the MAC address.",
+        default=None,
+    )
+
+    # transfer
+    parser.add_argument(
+        "-c",
+        "--chunk_size",
+        dest="chunk_size",
+        type=int,
+        help="Bytes per upload chunk. Default: %d" % CHUNK_SIZE,
+        default=CHUNK_SIZE,
+    )
+    parser.add_argument(
+        "-w",
+        "--window",
+        dest="window",
+        type=int,
+        help="Chunks sent ahead of the device's acks. Default: %d (wait for each ack)" % WINDOW,
+        default=WINDOW,
     )
 
     return parser.parse_args(unparsed_args)
@@ -326,16 +1305,56 @@ def main(args):
     global TIMEOUT
     TIMEOUT = options.timeout
 
-    if not options.esp_ip or not options.image:
+    if not (options.esp_ip or options.fleet) or not options.image:
         logging.critical("Not enough arguments.")
         return 1
+    if options.chunk_size < 1 or options.window < 1:
+        logging.critical("Chunk size and window must be positive.")
+        return 1
 
     command = FLASH
     if options.spiffs:
         command = SPIFFS
 
+    delta_cache = None
+    if options.delta:
+        import espota_delta
+
+        delta_cache = espota_delta.ImageCache()
+
+    if options.fleet:
+        targets = read_targets(options.fleet + ([options.esp_ip] if options.esp_ip else []))
+        retries = FLEET_RETRIES if options.retries is None else options.retries
+        if not targets or options.jobs < 1 or retries < 0:
+            logging.critical("Fleet mode needs at least one device, jobs >= 1 and retries >= 0.")
+            return 1
+        return serve_fleet(
+            targets,
+            options.host_ip,
+            options.esp_port,
+            options.auth,
+            options.image,
+            command,
+            options.chunk_size,
+            options.window,
+            options.jobs,
+            retries,
+            delta_cache,
+        )
+
     return serve(
-        options.esp_ip, options.host_ip, options.esp_port, options.host_port, options.auth, options.image, command
+        options.esp_ip,
+        options.host_ip,
+        options.esp_port,
+        options.host_port,
+        options.auth,
+        options.image,
+        command,
+        options.chunk_size,
+        options.window,
+        options.retries or 0,
+        delta_cache,
+        options.device_id,
     )
 
 
@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+#
+# Delta images for espota.py: a bsdiff-style binary patch format and a local
+# cache of the image last flashed to each device.
+#
+# Patch layout (all integers little endian):
+#   "ESPDIFF1"                    magic
+#   u32 base size, u32 target size
+#   16 bytes base MD5, 16 bytes target MD5
+#   u32 x3                        compressed sizes of the control, diff and extra streams
+#   zlib(control) zlib(diff) zlib(extra)
+#
+# The control stream is a list of varint triples (literal, seek, copy):
+# append `literal` bytes from the extra stream, move the base cursor by the
+# zigzag-encoded `seek`, then append `copy` bytes of base XOR the next `copy`
+# bytes of the diff stream. Copies tolerate short mismatches (relocated
+# pointers, changed constants), which only cost non-zero diff bytes, and
+# zlib squeezes the mostly-zero diff stream. The device needs inflate (the
+# ESP32 ROM has miniz) and its running image as base.
+#
+# use it like:
+# python espota_delta.py diff BASE.bin TARGET.bin PATCH
+# python espota_delta.py apply BASE.bin PATCH OUT.bin
+
+from __future__ import print_function
+import hashlib
+import json
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import zlib
+
+MAGIC = b"ESPDIFF1"
+_HEADER = struct.Struct("<II16s16sIII")
+
+BLOCK = 32  # bytes hashed per base block; shortest copy that is looked up
+MAX_GAP = 8  # mismatching bytes a copy may bridge before it ends
+MIN_SAVING = 0.1  # use a patch only if it is at least this much smaller than the image
+
+CACHE_DIR = os.environ.get("ESPOTA_CACHE") or os.path.join(os.path.expanduser("~"), ".cache", "espota")
+
+
+class PatchError(ValueError):
+    pass
+
+
+def _varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(buf, pos):
+    value = shift = 0
+    while True:
+        if pos >= len(buf):
+            raise PatchError("truncated control stream")
+        byte = buf[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _xor(a, b):
+    n = len(a)
+    return (int.from_bytes(a, "little") ^ int.from_bytes(b, "little")).to_bytes(n, "little")
+
+
+def _common_prefix(a, i, b, j, limit):
+    """Number of equal bytes at a[i:] and b[j:], at most `limit`, by growing/halving slice compares."""
+    n, step = 0, 64
+    while n < limit:
+        s = min(step, limit - n)
+        if a[i + n:i + n + s] == b[j + n:j + n + s]:
+            n += s
+            step = min(step * 2, 1 << 16)
+        elif s == 1:
+            return n
+        else:
+            step = s // 2
+    return limit
+
+
+def _match_length(base, b, target, t):
+    """Length of the copy at (b, t): exact runs joined across gaps of up to MAX_GAP bytes."""
+    limit = min(len(base) - b, len(target) - t)
+    n = 0
+    while True:
+        n += _common_prefix(base, b + n, target, t + n, limit - n)
+        if n >= limit:
+            return limit
+        for gap in range(1, MAX_GAP + 1):
+            k = n + gap
+            if k + BLOCK <= limit and base[b + k:b + k + BLOCK] == target[t + k:t + k + BLOCK]:
+                n = k
+                break
+        else:
+            return n
+
+
+def make_patch(base, target):
+    """Patch turning `base` into `target` (both bytes)."""
+    index = {}
+    for b in range(len(base) - BLOCK, -1, -BLOCK):
+        index[base[b:b + BLOCK]] = b  # lowest offset wins
+    control, diff, extra = bytearray(), [], []
+    old = 0  # where the decoder's base cursor is
+    lit = 0  # first target byte not yet emitted
+    t = 0
+    delta = None  # base - target offset of the last copy; tried first
+    end = len(target) - BLOCK
+    while t <= end:
+        key = target[t:t + BLOCK]
+        b = None
+        if delta is not None and 0 <= t + delta <= len(base) - BLOCK and base[t + delta:t + delta + BLOCK] == key:
+            b = t + delta
+        else:
+            b = index.get(key)
+        if b is None:
+            t += 1
+            continue
+        while t > lit and b > 0 and base[b - 1] == target[t - 1]:
+            t -= 1
+            b -= 1
+        n = _match_length(base, b, target, t)
+        seek = b - old
+        _varint(control, t - lit)
+        _varint(control, (seek << 1) ^ (seek >> 63))  # zigzag
+        _varint(control, n)
+        extra.append(target[lit:t])
+        diff.append(_xor(base[b:b + n], target[t:t + n]))
+        old = b + n
+        delta = b - t
+        t += n
+        lit = t
+    if lit < len(target):
+        for v in (len(target) - lit, 0, 0):
+            _varint(control, v)
+        extra.append(target[lit:])
+    streams = [zlib.compress(bytes(s), 9) for s in (control, b"".join(diff), b"".join(extra))]
+    header = _HEADER.pack(
+        len(base),
+        len(target),
+        hashlib.md5(base).digest(),
+        hashlib.md5(target).digest(),
+        *[len(s) for s in streams]
+    )
+    return MAGIC + header + b"".join(streams)
+
+
+def patch_info(patch):
+    """(base size, target size, base md5 hex, target md5 hex) from a patch header."""
+    if patch[:len(MAGIC)] != MAGIC or len(patch) < len(MAGIC) + _HEADER.size:
+        raise PatchError("not an espota delta patch")
+    base_size, target_size, base_md5, target_md5 = _HEADER.unpack_from(patch, len(MAGIC))[:4]
+    return base_size, target_size, base_md5.hex(), target_md5.hex()
+
+
+def apply_patch(base, patch):
+    """Rebuild the target image; raises PatchError if the base or the result does not match."""
+    base_size, target_size, base_md5, target_md5 = patch_info(patch)
+    if len(base) != base_size or hashlib.md5(base).hexdigest() != base_md5:
+        raise PatchError("patch is for another base image")
+    sizes = _HEADER.unpack_from(patch, len(MAGIC))[4:]
+    pos = len(MAGIC) + _HEADER.size
+    try:
+        streams = []
+        for size in sizes:
+            streams.append(zlib.decompress(patch[pos:pos + size]))
+            pos += size
+    except zlib.error as e:
+        raise PatchError("corrupt patch: %s" % e)
+    control, diff, extra = streams
+    out = bytearray()
+    old = c = d = e = 0
+    while c < len(control):
+        literal, c = _read_varint(control, c)
+        seek, c = _read_varint(control, c)
+        copy, c = _read_varint(control, c)
+        out += extra[e:e + literal]
+        e += literal
+        old += (seek >> 1) ^ -(seek & 1)
+        if old < 0 or old + copy > len(base):
+            raise PatchError("copy outside the base image")
+        out += _xor(base[old:old + copy], diff[d:d + copy])
+        d += copy
+        old += copy
+    if len(out) != target_size or hashlib.md5(out).hexdigest() != target_md5:
+        raise PatchError("patched image does not match the target")
+    return bytes(out)
+
+
+class DeltaPayload(object):
+    """A patch in the shape espota.serve() uploads (path, size, md5, view(), close())."""
+
+    def __init__(self, patch, path):
+        self.patch = patch
+        self.path = path
+        self.size = len(patch)
+        self.md5 = hashlib.md5(patch).hexdigest()
+        _base_size, _target_size, self.base_md5, self.target_md5 = patch_info(patch)
+
+    def view(self):
+        return memoryview(self.patch)
+
+    def close(self):
+        pass
+
+
+class ImageCache(object):
+    """Images last flashed per device, content addressed.
+
+    <root>/images/<md5>.bin holds each image once; <root>/devices.json maps a
+    device key (IP, or MAC when given) to the MD5 it runs. Images no device
+    refers to any more are removed when a device is updated.
+    """
+
+    def __init__(self, root=CACHE_DIR):
+        self.root = root
+        self.images = os.path.join(root, "images")
+        self.index_path = os.path.join(root, "devices.json")
+
+    def _load(self):
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def _image_path(self, md5):
+        return os.path.join(self.images, md5 + ".bin")
+
+    def base_for(self, device):
+        """(md5, bytes) of the image `device` was last flashed with, or None."""
+        md5 = self._load().get(device)
+        if md5 is None:
+            return None
+        try:
+            with open(self._image_path(md5), "rb") as f:
+                data = f.read()
+        except (IOError, OSError):
+            return None
+        return (md5, data) if hashlib.md5(data).hexdigest() == md5 else None
+
+    def record(self, device, path, md5):
+        """Remember that `device` now runs the image at `path` (with `md5`)."""
+        if not os.path.isdir(self.images):
+            os.makedirs(self.images)
+        target = self._image_path(md5)
+        if not os.path.exists(target):
+            fd, tmp = tempfile.mkstemp(dir=self.images)
+            os.close(fd)
+            shutil.copyfile(path, tmp)
+            os.replace(tmp, target)
+        devices = self._load()
+        devices[device] = md5
+        fd, tmp = tempfile.mkstemp(dir=self.root)
+        with os.fdopen(fd, "w") as f:
+            json.dump(devices, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.index_path)
+        used = set(devices.values())
+        for name in os.listdir(self.images):
+            if name.endswith(".bin") and name[:-4] not in used:
+                os.remove(os.path.join(self.images, name))
+
+
+# Patches made in this process, by (base md5, target md5): fleet devices share bases
+_patches = {}
+
+
+def delta_for(cache, device, image):
+    """DeltaPayload updating `device` to `image` (an espota.FirmwareImage), or None to send it whole."""
+    base = cache.base_for(device)
+    if base is None or base[0] == image.md5:
+        return None
+    key = (base[0], image.md5)
+    if key not in _patches:
+        with image.view() as view:
+            patch = make_patch(base[1], bytes(view))
+        _patches[key] = patch if len(patch) <= (1 - MIN_SAVING) * image.size else None
+    if _patches[key] is None:
+        return None
+    return DeltaPayload(_patches[key], image.path + ".patch")
+
+
+def main(args):
+    if len(args) != 4 or args[0] not in ("diff", "apply"):
+        print("usage: espota_delta.py diff BASE TARGET PATCH | apply BASE PATCH OUT", file=sys.stderr)
+        return 2
+    with open(args[1], "rb") as f:
+        base = f.read()
+    with open(args[2], "rb") as f:
+        data = f.read()
+    try:
+        out = make_patch(base, data) if args[0] == "diff" else apply_patch(base, data)
+    except PatchError as e:
+        print("error: %s" % e, file=sys.stderr)
+        return 1
+    with open(args[3], "wb") as f:
+        f.write(out)
+    if args[0] == "diff":
+        print("%d -> %d bytes patch (%.1f%%)" % (len(data), len(out), 100.0 * len(out) / max(1, len(data))))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,443 @@
+#!/usr/bin/env python
+#
+# Stand-in for an ESP32 running ArduinoOTA, for exercising espota.py without
+# hardware, and a throughput benchmark on top of it.
+#
+# The mock follows the device side of the protocol:
+# - listens on UDP for the "<command> <port> <size> <md5>" invitation,
+# - with a password, answers "AUTH <nonce>" and checks the PBKDF2-HMAC-SHA256
+#   response exactly like the ESP32 does,
+# - connects back over TCP, reads at most 1460 bytes at a time and acks every
+#   read with its byte count, then checks the MD5 and sends "OK".
+# Network conditions are simulated on the device side: ack latency, a link
+# bandwidth and random segment loss (each loss stalls the stream for one TCP
+# retransmission timeout). --drop-invites loses that many invitations
+# first; an invitation arriving while AUTH is awaited sends the mock back to
+# idle, as it does the ESP32. --drop-at cuts the first upload after that many
+# bytes. With --resume the mock keeps a partial image and accepts RESUME
+# invitations ("OK <offset>", rounded down to a flash sector); without it,
+# like stock firmware, it ignores them. With --delta it takes DELTA
+# invitations for patches against the image it runs (the last one flashed,
+# or --base), applies them with espota_delta and answers "NOBASE" when it
+# runs something else.
+#
+# use it like:
+# python espota_mock.py serve [-p 3232] [-a password] [--latency 0.01] [--loss 0.01] [--bandwidth 500000]
+#                             [--drop-invites 1] [--resume] [--drop-at 700000] [--delta] [--base running.bin]
+# python espota_mock.py bench [--size 1500000] [--chunks 1024,1460,4096] [--windows 1,4,8,16] [--csv out.csv]
+#                             [-a password] [--sources 127.0.0.1,127.0.0.2]
+#
+# bench runs espota.serve() against the mock for every chunk size / window
+# pair, verifies the received image and exits non-zero if any upload fails,
+# so it can run as a CI step. --sources invites from those local addresses
+# instead of the host's own; as the mock answers at once, an upload whose
+# handshake took a repeated invitation counts as failed too.
+
+from __future__ import print_function
+import argparse
+import csv
+import hashlib
+import logging
+import os
+import random
+import socket
+import sys
+import threading
+import time
+
+import espota
+import espota_delta
+
+# Device constants (ArduinoOTA)
+OTA_PORT = 3232
+READ_BUFFER = 1460
+RTO = 0.2  # s, stall per lost segment (TCP retransmission timeout)
+FLASH_SECTOR = 4096  # resume offsets are rounded down to a written sector
+
+# Benchmark defaults
+BENCH_SIZE = 1500000
+BENCH_CHUNKS = (1024, 1460, 4096)
+BENCH_WINDOWS = (1, 4, 8, 16)
+BENCH_LATENCY = 0.005
+
+
+def expected_auth_response(password, nonce, cnonce):
+    """What the ESP32 computes for its challenge; compare with the host's response."""
+    password_hash = hashlib.sha256(password.encode()).hexdigest()
+    salt = nonce + ":" + cnonce
+    derived_key = hashlib.pbkdf2_hmac("sha256", password_hash.encode(), salt.encode(), 10000)
+    challenge = derived_key.hex() + ":" + nonce + ":" + cnonce
+    return hashlib.sha256(challenge.encode()).hexdigest()
+
+
+class MockDevice(object):
+    """An ArduinoOTA receiver on a background thread.
+
+    After each session `received` holds the image bytes, `command` the
+    invitation command, `resumed_at` the offset it continued from,
+    `delta_size` the patch size (0 for a full upload) and `result` "OK" or
+    the error sent to the host. `running` is the image it would boot.
+    """
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=OTA_PORT,
+        password="",
+        latency=0.0,
+        loss=0.0,
+        bandwidth=None,
+        seed=None,
+        resume=False,
+        drop_at=None,
+        delta=False,
+        running=b"",
+        drop_invites=0,
+    ):
+        self.host = host
+        self.password = password
+        self.latency = latency
+        self.loss = loss
+        self.bandwidth = bandwidth
+        self.resume = resume
+        self.drop_at = drop_at
+        self.delta = delta
+        self.running = running
+        self.drop_invites = drop_invites
+        self.delta_size = 0
+        self.sessions = 0
+        self.received = b""
+        self.command = None
+        self.resumed_at = 0
+        self.result = None
+        self.accepted_at = None
+        self._partial = None  # (md5, size, bytes) of an interrupted upload
+        self._random = random.Random(seed)
+        self._udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._udp.bind((host, port))
+        self.port = self._udp.getsockname()[1]
+        self._done = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="espota-mock", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._udp.close()
+        if self._thread is not None:
+            self._thread.join(1.0)
+
+    def wait(self, timeout=None):
+        """Block until the next session has finished; True if it did in time."""
+        ok = self._done.wait(timeout)
+        self._done.clear()
+        return ok
+
+    def _run(self):
+        while True:
+            try:
+                data, addr = self._udp.recvfrom(256)
+            except OSError:
+                return  # stopped
+            try:
+                self._session(data.decode("ascii", "replace"), addr)
+            except (OSError, ValueError) as e:
+                logging.warning("mock: session from %s failed: %s", addr[0], e)
+            self._done.set()
+
+    def _session(self, invitation, addr):
+        if self.drop_invites:
+            self.drop_invites -= 1
+            return
+        fields = invitation.split()
+        if len(fields) < 4:
+            return  # e.g. an AUTH answer arriving after the mock went idle
+        command, port, size, md5 = fields[:4]
+        command, size = int(command), int(size)
+        offset = None
+        base_md5 = target_md5 = None
+        if command >= espota.DELTA:
+            if not self.delta:
+                return  # stock firmware drops unknown commands
+            command -= espota.DELTA
+            base_md5, target_md5 = fields[4:6]
+            if hashlib.md5(self.running).hexdigest() != base_md5:
+                self.result = "NOBASE"
+                self._udp.sendto(b"NOBASE", addr)
+                return
+        elif command >= espota.RESUME:
+            if not self.resume:
+                return  # stock firmware drops unknown commands
+            command -= espota.RESUME
+            offset = 0
+            if self._partial and self._partial[:2] == (md5, size):
+                offset = min(int(fields[4]), len(self._partial[2])) // FLASH_SECTOR * FLASH_SECTOR
+        self.command = command
+        if self.password:
+            nonce = hashlib.sha256(os.urandom(16)).hexdigest()
+            self._udp.sendto(("AUTH " + nonce).encode(), addr)
+            self._udp.settimeout(10)
+            try:
+                answer, addr = self._udp.recvfrom(256)
+            finally:
+                self._udp.settimeout(None)
+            parts = answer.decode("ascii", "replace").split()
+            if len(parts) != 3 or parts[0] != str(espota.AUTH):
+                logging.info("mock: %r while waiting for AUTH, back to idle", answer)
+                return
+            if parts[2] != expected_auth_response(self.password, nonce, parts[1]):
+                self.result = "Authentication Failed"
+                self._udp.sendto(self.result.encode(), addr)
+                return
+        self._udp.sendto(b"OK" if offset is None else ("OK %d" % offset).encode(), addr)
+        self.accepted_at = time.time()
+        self.sessions += 1
+        self.resumed_at = offset or 0
+        self.delta_size = size if base_md5 else 0
+        image = bytearray(self._partial[2][:offset] if offset else b"")
+        if not base_md5:
+            self._partial = None
+
+        conn = socket.create_connection((addr[0], int(port)), timeout=10)
+        acks = _DelayLine(conn, self.latency)
+        try:
+            self.received = self._receive(conn, acks, size, image)
+            if len(self.received) < size:
+                if not base_md5:
+                    self._partial = (md5, size, self.received)
+                self.result = "Error: connection lost at %d" % len(self.received)
+            elif hashlib.md5(self.received).hexdigest() != md5:
+                self.result = "Error: MD5 Check Failed"
+            else:
+                self.result = "OK"
+                if base_md5:
+                    try:
+                        self.received = espota_delta.apply_patch(self.running, self.received)
+                    except espota_delta.PatchError as e:
+                        self.result = "Error: %s" % e
+                    else:
+                        if hashlib.md5(self.received).hexdigest() != target_md5:
+                            self.result = "Error: MD5 Check Failed"
+                if self.result == "OK" and command == espota.FLASH:
+                    self.running = self.received
+            acks.send(self.result.encode())
+        finally:
+            acks.close()
+
+    def _receive(self, conn, acks, size, image):
+        link_free = time.time()
+        while len(image) < size:
+            if self.drop_at is not None and len(image) >= self.drop_at:
+                self.drop_at = None  # only the first upload is cut
+                break
+            data = conn.recv(min(READ_BUFFER, size - len(image)))
+            if not data:
+                break
+            if self.loss and self._random.random() < self.loss:
+                time.sleep(RTO)
+            if self.bandwidth:
+                # The link delivers at most `bandwidth` bytes/s
+                link_free = max(link_free, time.time()) + len(data) / float(self.bandwidth)
+                delay = link_free - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+            image += data
+            acks.send(str(len(data)).encode())
+        return bytes(image)
+
+
+class _DelayLine(object):
+    """Sends acks `latency` seconds after they are queued, without holding up reads."""
+
+    def __init__(self, conn, latency):
+        self.conn = conn
+        self.latency = latency
+        self._queue = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="espota-mock-acks", daemon=True)
+        self._thread.start()
+
+    def send(self, data):
+        with self._cond:
+            self._queue.append((time.time() + self.latency, data))
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(60)
+        self.conn.close()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                due, data = self._queue.pop(0)
+            delay = due - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                self.conn.sendall(data)
+            except OSError:
+                return
+
+
+def _free_port(host):
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        s.bind((host, 0))
+        return s.getsockname()[1]
+    finally:
+        s.close()
+
+
+def run_benchmark(size, chunks, windows, latency, loss=0.0, bandwidth=None, password="", seed=1, sources=None):
+    """Upload a random image of `size` bytes for every (chunk, window); returns result rows.
+
+    With `sources` the invitations go out from those local addresses.
+    """
+    host = "127.0.0.1"
+    image_path = os.path.join(os.environ.get("TMPDIR", "/tmp"), "espota_bench_%d.bin" % os.getpid())
+    with open(image_path, "wb") as f:
+        f.write(random.Random(seed).getrandbits(8 * size).to_bytes(size, "little") if size else b"")
+    device = MockDevice(host, 0, password, latency, loss, bandwidth, seed).start()
+    rows = []
+    stderr = sys.stderr
+    local_addresses = espota.local_addresses
+    if sources:
+        espota.local_addresses = lambda remote_ip, local_addr: list(sources)
+    try:
+        for chunk in chunks:
+            for window in windows:
+                start = time.time()
+                sys.stderr = open(os.devnull, "w")  # progress dots
+                try:
+                    rc = espota.serve(host, host, device.port, _free_port(host), password, image_path,
+                                      espota.FLASH, chunk, window)
+                finally:
+                    sys.stderr.close()
+                    sys.stderr = stderr
+                device.wait(10)
+                seconds = time.time() - start
+                handshake = (device.accepted_at or time.time()) - start
+                with open(image_path, "rb") as f:
+                    ok = rc == 0 and device.result == "OK" and device.received == f.read()
+                if not ok:
+                    result = "FAIL (%s)" % (device.result or "rc %d" % rc)
+                elif handshake >= espota.INITIAL_RTO:
+                    result = "FAIL (handshake took %.2f s)" % handshake
+                else:
+                    result = "OK"
+                rows.append({
+                    "chunk": chunk,
+                    "window": window,
+                    "handshake": round(handshake, 3),
+                    "seconds": round(seconds, 3),
+                    "kbps": round(size / 1024.0 / seconds, 1),
+                    "result": result,
+                })
+    finally:
+        espota.local_addresses = local_addresses
+        device.stop()
+        os.remove(image_path)
+    return rows
+
+
+def format_rows(rows):
+    lines = ["%6s %6s %9s %8s %9s  %s" % ("chunk", "window", "handshake", "seconds", "KB/s", "result")]
+    for r in rows:
+        lines.append("%6d %6d %9.2f %8.2f %9.1f  %s" % (
+            r["chunk"], r["window"], r["handshake"], r["seconds"], r["kbps"], r["result"]))
+    return "\n".join(lines)
+
+
+def _int_list(text):
+    return [int(v) for v in text.split(",") if v]
+
+
+def parse_args(unparsed_args):
+    parser = argparse.ArgumentParser(description="Mock ESP32 OTA receiver and espota.py upload benchmark.")
+    sub = parser.add_subparsers(dest="mode")
+    sub.required = True
+
+    for name, help_text in (("serve", "Run a mock device until interrupted."),
+                            ("bench", "Benchmark espota.serve() against the mock.")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("-a", "--auth", dest="auth", help="Device password (enables AUTH).", default="")
+        p.add_argument("--latency", type=float, help="Ack latency in seconds.", default=0.0)
+        p.add_argument("--loss", type=float, help="Probability a read hits a retransmission stall.", default=0.0)
+        p.add_argument("--bandwidth", type=int, help="Link bandwidth in bytes/s.", default=None)
+        p.add_argument("--seed", type=int, help="Random seed for losses and the test image.", default=1)
+        p.add_argument("-d", "--debug", action="store_true", help="Show debug output.", default=False)
+        if name == "serve":
+            p.add_argument("-i", "--ip", dest="ip", help="Address to listen on. Default: 127.0.0.1",
+                           default="127.0.0.1")
+            p.add_argument("-p", "--port", dest="port", type=int, help="OTA port. Default: %d" % OTA_PORT,
+                           default=OTA_PORT)
+            p.add_argument("--drop-invites", dest="drop_invites", type=int, help="Lose this many invitations first.",
+                           default=0)
+            p.add_argument("--resume", action="store_true", help="Keep partial images and accept resumes.",
+                           default=False)
+            p.add_argument("--drop-at", dest="drop_at", type=int, help="Cut the first upload after this many bytes.",
+                           default=None)
+            p.add_argument("--delta", action="store_true", help="Accept delta patches.", default=False)
+            p.add_argument("--base", dest="base", help="Image the device runs at start (for --delta).", default=None)
+        else:
+            p.add_argument("--size", type=int, help="Image size in bytes. Default: %d" % BENCH_SIZE, default=BENCH_SIZE)
+            p.add_argument("--chunks", type=_int_list, help="Chunk sizes, comma separated.", default=BENCH_CHUNKS)
+            p.add_argument("--windows", type=_int_list, help="Windows, comma separated.", default=BENCH_WINDOWS)
+            p.set_defaults(latency=BENCH_LATENCY)
+            p.add_argument("--csv", dest="csv", help="Also write the results to this CSV file.", default=None)
+            p.add_argument("--sources", type=lambda text: [a for a in text.split(",") if a],
+                           help="Local addresses to invite from, comma separated.", default=None)
+
+    return parser.parse_args(unparsed_args)
+
+
+def main(args):
+    options = parse_args(args)
+    logging.basicConfig(
+        level=logging.DEBUG if options.debug else logging.WARNING,
+        format="%(asctime)-8s [%(levelname)s]: %(message)s",
+        datefmt="%H:%M:%S",
+    )
+
+    if options.mode == "serve":
+        running = b""
+        if options.base:
+            with open(options.base, "rb") as f:
+                running = f.read()
+        device = MockDevice(options.ip, options.port, options.auth, options.latency, options.loss, options.bandwidth,
+                            options.seed, options.resume, options.drop_at, options.delta, running,
+                            options.drop_invites).start()
+        print("Mock ESP32 on %s:%d" % (options.ip, device.port))
+        try:
+            while True:
+                device.wait()
+                print("session %d: command %s, %d bytes from %d (delta %d), %s" % (
+                    device.sessions, device.command, len(device.received), device.resumed_at, device.delta_size,
+                    device.result))
+        except KeyboardInterrupt:
+            device.stop()
+        return 0
+
+    rows = run_benchmark(options.size, options.chunks, options.windows, options.latency, options.loss,
+                         options.bandwidth, options.auth, options.seed, options.sources)
+    print(format_rows(rows))
+    if options.csv:
+        with open(options.csv, "w") as f:
+            writer = csv.DictWriter(f, fieldnames=["chunk", "window", "handshake", "seconds", "kbps", "result"])
+            writer.writeheader()
+            writer.writerows(rows)
+    return 0 if all(r["result"] == "OK" for r in rows) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -4,6 +4,12 @@
 #
 # Converts partition tables to/from CSV and binary formats.
 #
+# Can also be imported: convert() and cached_convert() take an Options
+# object instead of the module globals, so build tools can generate tables
+# in-process and skip unchanged ones. --batch MANIFEST converts many tables
+# in one invocation. --optimize lays out a CSV of required partitions so
+# that the OTA app slots are as large as the flash size allows.
+#
 # See https://docs.espressif.com/projects/esp-idf/en/latest/api-guides/partition-tables.html
 # for explanation of partition table structure and uses.
 #
@@ -11,12 +17,17 @@
 # SPDX-License-Identifier: Apache-2.0
 import argparse
 import binascii
+import concurrent.futures
+import copy
 import errno
 import hashlib
+import io
 import os
 import re
+import shlex
 import struct
 import sys
+import tempfile
 
 MAX_PARTITION_LENGTH = 0xC00  # 3K for partition data (96 entries) leaves 1K in a 4K sector for signature
 MD5_PARTITION_BEGIN = b"\xeb\xeb" + b"\xff" * 14  # The first 2 bytes are like magic numbers for MD5 sum
@@ -47,6 +58,8 @@ TYPES = {
 
 NVS_RW_MIN_PARTITION_SIZE = 0x3000
 
+FLASH_SIZES = ["1MB", "2MB", "4MB", "8MB", "16MB", "32MB", "64MB", "128MB"]
+
 
 def get_ptype_as_int(ptype):
     """Convert a string which might be numeric or the name of a partition type to an integer"""
@@ -91,10 +104,10 @@ SUBTYPES = {
 }
 
 
-def get_subtype_as_int(ptype, subtype):
+def get_subtype_as_int(ptype, subtype, subtypes=None):
     """Convert a string which might be numeric or the name of a partition subtype to an integer"""
     try:
-        return SUBTYPES[get_ptype_as_int(ptype)][subtype]
+        return (subtypes or SUBTYPES)[get_ptype_as_int(ptype)][subtype]
     except KeyError:
         try:
             return int(subtype, 0)
@@ -114,7 +127,8 @@ def get_alignment_offset_for_type(ptype):
     return ALIGNMENT.get(ptype, ALIGNMENT[DATA_TYPE])
 
 
-def get_alignment_size_for_type(ptype):
+def get_alignment_size_for_type(ptype, options=None):
+    secure = _options(options).secure
     if ptype == APP_TYPE:
         if secure == SECURE_V1:
             # For secure boot v1 case, app partition must be 64K aligned
@@ -143,14 +157,16 @@ def get_partition_type(ptype):
     raise InputError("Invalid partition type")
 
 
-def add_extra_subtypes(csv):
+def add_extra_subtypes(csv, subtypes=None):
+    """Add "type, name, value" subtype entries to `subtypes` (the global SUBTYPES if omitted)"""
+    subtypes = SUBTYPES if subtypes is None else subtypes
     for line_no in csv:
         try:
             fields = [line.strip() for line in line_no.split(",")]
-            for subtype, subtype_values in SUBTYPES.items():
+            for subtype, subtype_values in subtypes.items():
                 if int(fields[2], 16) in subtype_values.values() and subtype == get_partition_type(fields[0]):
                     raise ValueError("Found duplicate value in partition subtype")
-            SUBTYPES[TYPES[fields[0]]][fields[1]] = int(fields[2], 16)
+            subtypes[TYPES[fields[0]]][fields[1]] = int(fields[2], 16)
         except InputError as err:
             raise InputError("Error parsing custom subtypes: %s" % err)
 
@@ -163,9 +179,76 @@ primary_bootloader_offset = None
 recovery_bootloader_offset = None
 
 
-def status(msg):
+class Options(object):
+    """Settings for one conversion, as set by the command line options.
+
+    Pass one to convert() or the PartitionTable methods instead of setting
+    the module globals above, so tables with different settings can be
+    handled in one process. Where none is passed, Options.current() reads
+    the module globals as before. The defaults match the command line.
+    """
+
+    def __init__(
+        self,
+        offset=0x8000,
+        md5sum=True,
+        secure=SECURE_NONE,
+        quiet=False,
+        primary_bootloader_offset=None,
+        recovery_bootloader_offset=None,
+        extra_partition_subtypes=None,
+    ):
+        self.offset_part_table = offset
+        self.md5sum = md5sum
+        self.secure = secure
+        self.quiet = quiet
+        self.primary_bootloader_offset = primary_bootloader_offset
+        self.recovery_bootloader_offset = recovery_bootloader_offset
+        self.extra_partition_subtypes = tuple(extra_partition_subtypes or ())
+        self.subtypes = SUBTYPES
+        if self.extra_partition_subtypes:
+            self.subtypes = {t: dict(names) for t, names in SUBTYPES.items()}
+            add_extra_subtypes(self.extra_partition_subtypes, self.subtypes)
+
+    @classmethod
+    def current(cls):
+        """Options from the module globals (extra subtypes are already in SUBTYPES)"""
+        return cls(
+            offset_part_table,
+            md5sum,
+            secure,
+            quiet,
+            primary_bootloader_offset,
+            recovery_bootloader_offset,
+        )
+
+    def validate(self):
+        if self.primary_bootloader_offset is not None and self.primary_bootloader_offset >= self.offset_part_table:
+            raise InputError(
+                f"Unsupported configuration. Primary bootloader must be below partition table. "
+                f"Check --primary-bootloader-offset={self.primary_bootloader_offset:#x} "
+                f"and --offset={self.offset_part_table:#x}"
+            )
+
+    def key(self):
+        """Everything that can change the output (not quiet), for cache keys"""
+        return (
+            self.offset_part_table,
+            self.md5sum,
+            self.secure,
+            self.primary_bootloader_offset,
+            self.recovery_bootloader_offset,
+            self.extra_partition_subtypes,
+        )
+
+
+def _options(options):
+    return options if options is not None else Options.current()
+
+
+def status(msg, options=None):
     """Print status message to stderr"""
-    if not quiet:
+    if not _options(options).quiet:
         critical(msg)
 
 
@@ -176,24 +259,26 @@ def critical(msg):
 
 
 class PartitionTable(list):
-    def __init__(self):
+    def __init__(self, options=None):
         super(PartitionTable, self).__init__(self)
+        self.options = options
 
     @classmethod
-    def from_file(cls, f):
+    def from_file(cls, f, options=None):
         data = f.read()
         data_is_binary = data[0:2] == PartitionDefinition.MAGIC_BYTES
         if data_is_binary:
-            status("Parsing binary partition input...")
-            return cls.from_binary(data), True
+            status("Parsing binary partition input...", options)
+            return cls.from_binary(data, options), True
 
         data = data.decode()
-        status("Parsing CSV input...")
-        return cls.from_csv(data), False
+        status("Parsing CSV input...", options)
+        return cls.from_csv(data, options), False
 
     @classmethod
-    def from_csv(cls, csv_contents):
-        res = PartitionTable()
+    def from_csv(cls, csv_contents, options=None, fill_offsets=True):
+        res = PartitionTable(options)
+        options = _options(options)
         lines = csv_contents.splitlines()
 
         def expand_vars(f):
@@ -208,7 +293,7 @@ class PartitionTable(list):
             if line.startswith("#") or len(line) == 0:
                 continue
             try:
-                res.append(PartitionDefinition.from_csv(line, line_no + 1))
+                res.append(PartitionDefinition.from_csv(line, line_no + 1, options))
             except InputError as err:
                 raise InputError(
                     "Error at line %d: %s\nPlease check extra_partition_subtypes.inc file in build/config directory"
@@ -218,7 +303,11 @@ class PartitionTable(list):
                 critical("Unexpected error parsing CSV line %d: %s" % (line_no + 1, line))
                 raise
 
+        if not fill_offsets:
+            return res
+
         # fix up missing offsets & negative sizes
+        offset_part_table = options.offset_part_table
         last_end = offset_part_table + PARTITION_TABLE_SIZE  # first offset after partition table
         for e in res:
             is_primary_bootloader = e.type == BOOTLOADER_TYPE and e.subtype == SUBTYPES[e.type]["primary"]
@@ -265,7 +354,7 @@ class PartitionTable(list):
         None if not found"""
         # convert ptype & subtypes names (if supplied this way) to integer values
         ptype = get_ptype_as_int(ptype)
-        subtype = get_subtype_as_int(ptype, subtype)
+        subtype = get_subtype_as_int(ptype, subtype, _options(self.options).subtypes)
 
         for p in self:
             if p.type == ptype and p.subtype == subtype:
@@ -279,9 +368,12 @@ class PartitionTable(list):
         return None
 
     def verify(self):
+        options = _options(self.options)
+        offset_part_table = options.offset_part_table
+
         # verify each partition individually
         for p in self:
-            p.verify()
+            p.verify(options)
 
         # check on duplicate name
         names = [p.name for p in self]
@@ -367,9 +459,10 @@ class PartitionTable(list):
             )
 
     @classmethod
-    def from_binary(cls, b):
+    def from_binary(cls, b, options=None):
         md5 = hashlib.md5()
-        result = cls()
+        result = cls(options)
+        md5sum = _options(options).md5sum
         for o in range(0, len(b), 32):
             data = b[o : o + 32]
             if len(data) != 32:
@@ -391,7 +484,7 @@ class PartitionTable(list):
 
     def to_binary(self):
         result = b"".join(e.to_binary() for e in self)
-        if md5sum:
+        if _options(self.options).md5sum:
             result += MD5_PARTITION_BEGIN + hashlib.md5(result).digest()
         if len(result) >= MAX_PARTITION_LENGTH:
             raise InputError("Binary partition table length (%d) longer than max" % len(result))
@@ -400,7 +493,8 @@ class PartitionTable(list):
 
     def to_csv(self, simple_formatting=False):
         rows = ["# ESP-IDF Partition Table", "# Name, Type, SubType, Offset, Size, Flags"]
-        rows += [x.to_csv(simple_formatting) for x in self]
+        subtypes = _options(self.options).subtypes
+        rows += [x.to_csv(simple_formatting, subtypes) for x in self]
         return "\n".join(rows) + "\n"
 
 
@@ -429,7 +523,7 @@ class PartitionDefinition(object):
         self.readonly = False
 
     @classmethod
-    def from_csv(cls, line, line_no):
+    def from_csv(cls, line, line_no, options=None):
         """Parse a line from the CSV"""
         line_w_defaults = line + ",,,,"  # lazy way to support default fields
         fields = [f.strip() for f in line_w_defaults.split(",")]
@@ -438,9 +532,9 @@ class PartitionDefinition(object):
         res.line_no = line_no
         res.name = fields[0]
         res.type = res.parse_type(fields[1])
-        res.subtype = res.parse_subtype(fields[2])
-        res.offset = res.parse_address(fields[3], res.type, res.subtype)
-        res.size = res.parse_size(fields[4], res.type)
+        res.subtype = res.parse_subtype(fields[2], options)
+        res.offset = res.parse_address(fields[3], res.type, res.subtype, options)
+        res.size = res.parse_size(fields[4], res.type, options)
         if res.size is None:
             raise InputError("Size field can't be empty")
 
@@ -503,43 +597,46 @@ class PartitionDefinition(object):
             raise InputError("Field 'type' can't be left empty.")
         return parse_int(strval, TYPES)
 
-    def parse_subtype(self, strval):
+    def parse_subtype(self, strval, options=None):
         if strval == "":
             if self.type == TYPES["app"]:
                 raise InputError("App partition cannot have an empty subtype")
             return SUBTYPES[DATA_TYPE]["undefined"]
-        return parse_int(strval, SUBTYPES.get(self.type, {}))
+        return parse_int(strval, _options(options).subtypes.get(self.type, {}))
 
-    def parse_size(self, strval, ptype):
+    def parse_size(self, strval, ptype, options=None):
         if ptype == BOOTLOADER_TYPE:
-            if primary_bootloader_offset is None:
+            options = _options(options)
+            if options.primary_bootloader_offset is None:
                 raise InputError("Primary bootloader offset is not defined. Please use --primary-bootloader-offset")
-            return offset_part_table - primary_bootloader_offset
+            return options.offset_part_table - options.primary_bootloader_offset
         if ptype == PARTITION_TABLE_TYPE:
             return PARTITION_TABLE_SIZE
         if strval == "":
             return None  # PartitionTable will fill in default
         return parse_int(strval)
 
-    def parse_address(self, strval, ptype, psubtype):
+    def parse_address(self, strval, ptype, psubtype, options=None):
+        options = _options(options)
         if ptype == BOOTLOADER_TYPE:
             if psubtype == SUBTYPES[ptype]["primary"]:
-                if primary_bootloader_offset is None:
+                if options.primary_bootloader_offset is None:
                     raise InputError("Primary bootloader offset is not defined. Please use --primary-bootloader-offset")
-                return primary_bootloader_offset
+                return options.primary_bootloader_offset
             if psubtype == SUBTYPES[ptype]["recovery"]:
-                if recovery_bootloader_offset is None:
+                if options.recovery_bootloader_offset is None:
                     raise InputError(
                         "Recovery bootloader offset is not defined. Please use --recovery-bootloader-offset"
                     )
-                return recovery_bootloader_offset
+                return options.recovery_bootloader_offset
         if ptype == PARTITION_TABLE_TYPE and psubtype == SUBTYPES[ptype]["primary"]:
-            return offset_part_table
+            return options.offset_part_table
         if strval == "":
             return None  # PartitionTable will fill in default
         return parse_int(strval)
 
-    def verify(self):
+    def verify(self, options=None):
+        options = _options(options)
         if self.type is None:
             raise ValidationError(self, "Type field is not set")
         if self.subtype is None:
@@ -552,7 +649,7 @@ class PartitionDefinition(object):
         if self.offset % offset_align:
             raise ValidationError(self, "Offset 0x%x is not aligned to 0x%x" % (self.offset, offset_align))
         if self.type == APP_TYPE:
-            size_align = get_alignment_size_for_type(self.type)
+            size_align = get_alignment_size_for_type(self.type, options)
             if self.size % size_align:
                 raise ValidationError(self, "Size 0x%x is not aligned to 0x%x" % (self.size, size_align))
 
@@ -562,9 +659,9 @@ class PartitionDefinition(object):
                 "type (0x%x). Mistake in partition table?" % (self.name, self.type)
             )
         all_subtype_names = []
-        for names in (t.keys() for t in SUBTYPES.values()):
+        for names in (t.keys() for t in options.subtypes.values()):
             all_subtype_names += names
-        if self.name in all_subtype_names and SUBTYPES.get(self.type, {}).get(self.name, "") != self.subtype:
+        if self.name in all_subtype_names and options.subtypes.get(self.type, {}).get(self.name, "") != self.subtype:
             critical(
                 "WARNING: Partition has name '%s' which is a partition subtype, but this partition has "
                 "non-matching type 0x%x and subtype 0x%x. Mistake in partition table?"
@@ -625,7 +722,7 @@ class PartitionDefinition(object):
             flags,
         )
 
-    def to_csv(self, simple_formatting=False):
+    def to_csv(self, simple_formatting=False, subtypes=None):
         def addr_format(a, include_sizes):
             if not simple_formatting and include_sizes:
                 for val, suffix in [(0x100000, "M"), (0x400, "K")]:
@@ -647,7 +744,7 @@ class PartitionDefinition(object):
             [
                 self.name,
                 lookup_keyword(self.type, TYPES),
-                lookup_keyword(self.subtype, SUBTYPES.get(self.type, {})),
+                lookup_keyword(self.subtype, (subtypes or SUBTYPES).get(self.type, {})),
                 addr_format(self.offset, False),
                 addr_format(self.size, True),
                 generate_text_flags(),
@@ -673,20 +770,421 @@ def parse_int(v, keywords={}):
             raise InputError("Value '%s' is not valid. Known keywords: %s" % (v, ", ".join(keywords)))
 
 
-def main():
-    global quiet
-    global md5sum
-    global offset_part_table
-    global secure
-    global primary_bootloader_offset
-    global recovery_bootloader_offset
+OPTIMIZE_MAX_STATES = 20000  # --optimize: above this the exact search is skipped
+
+CACHE_DIR = os.environ.get("GEN_ESP32PART_CACHE") or os.path.join(os.path.expanduser("~"), ".cache", "gen_esp32part")
+
+_tool_digest = None
+
+
+def convert(data, options=None, verify=True, flash_size=None):
+    """Convert the contents of a CSV or binary partition table file to the other format.
+
+    Returns (output, input_is_binary); output is bytes (UTF-8 text for CSV).
+    flash_size (in bytes) checks that the table fits. Raises InputError or
+    ValidationError like the command line does.
+    """
+    options = _options(options)
+    table, input_is_binary = PartitionTable.from_file(io.BytesIO(data), options)
+
+    if verify:
+        status("Verifying table...", options)
+        table.verify()
+
+    if flash_size:
+        table.verify_size_fits(flash_size)
+
+    if input_is_binary:
+        return table.to_csv().encode("utf-8"), True
+    return table.to_binary(), False
+
+
+def cache_key(data, options=None, verify=True, flash_size=None):
+    """SHA256 over the input, the options, the environment variables the CSV uses and this script"""
+    global _tool_digest
+    if _tool_digest is None:
+        with open(os.path.abspath(__file__), "rb") as f:
+            _tool_digest = hashlib.sha256(f.read()).hexdigest()
+    text = data.decode("utf-8", "replace")
+    refs = re.findall(r"\$\{([A-Za-z_][A-Za-z0-9_]*)\}|\$([A-Za-z_][A-Za-z0-9_]*)", text)
+    env = [(name, os.environ.get(name)) for name in sorted(set(a or b for a, b in refs))]
+    h = hashlib.sha256(data)
+    h.update(repr((_tool_digest, _options(options).key(), verify, flash_size, env)).encode())
+    return h.hexdigest()
+
+
+def cached_convert(data, options=None, verify=True, flash_size=None, cache_dir=CACHE_DIR):
+    """convert() through a content-addressed cache in cache_dir.
+
+    Outputs are stored under cache_key(); a hit skips parsing and verifying
+    (and so their warnings). Failures are not cached, and a cache that
+    cannot be written is ignored.
+    """
+    input_is_binary = data[0:2] == PartitionDefinition.MAGIC_BYTES
+    key = cache_key(data, options, verify, flash_size)
+    path = os.path.join(cache_dir, key + (".csv" if input_is_binary else ".bin"))
+    try:
+        with open(path, "rb") as f:
+            output = f.read()
+        status("Using cached %s" % path, options)
+        return output, input_is_binary
+    except (IOError, OSError):
+        pass
+
+    output, input_is_binary = convert(data, options, verify, flash_size)
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        fd, tmp = tempfile.mkstemp(dir=cache_dir)
+        with os.fdopen(fd, "wb") as f:
+            f.write(output)
+        os.replace(tmp, path)
+    except (IOError, OSError) as e:
+        status("Could not cache the output: %s" % e, options)
+    return output, input_is_binary
+
+
+def _align_up(value, alignment):
+    return (value + alignment - 1) // alignment * alignment
+
+
+def _is_ota_app(p):
+    return p.type == APP_TYPE and MIN_PARTITION_SUBTYPE_APP_OTA <= p.subtype < (
+        MIN_PARTITION_SUBTYPE_APP_OTA + NUM_PARTITION_SUBTYPE_APP_OTA
+    )
+
+
+def _place(fixed, movable, start, end, apps_first=True):
+    """First-fit-decreasing placement of (partition, size) items around the fixed (offset, size) ranges.
+
+    With apps_first the apps go first, at 64K aligned offsets, and the data
+    partitions then fill the alignment holes they leave; otherwise the data
+    partitions are placed first. Returns {id(partition): offset} or None if
+    something does not fit.
+    """
+    free = []
+    pos = start
+    for offset, size in sorted(fixed):
+        if offset < pos and offset + size > start:
+            return None  # fixed partitions overlap
+        if offset > pos:
+            free.append((pos, min(offset, end)))
+        pos = max(pos, offset + size)
+    if pos > end:
+        return None
+    free.append((pos, end))
+
+    placed = {}
+    items = sorted(movable, key=lambda item: ((item[0].type == APP_TYPE) != apps_first, -item[1]))
+    for p, size in items:
+        alignment = get_alignment_offset_for_type(p.type)
+        for i, (lo, hi) in enumerate(free):
+            offset = _align_up(lo, alignment)
+            if offset + size <= hi:
+                free[i : i + 1] = [r for r in ((lo, offset), (offset + size, hi)) if r[0] < r[1]]
+                placed[id(p)] = offset
+                break
+        else:
+            return None
+    return placed
+
+
+def _place_exact(fixed, movable, start, end, max_states=OPTIMIZE_MAX_STATES):
+    """Exact placement of (partition, size) items around the sorted fixed (offset, size) ranges.
+
+    Any layout can be compacted so that, in offset order, each partition sits
+    at the first aligned offset after the previous one that misses the fixed
+    ranges, so it is enough to find an order that fits. Items of the same size
+    and alignment are interchangeable: the search runs over how many of each
+    group are placed, keeping the lowest end address per state. Returns
+    {id(partition): offset}, None if nothing fits, or False when there are
+    more than max_states states.
+    """
+    groups = {}
+    for p, size in movable:
+        groups.setdefault((size, get_alignment_offset_for_type(p.type)), []).append(p)
+    groups = list(groups.items())
+    states = 1
+    for _key, members in groups:
+        states *= len(members) + 1
+    if states > max_states:
+        return False
+
+    def earliest(pos, size, alignment):
+        offset = _align_up(pos, alignment)
+        for fixed_offset, fixed_size in fixed:
+            if fixed_offset + fixed_size <= offset:
+                continue
+            if offset + size <= fixed_offset:
+                break
+            offset = _align_up(fixed_offset + fixed_size, alignment)
+        return offset
+
+    initial = (0,) * len(groups)
+    ends = {initial: (start, None, None)}  # state: (end address, previous state, offset of the last item)
+    layer = [initial]
+    for _ in range(len(movable)):
+        next_layer = []
+        for state in layer:
+            pos = ends[state][0]
+            for j, ((size, alignment), members) in enumerate(groups):
+                if state[j] == len(members):
+                    continue
+                offset = earliest(pos, size, alignment)
+                if offset + size > end:
+                    continue
+                new = state[:j] + (state[j] + 1,) + state[j + 1 :]
+                if new not in ends:
+                    next_layer.append(new)
+                elif ends[new][0] <= offset + size:
+                    continue
+                ends[new] = (offset + size, state, offset)
+        layer = next_layer
+    final = tuple(len(members) for _key, members in groups)
+    if final not in ends:
+        return None
+    placed = {}
+    state = final
+    while state != initial:
+        _end, previous, offset = ends[state]
+        j = [a != b for a, b in zip(state, previous)].index(True)
+        placed[id(groups[j][1][previous[j]])] = offset
+        state = previous
+    return placed
+
+
+def optimize(csv_contents, flash_size, options=None):
+    """Lay out a CSV of required partitions so the OTA app slots are as large as possible.
+
+    Partitions with an offset in the CSV stay there; the others are placed
+    after the partition table. Sizes are minimums for the OTA app slots (or,
+    without any, the factory app), which all get the same, largest size that
+    fits in flash_size bytes with the offset alignment, the app size
+    alignment of the secure boot mode and, with two or more OTA slots, a
+    0x2000 otadata partition (added if missing). Other sizes are kept.
+    Returns the verified PartitionTable; raises InputError if the partitions
+    do not fit.
+
+    A first-fit-decreasing placement gives a lower bound; the exact search
+    (_place_exact) then closes the gap to the space bound. Tables with so
+    many different partitions that the exact search would be slow keep the
+    first-fit result.
+    """
+    options = _options(options)
+    table = PartitionTable.from_csv(csv_contents, options, fill_offsets=False)
+    if not any(p.type == DATA_TYPE and p.subtype == SUBTYPES[DATA_TYPE]["ota"] for p in table):
+        if sum(1 for p in table if _is_ota_app(p)) >= 2:
+            otadata = PartitionDefinition()
+            otadata.name = "otadata"
+            otadata.type = DATA_TYPE
+            otadata.subtype = SUBTYPES[DATA_TYPE]["ota"]
+            otadata.size = 0x2000
+            table.append(otadata)
+            status("Adding otadata partition", options)
+    for p in table:
+        if p.type == DATA_TYPE and p.subtype == SUBTYPES[DATA_TYPE]["ota"]:
+            p.size = 0x2000
+        if p.size is not None and p.size < 0:
+            if p.offset is None:
+                raise InputError("Partition %s: a size relative to the end needs an offset" % p.name)
+            p.size = -p.size - p.offset
+
+    grow = [p for p in table if _is_ota_app(p)]
+    if not grow:
+        grow = [p for p in table if p.type == APP_TYPE and p.subtype == SUBTYPES[APP_TYPE]["factory"]]
+    if not grow:
+        raise InputError("No OTA or factory app partition to size")
+    grow = set(id(p) for p in grow)
+    size_align = get_alignment_size_for_type(APP_TYPE, options)
+    start = options.offset_part_table + PARTITION_TABLE_SIZE
+
+    def layout(slot_size, exact=False):
+        fixed, movable = [], []
+        for p in table:
+            size = slot_size if id(p) in grow else p.size
+            if p.offset is not None:
+                fixed.append((p.offset, size))
+            else:
+                movable.append((p, size))
+        fixed = sorted((o, size) for o, size in fixed if o + size > start)  # not primary bootloader / table
+        if exact:
+            return _place_exact(fixed, movable, start, flash_size)
+        return _place(fixed, movable, start, flash_size) or _place(fixed, movable, start, flash_size, False)
+
+    def largest(lo, hi, exact=False):
+        """Largest slot size in [lo, hi) that fits, lo fitting, in units of the app size alignment"""
+        while hi - lo > size_align:
+            mid = lo + (hi - lo) // size_align // 2 * size_align
+            if layout(mid, exact):
+                lo = mid
+            else:
+                hi = mid
+        return lo
+
+    lo = _align_up(max(p.size for p in table if id(p) in grow), size_align)
+    fixed_space = sum(p.size for p in table if p.offset is not None and id(p) not in grow and p.offset >= start)
+    other_space = sum(p.size for p in table if p.offset is None and id(p) not in grow)
+    bound = (flash_size - start - fixed_space - other_space) // len(grow) // size_align * size_align
+    placed = layout(lo)
+    if placed is not None:
+        lo = largest(lo, bound + size_align)
+        placed = layout(lo)
+    if placed is None or lo < bound:
+        exact = layout(lo, exact=True)
+        if exact:
+            lo = largest(lo, bound + size_align, exact=True)
+            placed = layout(lo, exact=True)
+    if placed is None:
+        raise InputError(
+            "The partitions do not fit in %dMB of flash with app slots of 0x%x bytes" % (flash_size // 0x100000, lo)
+        )
+
+    result = PartitionTable(table.options)
+    for p in table:
+        q = copy.copy(p)
+        if q.offset is None:
+            q.offset = placed[id(p)]
+        if id(p) in grow:
+            q.size = lo
+        result.append(q)
+    result.sort(key=lambda x: x.offset)
+    result.verify()
+    result.verify_size_fits(flash_size)
+    unused = flash_size - start - sum(p.size for p in result if p.offset >= start)
+    status("App slots of 0x%x bytes, 0x%x bytes unused" % (lo, unused), options)
+    return result
+
+
+def write_output(path, output, input_is_binary):
+    """Write convert() output to path ("-" for stdout), creating its directory"""
+    # Make sure that the output directory is created
+    output_dir = os.path.abspath(os.path.dirname(path))
+
+    if not os.path.exists(output_dir):
+        try:
+            os.makedirs(output_dir)
+        except OSError as exc:
+            if exc.errno != errno.EEXIST:
+                raise
+
+    if input_is_binary:
+        output = output.decode("utf-8")
+        if path == "-":
+            # flushed, not closed: a batch may write several entries to stdout
+            sys.stdout.write(output)
+            sys.stdout.flush()
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(output)
+    else:
+        if path == "-":
+            try:
+                stdout_binary = sys.stdout.buffer  # Python 3
+            except AttributeError:
+                stdout_binary = sys.stdout
+            stdout_binary.write(output)
+            stdout_binary.flush()
+        else:
+            with open(path, "wb") as f:
+                f.write(output)
+
+
+def parse_flash_size(strval):
+    """Bytes for a --flash-size value such as "4MB" """
+    if strval not in FLASH_SIZES:
+        raise InputError("Invalid flash size '%s'. Known sizes: %s" % (strval, ", ".join(FLASH_SIZES)))
+    return int(strval.replace("MB", "")) * 1024 * 1024
+
+
+def read_manifest(f):
+    """Entries (input, output, flash size in bytes or None, offset or None) of a batch manifest.
+
+    One table per line: input output [flash-size [offset]], whitespace separated
+    with shell quoting, "-" for an option that is not set and # comments.
+    """
+    entries = []
+    for line_no, line in enumerate(f, 1):
+        try:
+            fields = shlex.split(line, comments=True)
+        except ValueError as err:
+            raise InputError("Manifest line %d: %s" % (line_no, err))
+        if not fields:
+            continue
+        if not 2 <= len(fields) <= 4:
+            raise InputError("Manifest line %d: expected input, output, [flash-size, [offset]]" % line_no)
+        fields += ["-"] * (4 - len(fields))
+        try:
+            flash_size = None if fields[2] == "-" else parse_flash_size(fields[2])
+            offset = None if fields[3] == "-" else int(fields[3], 0)
+        except (InputError, ValueError) as err:
+            raise InputError("Manifest line %d: %s" % (line_no, err))
+        entries.append((fields[0], fields[1], flash_size, offset))
+    return entries
+
+
+def convert_entry(entry, options=None, verify=True, cache_dir=None):
+    """Convert one manifest entry and write its output; returns None or the error message"""
+    path, output_path, flash_size, offset = entry
+    options = _options(options)
+    if offset is not None:
+        options = copy.copy(options)
+        options.offset_part_table = offset
+    try:
+        options.validate()
+        with open(path, "rb") as f:
+            data = f.read()
+        if cache_dir:
+            output, input_is_binary = cached_convert(data, options, verify, flash_size, cache_dir)
+        else:
+            output, input_is_binary = convert(data, options, verify, flash_size)
+        write_output(output_path, output, input_is_binary)
+    except (InputError, IOError, OSError, ValueError) as err:  # ValueError includes UnicodeDecodeError
+        return str(err)
+    return None
+
+
+def convert_batch(entries, options=None, verify=True, cache_dir=None, jobs=1):
+    """convert_entry() for every entry; a failing entry does not stop the others.
+
+    Returns the error message (or None) per entry. Conversions take well under
+    a millisecond, so jobs > 1 (worker processes) only pays off for long
+    manifests.
+    """
+    options = _options(options)
+    if jobs <= 1 or len(entries) < 2:
+        return [convert_entry(e, options, verify, cache_dir) for e in entries]
+    with concurrent.futures.ProcessPoolExecutor(jobs) as pool:
+        n = len(entries)
+        chunk = max(1, n // (jobs * 4))
+        return list(pool.map(convert_entry, entries, [options] * n, [verify] * n, [cache_dir] * n, chunksize=chunk))
+
+
+def run_batch(manifest, options, verify=True, cache_dir=None, jobs=1):
+    """Convert a manifest (path, "-" for stdin); prints failures and a summary, returns the exit code"""
+    if manifest == "-":
+        entries = read_manifest(sys.stdin)
+    else:
+        with open(manifest, "r", encoding="utf-8") as f:
+            entries = read_manifest(f)
+    errors = convert_batch(entries, options, verify, cache_dir, jobs)
+    for (path, output_path, _flash_size, _offset), err in zip(entries, errors):
+        if err is not None:
+            critical("%s: %s" % (path, err))
+        else:
+            status("%s -> %s" % (path, output_path), options)
+    failed = sum(1 for err in errors if err is not None)
+    status("%d converted, %d failed" % (len(entries) - failed, failed), options)
+    return 2 if failed else 0
+
+
+def main(argv=None):
     parser = argparse.ArgumentParser(description="ESP32 partition table utility")
 
     parser.add_argument(
         "--flash-size",
         help="Optional flash size limit, checks partition table fits in flash",
         nargs="?",
-        choices=["1MB", "2MB", "4MB", "8MB", "16MB", "32MB", "64MB", "128MB"],
+        choices=FLASH_SIZES,
     )
     parser.add_argument(
         "--disable-md5sum", help="Disable md5 checksum for the partition table", default=False, action="store_true"
@@ -711,7 +1209,28 @@ def main():
         choices=[SECURE_V1, SECURE_V2],
     )
     parser.add_argument("--extra-partition-subtypes", help="Extra partition subtype entries", nargs="*")
-    parser.add_argument("input", help="Path to CSV or binary file to parse.", type=argparse.FileType("rb"))
+    parser.add_argument(
+        "--cache",
+        help="Reuse the output for unchanged input and options from this directory "
+        "(default with no value: $GEN_ESP32PART_CACHE or %s)" % CACHE_DIR,
+        nargs="?",
+        const=CACHE_DIR,
+        default=None,
+    )
+    parser.add_argument(
+        "--batch",
+        help="Convert every 'input output [flash-size [offset]]' line of this manifest ('-' for stdin) "
+        "instead of a single input; the other options apply to all of them",
+        metavar="MANIFEST",
+    )
+    parser.add_argument("--jobs", "-j", help="Worker processes for --batch (default 1)", type=int, default=1)
+    parser.add_argument(
+        "--optimize",
+        help="Place the partitions of the input CSV (sizes are minimums) so that the OTA app slots are as large "
+        "as --flash-size allows. Writes CSV to stdout or a .csv output, else the binary table",
+        action="store_true",
+    )
+    parser.add_argument("input", help="Path to CSV or binary file to parse.", nargs="?", type=argparse.FileType("rb"))
     parser.add_argument(
         "output",
         help="Path to output converted binary or CSV file. Will use stdout if omitted.",
@@ -719,56 +1238,62 @@ def main():
         default="-",
     )
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    if args.batch is None and args.input is None:
+        parser.error("the following arguments are required: input (or --batch)")
+    if args.batch is not None and args.input is not None:
+        parser.error("input and output are taken from the manifest with --batch")
 
-    quiet = args.quiet
-    md5sum = not args.disable_md5sum
-    secure = args.secure
     offset_part_table = int(args.offset, 0)
+    primary_bootloader_offset = None
     if args.primary_bootloader_offset is not None:
         primary_bootloader_offset = int(args.primary_bootloader_offset, 0)
-        if primary_bootloader_offset >= offset_part_table:
-            raise InputError(
-                f"Unsupported configuration. Primary bootloader must be below partition table. "
-                f"Check --primary-bootloader-offset={primary_bootloader_offset:#x} and --offset={offset_part_table:#x}"
-            )
+    recovery_bootloader_offset = None
     if args.recovery_bootloader_offset is not None:
         recovery_bootloader_offset = int(args.recovery_bootloader_offset, 0)
-    if args.extra_partition_subtypes:
-        add_extra_subtypes(args.extra_partition_subtypes)
+    options = Options(
+        offset=offset_part_table,
+        md5sum=not args.disable_md5sum,
+        secure=args.secure,
+        quiet=args.quiet,
+        primary_bootloader_offset=primary_bootloader_offset,
+        recovery_bootloader_offset=recovery_bootloader_offset,
+        extra_partition_subtypes=args.extra_partition_subtypes,
+    )
 
-    table, input_is_binary = PartitionTable.from_file(args.input)
+    if args.batch is not None:
+        if args.flash_size:
+            parser.error("--flash-size is set per manifest line with --batch")
+        if args.optimize:
+            parser.error("--optimize works on a single input")
+        return run_batch(args.batch, options, not args.no_verify, args.cache, args.jobs)
 
-    if not args.no_verify:
-        status("Verifying table...")
-        table.verify()
+    options.validate()
 
+    flash_size = None
     if args.flash_size:
-        size_mb = int(args.flash_size.replace("MB", ""))
-        table.verify_size_fits(size_mb * 1024 * 1024)
-
-    # Make sure that the output directory is created
-    output_dir = os.path.abspath(os.path.dirname(args.output))
-
-    if not os.path.exists(output_dir):
-        try:
-            os.makedirs(output_dir)
-        except OSError as exc:
-            if exc.errno != errno.EEXIST:
-                raise
+        flash_size = parse_flash_size(args.flash_size)
+
+    data = args.input.read()
+    if args.optimize:
+        if flash_size is None:
+            parser.error("--optimize needs --flash-size")
+        if data[0:2] == PartitionDefinition.MAGIC_BYTES:
+            raise InputError("--optimize needs a CSV input")
+        status("Optimizing CSV input...", options)
+        table = optimize(data.decode(), flash_size, options)
+        if args.output == "-" or args.output.lower().endswith(".csv"):
+            write_output(args.output, table.to_csv().encode("utf-8"), True)
+        else:
+            write_output(args.output, table.to_binary(), False)
+        return
 
-    if input_is_binary:
-        output = table.to_csv()
-        with sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8") as f:
-            f.write(output)
+    if args.cache:
+        output, input_is_binary = cached_convert(data, options, not args.no_verify, flash_size, args.cache)
     else:
-        output = table.to_binary()
-        try:
-            stdout_binary = sys.stdout.buffer  # Python 3
-        except AttributeError:
-            stdout_binary = sys.stdout
-        with stdout_binary if args.output == "-" else open(args.output, "wb") as f:
-            f.write(output)
+        output, input_is_binary = convert(data, options, not args.no_verify, flash_size)
+
+    write_output(args.output, output, input_is_binary)
 
 
 class InputError(RuntimeError):
@@ -783,7 +1308,7 @@ class ValidationError(InputError):
 
 if __name__ == "__main__":
     try:
-        main()
+        sys.exit(main())
     except InputError as e:
         print(e, file=sys.stderr)
         sys.exit(2)
@@ -26,6 +26,8 @@ http://arduino.cc/en/Reference/HomePage
 
 from os.path import abspath, basename, isdir, isfile, join
 from copy import deepcopy
+import importlib.util
+import sys
 from SCons.Script import DefaultEnvironment, SConscript
 
 env = DefaultEnvironment()
@@ -124,6 +126,24 @@ def generate_bootloader_image(bootloader_elf):
     return str(bootloader_cmd[0])
 
 
+def generate_partition_table(target, source, env):
+    # In-process gen_esp32part: no interpreter start per build, and unchanged
+    # tables come from its content-addressed cache
+    spec = importlib.util.spec_from_file_location("gen_esp32part", join(FRAMEWORK_DIR, "tools", "gen_esp32part.py"))
+    gen_esp32part = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(gen_esp32part)
+    with open(source[0].get_abspath(), "rb") as f:
+        data = f.read()
+    try:
+        output, _ = gen_esp32part.cached_convert(data, gen_esp32part.Options(quiet=True))
+    except gen_esp32part.InputError as e:
+        sys.stderr.write("%s\n" % e)
+        return 1
+    with open(target[0].get_abspath(), "wb") as f:
+        f.write(output)
+    return 0
+
+
 def add_tinyuf2_extra_image():
     tinuf2_image = board_config.get(
         "upload.arduino.tinyuf2_image",
@@ -245,10 +265,7 @@ env.Replace(PARTITIONS_TABLE_CSV=get_partition_table_csv(variants_dir))
 partition_table = env.Command(
     join("$BUILD_DIR", "partitions.bin"),
     "$PARTITIONS_TABLE_CSV",
-    env.VerboseAction(
-        '"$PYTHONEXE" "%s" -q $SOURCE $TARGET' % join(FRAMEWORK_DIR, "tools", "gen_esp32part.py"),
-        "Generating partitions $TARGET",
-    ),
+    env.VerboseAction(generate_partition_table, "Generating partitions $TARGET"),
 )
 env.Depends("$BUILD_DIR/$PROGNAME$PROGSUFFIX", partition_table)
 
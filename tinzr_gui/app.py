@@ -1,21 +1,25 @@
 # =========================
 # File: app.py
 # =========================
+import startup  # first: its clock is the cold-start reference
 import tkinter as tk
 from queue import Queue, Empty
 from ble_worker import AsyncBleWorker
 from ui.shell import AppShell
 from modules.battery import BatteryTab
 from modules.led import LedTab
-from modules.imu import ImuTab
+from recording.recorder import Recorder
+# modules.imu (matplotlib) is imported when the Sensors tab is first opened
 
 PUMP_INTERVAL_MS = 30  # how often we poll the BLE->UI queue
 
 def main():
+    startup.mark("imports")
     q = Queue()
     ble = AsyncBleWorker(ui_queue=q)
 
     app = AppShell(ble)  # AppShell should be a tk.Tk or ttk.Frame with .after/.event_generate
+    app.recorder = Recorder()   # shared: Sensors tab starts/stops it, battery lines go in too
 
     # ---- Battery: create and mount INLINE on the top-left row (next to search) ----
     battery_tab = BatteryTab(app, ble, icon_width=70, icon_height=25)
@@ -27,9 +31,20 @@ def main():
     app.add_tab(led_tab, "LED")
     app.led_tab = led_tab
 
-    imu_tab = ImuTab(app, ble)
-    app.add_tab(imu_tab, "Sensors")
-    app.imu_tab = imu_tab
+    # Sensors tab: built the first time it is selected (matplotlib only once its plot view is picked)
+    app.imu_tab = None
+    def build_imu_tab(holder):
+        ImuTab = startup.timed_import("modules.imu").ImuTab
+        imu_tab = ImuTab(holder, ble, recorder=app.recorder)
+        imu_tab.pack(fill="both", expand=True)
+        app.imu_tab = imu_tab
+        # Index each finished recording in the session catalog
+        try:
+            startup.timed_import("recording.catalog").Catalog().attach_recorder(app.recorder)
+        except Exception as e:
+            print(f"catalog unavailable: {e}")
+    app.add_lazy_tab("Sensors", build_imu_tab)
+    startup.mark("tabs built")
 
     # Pump BLE queue into Tk virtual events + direct tab calls
     def pump_ble_queue():
@@ -39,6 +54,7 @@ def main():
 
                 if kind == "bat":
                     app.event_generate("<<BLE:bat>>", when="tail", data=str(payload))
+                    app.recorder.write("BAT", str(payload).strip())   # battery slope in tinzr-analyze
                     try:
                         if getattr(app, "battery_tab", None):
                             app.battery_tab.handle_raw_bat(str(payload))
@@ -134,6 +150,11 @@ def main():
     else:
         app.winfo_toplevel().protocol("WM_DELETE_WINDOW", on_close)
 
+    def on_interactive():
+        startup.mark("interactive")
+        startup.report()
+    app.after_idle(on_interactive)
+
     app.mainloop()
 
 if __name__ == "__main__":
@@ -8,7 +8,8 @@ import asyncio, threading, time
 from queue import Queue
 from dataclasses import dataclass
 from typing import Optional, Dict, Any, List, Tuple
-from bleak import BleakScanner, BleakClient, BleakError
+
+import startup
 
 # ---------- BLE Profiles we support ----------
 # Nordic UART (new TinZr)
@@ -25,6 +26,11 @@ LEGACY_NAME      = "TinZr"
 
 SCAN_TIMEOUT_SEC = 8.0
 
+def _bleak():
+    """Import bleak on first use; keeps it off the GUI's cold-start path."""
+    return startup.timed_import("bleak")
+
+
 @dataclass
 class DiscoveredDevice:
     name: str
@@ -75,7 +81,7 @@ class AsyncBleWorker:
         self._uiq = ui_queue
         self._loop = asyncio.new_event_loop()
         self._thread = threading.Thread(target=self._run, daemon=True)
-        self._client: Optional[BleakClient] = None
+        self._client: Optional[Any] = None   # bleak.BleakClient once connected
         self._found: Dict[str, Any] = {}
         self._rx_buf = bytearray()
         self._mode: Optional[str] = None
@@ -86,6 +92,11 @@ class AsyncBleWorker:
     # ---------- internal ----------
     def _run(self):
         asyncio.set_event_loop(self._loop)
+        # Warm bleak up here, off the Tk thread, so the first scan doesn't pay for it
+        try:
+            _bleak()
+        except Exception as e:
+            self.log(f"bleak import failed: {e}")
         self._loop.run_until_complete(self._alive())
 
     async def _alive(self):
@@ -126,7 +137,7 @@ class AsyncBleWorker:
             named: List[DiscoveredDevice] = []
             self._found.clear()
 
-            devs = await BleakScanner.discover(timeout=timeout)
+            devs = await _bleak().BleakScanner.discover(timeout=timeout)
             for d in devs:
                 self._found[d.address] = d
                 nm = (d.name or "").strip()
@@ -151,7 +162,7 @@ class AsyncBleWorker:
             if not named and os.name == "nt" and backend != "dotnet":
                 self.log("No candidates with WinRT. Retrying with BLEAK_BACKEND=dotnet…")
                 os.environ["BLEAK_BACKEND"] = "dotnet"
-                devs = await BleakScanner.discover(timeout=timeout)
+                devs = await _bleak().BleakScanner.discover(timeout=timeout)
                 for d in devs:
                     self._found[d.address] = d
                     nm = (d.name or "").strip()
@@ -182,7 +193,7 @@ class AsyncBleWorker:
                     await self._client.disconnect()
                 self.log(f"Connecting to {address}…")
                 target = self._found.get(address, address)
-                c = BleakClient(target, timeout=12)
+                c = _bleak().BleakClient(target, timeout=12)
                 await c.connect()
 
                 svcs = await c.get_services()
@@ -301,7 +312,7 @@ class AsyncBleWorker:
             try:
                 await self._client.write_gatt_char(self._write_uuid, data, response=require_response)
                 self.log(f"[Py→FW] {text.strip()}")
-            except BleakError as e:
+            except _bleak().BleakError as e:
                 self.log(f"Write failed: {e}")
         return asyncio.run_coroutine_threadsafe(_w(), self._loop)
 
@@ -0,0 +1,125 @@
+# =========================
+# File: dsp/activity.py
+# =========================
+"""
+Streaming activity metrics from the accelerometer (ax, ay, az).
+
+Per batch (all per-sample work is vectorized):
+  VM     = |a| in g
+  ENMO   = max(VM − 1 g, 0)                       motion intensity (mg)
+  counts = ∫ |band-pass 0.25–2.5 Hz (VM)| dt · COUNTS_PER_G_S
+  steps  = local maxima of the band-passed VM above an adaptive threshold,
+           at least STEP_MIN_INTERVAL_S apart
+
+Everything is folded into EPOCH_S summaries (one per second by default):
+    (epoch_index, vm_mean_g, enmo_mg, counts, steps, total_steps)
+so a 24 h session is ~86 400 short lines instead of the raw samples.
+State is fixed-size: biquad state, two trailing samples, epoch accumulators.
+"""
+import numpy as np
+
+from dsp.iir import SosFilter, bandpass_sos
+
+ACC_UNITS_PER_G     = 9.80665       # firmware accel is m/s²
+EPOCH_S             = 1.0
+COUNTS_BAND_HZ      = (0.25, 2.5)
+COUNTS_PER_G_S      = 100.0
+STEP_MIN_G          = 0.05          # absolute floor for a step peak (band-passed g)
+STEP_REL_THRESHOLD  = 1.0           # … or this × running mean |band-passed VM|
+STEP_MIN_INTERVAL_S = 0.25          # ≤ 4 steps/s
+AMP_ALPHA           = 0.02          # EMA factor for the running amplitude (per sample)
+
+# ENMO cut points (mg) → intensity class
+INTENSITY_LEVELS = ((40.0, "sedentary"), (100.0, "light"), (400.0, "moderate"), (float("inf"), "vigorous"))
+
+
+def intensity(enmo_mg):
+    for limit, name in INTENSITY_LEVELS:
+        if enmo_mg < limit:
+            return name
+    return INTENSITY_LEVELS[-1][1]
+
+
+class ActivityMeter:
+    def __init__(self, fs, epoch_s=EPOCH_S):
+        self.fs = float(fs)
+        self.epoch_len = max(1, int(round(epoch_s * self.fs)))
+        self._filt = SosFilter(bandpass_sos(COUNTS_BAND_HZ[0], min(COUNTS_BAND_HZ[1], 0.45 * self.fs), self.fs))
+        self.reset()
+
+    def reset(self):
+        self._filt.reset()
+        self._n = 0                    # absolute index of the next sample
+        self._epoch = 0                # index of the open epoch
+        self._sums = np.zeros(3)       # [vm, enmo, |bp|] over the open epoch
+        self._cnt = 0
+        self._steps = 0                # steps in the open epoch
+        self.total_steps = 0
+        self._tail = np.zeros(2)
+        self._tail_n = 0
+        self._amp = 0.0
+        self._last_step = None
+        self.last = None               # latest closed summary
+
+    def process(self, acc):
+        """acc: (3, N) batch in m/s². Returns the summaries of the epochs closed by it."""
+        a = np.asarray(acc, dtype=np.float64).reshape(3, -1)
+        n = a.shape[1]
+        if n == 0:
+            return []
+        vm = np.sqrt(np.einsum("ij,ij->j", a, a)) / ACC_UNITS_PER_G
+        bp = self._filt.process(vm)
+        feats = np.vstack((vm, np.maximum(vm - 1.0, 0.0), np.abs(bp)))   # (3, N)
+        step_epochs = self._detect_steps(bp) // self.epoch_len
+
+        out = []
+        pos = 0
+        while pos < n:
+            take = min(n - pos, self.epoch_len - self._cnt)
+            self._sums += feats[:, pos:pos + take].sum(axis=1)
+            self._cnt += take
+            pos += take
+            if self._cnt == self.epoch_len:
+                # Steps confirmed a sample late still count towards the open epoch
+                self._steps += int(np.count_nonzero(step_epochs <= self._epoch))
+                step_epochs = step_epochs[step_epochs > self._epoch]
+                out.append(self._close_epoch())
+        self._steps += step_epochs.size
+        self._n += n
+        return out
+
+    def _close_epoch(self):
+        vm_sum, enmo_sum, bp_sum = self._sums
+        self.total_steps += self._steps
+        summary = (self._epoch, float(vm_sum / self._cnt), float(1000.0 * enmo_sum / self._cnt),
+                   int(round(COUNTS_PER_G_S * bp_sum / self.fs)), self._steps, self.total_steps)
+        self._epoch += 1
+        self._sums[:] = 0.0
+        self._cnt = 0
+        self._steps = 0
+        self.last = summary
+        return summary
+
+    def _detect_steps(self, y):
+        """Absolute sample indices of accepted step peaks in this batch."""
+        n = y.size
+        w = (1.0 - AMP_ALPHA) ** np.arange(n - 1, -1, -1)
+        self._amp = (1.0 - AMP_ALPHA) ** n * self._amp + AMP_ALPHA * float(np.dot(w, np.abs(y)))
+        thr = max(STEP_MIN_G, STEP_REL_THRESHOLD * self._amp)
+
+        z = np.concatenate((self._tail[2 - self._tail_n:], y))
+        base = self._n - self._tail_n
+        steps = []
+        if z.size >= 3:
+            mid = z[1:-1]
+            cand = np.flatnonzero((mid > z[:-2]) & (mid >= z[2:]) & (mid > thr)) + 1 + base
+            min_gap = STEP_MIN_INTERVAL_S * self.fs
+            for idx in cand.tolist():
+                if self._last_step is not None and idx - self._last_step < min_gap:
+                    continue
+                self._last_step = idx
+                steps.append(idx)
+        keep = min(2, z.size)
+        self._tail[2 - keep:] = z[-keep:]
+        self._tail_n = keep
+        return np.asarray(steps, dtype=np.int64)
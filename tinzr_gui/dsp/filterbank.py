@@ -0,0 +1,100 @@
+# =========================
+# File: dsp/filterbank.py
+# =========================
+"""
+Reusable, stateful filter-bank stage for multi-channel sensor streams.
+
+A FilterBank runs a chain of stages over a (channels, N) batch:
+    ("hampel",   k[, n_sigmas])  causal median despiking over the last k samples
+    ("highpass", f0[, q])        biquad
+    ("lowpass",  f0[, q])        biquad
+    ("notch",    f0[, q])        biquad
+Consecutive biquads are merged into one SOS cascade. All state (biquad
+state, median history) persists across calls, so feeding a stream in
+batches gives the same output as one long call. Corners above 0.45·fs are
+clamped so one preset works at the firmware's 10 Hz and 40 Hz settings.
+
+FILTER_PRESETS holds the per-stream defaults (IMU acc, gyro, PPG).
+"""
+import numpy as np
+
+from dsp import iir
+
+FILTER_PRESETS = {
+    "acc":  [("hampel", 5), ("lowpass", 3.0)],
+    "gyro": [("hampel", 5), ("lowpass", 3.0)],
+    "ppg":  [("hampel", 5), ("highpass", 0.5), ("lowpass", 4.0)],
+}
+
+MAD_TO_SIGMA = 1.4826
+MAX_CORNER_FRACTION = 0.45   # of fs
+
+
+class _Hampel:
+    """Causal Hampel filter: replace x[n] by the window median when it is an outlier."""
+
+    def __init__(self, channels, k=5, n_sigmas=3.0):
+        self.k = max(3, int(k))
+        self.n_sigmas = float(n_sigmas)
+        self.hist = np.empty((channels, 0))   # up to k-1 previous raw samples
+
+    def reset(self):
+        self.hist = np.empty((self.hist.shape[0], 0))
+
+    def process(self, x):
+        z = np.concatenate((self.hist, x), axis=1)
+        if z.shape[1] < self.k:
+            self.hist = z[:, -(self.k - 1):]
+            return x.copy()
+        win = np.lib.stride_tricks.sliding_window_view(z, self.k, axis=1)   # (C, M, k)
+        med = np.median(win, axis=2)
+        mad = MAD_TO_SIGMA * np.median(np.abs(win - med[..., None]), axis=2)
+        cur = z[:, self.k - 1:]
+        y = np.where(np.abs(cur - med) > self.n_sigmas * np.maximum(mad, 1e-12), med, cur)
+        # The first k-1 samples of a fresh stream have no full window yet
+        lead = x.shape[1] - y.shape[1]
+        if lead > 0:
+            y = np.concatenate((x[:, :lead], y), axis=1)
+        self.hist = z[:, -(self.k - 1):]
+        return y
+
+
+class FilterBank:
+    def __init__(self, fs, channels, stages):
+        self.fs = float(fs)
+        self.channels = int(channels)
+        self.stages = []
+        sos = []
+        for spec in stages:
+            kind, args = spec[0], spec[1:]
+            if kind == "hampel":
+                if sos:
+                    self.stages.append(iir.SosFilter(sos, self.channels)); sos = []
+                self.stages.append(_Hampel(self.channels, *args))
+                continue
+            design = {"lowpass": iir.lowpass, "highpass": iir.highpass, "notch": iir.notch}.get(kind)
+            if design is None:
+                raise ValueError(f"unknown filter stage {kind!r}")
+            f0 = min(float(args[0]), MAX_CORNER_FRACTION * self.fs)
+            sos.append(design(f0, self.fs, *args[1:]))
+        if sos:
+            self.stages.append(iir.SosFilter(sos, self.channels))
+
+    @classmethod
+    def preset(cls, name, fs, channels):
+        return cls(fs, channels, FILTER_PRESETS[name])
+
+    def reset(self):
+        for st in self.stages:
+            st.reset()
+
+    def process(self, x):
+        """(channels, N) batch in → filtered (channels, N) batch out."""
+        y = np.asarray(x, dtype=np.float64)
+        if y.ndim == 1:
+            y = y.reshape(self.channels, -1)
+        if y.shape[1] == 0:
+            return y.copy()
+        for st in self.stages:
+            y = st.process(y)
+        return y
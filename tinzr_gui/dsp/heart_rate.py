@@ -0,0 +1,145 @@
+# =========================
+# File: dsp/heart_rate.py
+# =========================
+"""
+Streaming heart-rate estimator for one PPG channel (IR by default).
+
+Per batch:
+  1. band-pass 0.5–4 Hz with stateful biquads (DC + high-frequency noise out)
+  2. vectorized local-maximum search above an adaptive amplitude threshold
+  3. beat acceptance: refractory period + inter-beat interval (IBI) outlier
+     rejection against the median of the last IBI_HISTORY accepted beats
+All state is fixed-size: filter state, two trailing samples, an IBI ring.
+
+Samples equal to 0 are the firmware's "no finger" marker
+(NO_FINGER_THRESHOLD): they are skipped and the beat chain is broken so no
+IBI spans the gap.
+"""
+import numpy as np
+
+from dsp.iir import SosFilter, bandpass_sos
+
+HR_BAND_HZ      = (0.5, 4.0)   # 30–240 BPM
+HR_MIN_BPM      = 30.0
+HR_MAX_BPM      = 220.0
+IBI_HISTORY     = 8            # accepted IBIs kept for the median
+IBI_TOLERANCE   = 0.30         # accept IBI within ±30% of the running median
+PEAK_THRESHOLD  = 0.5          # peak must exceed this × running mean |signal|
+AMP_ALPHA       = 0.05         # EMA factor for the running amplitude (per sample)
+
+
+class HeartRateEstimator:
+    def __init__(self, fs):
+        self.fs = float(fs)
+        self._filt = SosFilter(bandpass_sos(HR_BAND_HZ[0], min(HR_BAND_HZ[1], 0.45 * self.fs), self.fs))
+        self.reset()
+
+    def reset(self):
+        self._filt.reset()
+        self._n = 0                     # absolute index of the next valid sample
+        self._tail = np.zeros(2)        # last two filtered samples (peak test across batches)
+        self._tail_n = 0                # how many of _tail are valid
+        self._amp = 0.0                 # running mean |filtered|
+        self._last_peak = None          # sample index of last accepted beat
+        self._ibis = np.zeros(IBI_HISTORY)
+        self._ibi_count = 0
+        self._pending_outlier = None    # last rejected IBI (two in a row → rhythm change)
+        self.bpm = None
+
+    @property
+    def min_ibi(self):
+        return self.fs * 60.0 / HR_MAX_BPM
+
+    @property
+    def max_ibi(self):
+        return self.fs * 60.0 / HR_MIN_BPM
+
+    def _ibi_median(self):
+        k = min(self._ibi_count, IBI_HISTORY)
+        return float(np.median(self._ibis[:k])) if k else None
+
+    def process(self, samples):
+        """
+        Feed raw samples (any length). Returns a list of accepted beats as
+        (sample_index, bpm, ibi_seconds) — sample_index is fractional (counts
+        finger-on samples only); self.bpm holds the latest estimate.
+        """
+        x = np.asarray(samples, dtype=np.float64).reshape(-1)
+        if x.size == 0:
+            return []
+        beats = []
+        valid = x > 0
+        if not valid.all():
+            # Process each finger-on run separately; break the beat chain at gaps
+            edges = np.flatnonzero(np.diff(np.concatenate(([0], valid.astype(np.int8), [0]))))
+            for a, b in zip(edges[0::2], edges[1::2]):
+                beats += self._process_run(x[a:b])
+                self._break_chain()
+            if not valid[-1]:
+                self._filt.reset()      # re-prime on the next finger-on sample
+            return beats
+        return self._process_run(x)
+
+    def _break_chain(self):
+        self._last_peak = None
+        self._tail_n = 0
+
+    def _process_run(self, x):
+        y = self._filt.process(x)
+
+        # Running amplitude: per-sample EMA, evaluated in closed form per batch
+        n = y.size
+        w = (1.0 - AMP_ALPHA) ** np.arange(n - 1, -1, -1)
+        self._amp = (1.0 - AMP_ALPHA) ** n * self._amp + AMP_ALPHA * float(np.dot(w, np.abs(y)))
+        thr = PEAK_THRESHOLD * self._amp
+
+        # Local maxima, including the two samples carried over from the last batch
+        z = np.concatenate((self._tail[2 - self._tail_n:], y))
+        base = self._n - self._tail_n
+        if z.size >= 3:
+            mid = z[1:-1]
+            cand = np.flatnonzero((mid > z[:-2]) & (mid >= z[2:]) & (mid > thr)) + 1
+        else:
+            cand = ()
+
+        beats = []
+        for i in cand:
+            # Parabolic interpolation: sub-sample peak time (matters at 10 Hz)
+            den = z[i - 1] - 2.0 * z[i] + z[i + 1]
+            frac = 0.5 * (z[i - 1] - z[i + 1]) / den if den < 0 else 0.0
+            idx = base + int(i) + frac
+            if self._last_peak is None:
+                self._last_peak = idx
+                continue
+            ibi = idx - self._last_peak
+            if ibi < self.min_ibi:
+                continue                        # refractory: same beat / dicrotic notch
+            self._last_peak = idx
+            if ibi > self.max_ibi:
+                continue                        # missed beats; restart the chain here
+            med = self._ibi_median()
+            if med is not None and self._ibi_count >= 3 and abs(ibi - med) > IBI_TOLERANCE * med:
+                # Outlier: keep it in the history only if the rhythm really changed
+                self._push_ibi(ibi, weight_only=True)
+                continue
+            self._push_ibi(ibi)
+            self.bpm = 60.0 * self.fs / self._ibi_median()
+            beats.append((idx, self.bpm, ibi / self.fs))
+
+        self._n += n
+        keep = min(2, z.size)
+        self._tail[2 - keep:] = z[-keep:]
+        self._tail_n = keep
+        return beats
+
+    def _push_ibi(self, ibi, weight_only=False):
+        if weight_only:
+            # Let a persistent new rhythm in slowly: replace the oldest entry only
+            # when the outlier agrees with the previous outlier (two in a row).
+            prev = self._pending_outlier
+            self._pending_outlier = ibi
+            if prev is None or abs(ibi - prev) > IBI_TOLERANCE * prev:
+                return
+        self._pending_outlier = None
+        self._ibis[self._ibi_count % IBI_HISTORY] = ibi
+        self._ibi_count += 1
@@ -0,0 +1,109 @@
+# =========================
+# File: dsp/iir.py
+# =========================
+"""
+Biquad (second-order section) design + a stateful SOS filter.
+
+- Designs follow the RBJ audio-EQ cookbook; rows use scipy's SOS layout
+  [b0, b1, b2, 1, a1, a2] so they can be handed to scipy.signal if present.
+- SosFilter keeps its state between calls, so a stream can be fed in
+  batches of any size with the same result as one long call.
+- Batches are (channels, N) arrays: scipy.signal.sosfilt does the whole
+  batch in C when scipy is installed; otherwise a transposed direct-form II
+  loop over time, vectorized across channels (O(1) per sample).
+"""
+import math
+
+import numpy as np
+
+try:
+    from scipy.signal import sosfilt as _sosfilt
+except Exception:
+    _sosfilt = None
+
+BUTTERWORTH_Q = 1.0 / math.sqrt(2.0)
+
+
+def _biquad(b0, b1, b2, a0, a1, a2):
+    return [b0 / a0, b1 / a0, b2 / a0, 1.0, a1 / a0, a2 / a0]
+
+
+def _w0_alpha(f0, fs, q):
+    if not (0.0 < f0 < fs / 2.0):
+        raise ValueError(f"corner {f0} Hz must be inside (0, fs/2={fs / 2.0} Hz)")
+    w0 = 2.0 * math.pi * f0 / fs
+    return math.cos(w0), math.sin(w0) / (2.0 * q)
+
+
+def lowpass(f0, fs, q=BUTTERWORTH_Q):
+    cw, alpha = _w0_alpha(f0, fs, q)
+    return _biquad((1 - cw) / 2, 1 - cw, (1 - cw) / 2, 1 + alpha, -2 * cw, 1 - alpha)
+
+
+def highpass(f0, fs, q=BUTTERWORTH_Q):
+    cw, alpha = _w0_alpha(f0, fs, q)
+    return _biquad((1 + cw) / 2, -(1 + cw), (1 + cw) / 2, 1 + alpha, -2 * cw, 1 - alpha)
+
+
+def notch(f0, fs, q=5.0):
+    cw, alpha = _w0_alpha(f0, fs, q)
+    return _biquad(1.0, -2 * cw, 1.0, 1 + alpha, -2 * cw, 1 - alpha)
+
+
+def bandpass_sos(f_lo, f_hi, fs):
+    """High-pass at f_lo cascaded with low-pass at f_hi (2nd order each)."""
+    return np.array([highpass(f_lo, fs), lowpass(f_hi, fs)], dtype=np.float64)
+
+
+class SosFilter:
+    """Cascade of biquads with persistent per-channel state."""
+
+    def __init__(self, sos, channels=1):
+        self.sos = np.atleast_2d(np.asarray(sos, dtype=np.float64))
+        self.channels = int(channels)
+        self.zi = np.zeros((len(self.sos), self.channels, 2), dtype=np.float64)
+        self.primed = False
+
+    def reset(self):
+        self.zi[:] = 0.0
+        self.primed = False
+
+    def prime(self, x0):
+        """Set the state to the steady state for a constant input x0 (per channel).
+
+        Avoids the large start-up transient a high-pass section would otherwise
+        ring out when fed raw sensor counts with a big DC offset.
+        """
+        x = np.broadcast_to(np.asarray(x0, dtype=np.float64), (self.channels,)).copy()
+        for k, (b0, b1, b2, _a0, a1, a2) in enumerate(self.sos):
+            y = x * (b0 + b1 + b2) / (1.0 + a1 + a2)
+            self.zi[k, :, 1] = b2 * x - a2 * y
+            self.zi[k, :, 0] = b1 * x - a1 * y + self.zi[k, :, 1]
+            x = y
+        self.primed = True
+
+    def process(self, x):
+        """Filter a (channels, N) batch (or (N,) for one channel); returns same shape."""
+        x = np.asarray(x, dtype=np.float64)
+        one_d = x.ndim == 1
+        x2 = x.reshape(1, -1) if one_d else x
+        if x2.shape[1] == 0:
+            return x.copy()
+        if not self.primed:
+            self.prime(x2[:, 0])
+
+        if _sosfilt is not None:
+            y, self.zi = _sosfilt(self.sos, x2, axis=-1, zi=self.zi)
+        else:
+            y = x2.copy()
+            for k, (b0, b1, b2, _a0, a1, a2) in enumerate(self.sos):
+                z0, z1 = self.zi[k, :, 0].copy(), self.zi[k, :, 1].copy()
+                col = y  # filtered in place, section by section
+                for n in range(col.shape[1]):
+                    xn = col[:, n].copy()
+                    yn = b0 * xn + z0
+                    z0 = b1 * xn - a1 * yn + z1
+                    z1 = b2 * xn - a2 * yn
+                    col[:, n] = yn
+                self.zi[k, :, 0], self.zi[k, :, 1] = z0, z1
+        return y.reshape(-1) if one_d else y
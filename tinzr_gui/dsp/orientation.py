@@ -0,0 +1,193 @@
+# =========================
+# File: dsp/orientation.py
+# =========================
+"""
+Orientation fusion (6-axis IMU: accel + gyro) → quaternion → roll/pitch/yaw.
+
+OrientationFilter keeps one quaternion per device, stored as a (D, 4) array,
+and updates all devices together with vectorized quaternion math:
+  - "madgwick": gradient-descent correction towards gravity (gain beta)
+  - "mahony":   PI correction of the gyro rate from the accel cross product
+The per-sample recursion is inherently sequential, so a batch is walked in
+time while every step is one NumPy expression across devices; unit
+conversion, accel normalization and the Euler output are whole-batch ops.
+
+Yaw has no magnetometer reference and drifts with the gyro bias.
+
+Benchmark (replayed IMU lines or a synthetic motion, pushed through at 1 kHz):
+    python -m dsp.orientation [REC_*.CSV] [--rate 1000] [--devices 1]
+"""
+import sys
+import time
+
+import numpy as np
+
+MADGWICK_BETA = 0.1        # rad/s gradient gain
+MAHONY_KP     = 1.0
+MAHONY_KI     = 0.0
+GYRO_UNITS    = "dps"      # firmware sends deg/s
+ORIENTATION_ALGOS = ("madgwick", "mahony")
+
+
+def quat_from_accel(acc):
+    """(D, 3) gravity vector → (D, 4) quaternion with zero yaw."""
+    a = np.asarray(acc, dtype=np.float64)
+    roll = np.arctan2(a[:, 1], a[:, 2])
+    pitch = np.arctan2(-a[:, 0], np.hypot(a[:, 1], a[:, 2]))
+    cr, sr = np.cos(roll / 2), np.sin(roll / 2)
+    cp, sp = np.cos(pitch / 2), np.sin(pitch / 2)
+    return np.stack((cr * cp, sr * cp, cr * sp, -sr * sp), axis=1)
+
+
+def quat_to_euler(q):
+    """(..., 4) quaternion(s) → (..., 3) roll, pitch, yaw in degrees."""
+    q0, q1, q2, q3 = np.moveaxis(np.asarray(q), -1, 0)
+    roll = np.arctan2(2 * (q0 * q1 + q2 * q3), 1 - 2 * (q1 * q1 + q2 * q2))
+    pitch = np.arcsin(np.clip(2 * (q0 * q2 - q3 * q1), -1.0, 1.0))
+    yaw = np.arctan2(2 * (q0 * q3 + q1 * q2), 1 - 2 * (q2 * q2 + q3 * q3))
+    return np.degrees(np.stack((roll, pitch, yaw), axis=-1))
+
+
+class OrientationFilter:
+    def __init__(self, fs, devices=1, algo="madgwick", beta=MADGWICK_BETA,
+                 kp=MAHONY_KP, ki=MAHONY_KI):
+        if algo not in ORIENTATION_ALGOS:
+            raise ValueError(f"unknown orientation algorithm {algo!r}")
+        self.fs = float(fs)
+        self.devices = int(devices)
+        self.algo = algo
+        self.beta, self.kp, self.ki = float(beta), float(kp), float(ki)
+        self.reset()
+
+    def reset(self):
+        self.q = np.zeros((self.devices, 4))
+        self.q[:, 0] = 1.0
+        self._bias = np.zeros((self.devices, 3))   # Mahony integral term
+        self.primed = False
+
+    def process(self, acc, gyro):
+        """
+        acc, gyro: (3, N) for one device or (D, 3, N). Returns roll/pitch/yaw
+        in degrees with the same leading shape: (3, N) or (D, 3, N).
+        """
+        acc = np.asarray(acc, dtype=np.float64)
+        gyro = np.asarray(gyro, dtype=np.float64)
+        one = acc.ndim == 2
+        if one:
+            acc, gyro = acc[None], gyro[None]
+        n = acc.shape[2]
+        if n == 0:
+            return np.empty((3, 0) if one else (self.devices, 3, 0))
+        out = np.empty((self.devices, n, 4))
+
+        # Whole-batch prep: rad/s, unit gravity (zero-norm samples → no correction)
+        g = np.radians(gyro) if GYRO_UNITS == "dps" else gyro
+        norm = np.linalg.norm(acc, axis=1, keepdims=True)
+        has_acc = norm[:, 0, :] > 0
+        a = np.divide(acc, norm, out=np.zeros_like(acc), where=norm > 0)
+        if not self.primed:
+            self.q = quat_from_accel(a[:, :, 0])
+            self.primed = True
+
+        step = self._step_madgwick if self.algo == "madgwick" else self._step_mahony
+        dt = 1.0 / self.fs
+        q = self.q
+        for i in range(n):
+            q = step(q, a[:, :, i], has_acc[:, i], g[:, :, i], dt)
+            out[:, i] = q
+        self.q = q
+        eul = quat_to_euler(out).transpose(0, 2, 1)   # (D, 3, N)
+        return eul[0] if one else eul
+
+    # ---- one time step for all devices: q (D, 4), a/g (D, 3), ok (D,) ----
+    @staticmethod
+    def _q_rate(q, gx, gy, gz):
+        q0, q1, q2, q3 = q.T
+        return 0.5 * np.stack((-q1 * gx - q2 * gy - q3 * gz,
+                               q0 * gx + q2 * gz - q3 * gy,
+                               q0 * gy - q1 * gz + q3 * gx,
+                               q0 * gz + q1 * gy - q2 * gx), axis=1)
+
+    def _step_madgwick(self, q, a, ok, g, dt):
+        q0, q1, q2, q3 = q.T
+        ax, ay, az = a.T
+        # Objective f (predicted − measured gravity) and its Jacobian-transpose
+        f0 = 2 * (q1 * q3 - q0 * q2) - ax
+        f1 = 2 * (q0 * q1 + q2 * q3) - ay
+        f2 = 2 * (0.5 - q1 * q1 - q2 * q2) - az
+        s = np.stack((-2 * q2 * f0 + 2 * q1 * f1,
+                      2 * q3 * f0 + 2 * q0 * f1 - 4 * q1 * f2,
+                      -2 * q0 * f0 + 2 * q3 * f1 - 4 * q2 * f2,
+                      2 * q1 * f0 + 2 * q2 * f1), axis=1)
+        sn = np.linalg.norm(s, axis=1, keepdims=True)
+        s = np.divide(s, sn, out=np.zeros_like(s), where=sn > 0) * ok[:, None]
+        q = q + (self._q_rate(q, *g.T) - self.beta * s) * dt
+        return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+    def _step_mahony(self, q, a, ok, g, dt):
+        q0, q1, q2, q3 = q.T
+        # Estimated gravity direction vs measured → rotation error
+        v = np.stack((2 * (q1 * q3 - q0 * q2),
+                      2 * (q0 * q1 + q2 * q3),
+                      q0 * q0 - q1 * q1 - q2 * q2 + q3 * q3), axis=1)
+        e = np.cross(a, v) * ok[:, None]
+        if self.ki > 0:
+            self._bias += self.ki * e * dt
+        g = g + self.kp * e + self._bias
+        q = q + self._q_rate(q, *g.T) * dt
+        return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+
+# ===================== benchmark =====================
+def _replay_imu(path):
+    """IMU rows from a recording / SD log → (6, N) array of ax..gz."""
+    from recording.sdlog import plain, read_sdlog
+    rec = read_sdlog(path, sources=("IMU",)).get("IMU")
+    if rec is None:
+        return np.empty((6, 0))
+    return plain(rec)[:, 1:7].T
+
+
+def _synthetic_imu(n, rate):
+    t = np.arange(n) / rate
+    roll = 30 * np.sin(2 * np.pi * 0.3 * t)
+    pitch = 20 * np.sin(2 * np.pi * 0.2 * t)
+    r, p = np.radians(roll), np.radians(pitch)
+    acc = 9.81 * np.stack((-np.sin(p), np.sin(r) * np.cos(p), np.cos(r) * np.cos(p)))
+    droll, dpitch = np.gradient(roll, t), np.gradient(pitch, t)
+    # Euler rates → body rates (yaw held at zero)
+    gyro = np.stack((droll, dpitch * np.cos(r), -dpitch * np.sin(r)))
+    return np.vstack((acc, gyro))
+
+
+def benchmark(path=None, rate=1000.0, devices=1, seconds=10.0, batch_ms=100, algo="madgwick"):
+    imu = _replay_imu(path) if path else _synthetic_imu(int(rate * seconds), rate)
+    n = imu.shape[1]
+    if n == 0:
+        raise ValueError(f"no IMU samples in {path}")
+    data = np.broadcast_to(imu, (devices,) + imu.shape)
+    flt = OrientationFilter(rate, devices=devices, algo=algo)
+    batch = max(1, int(rate * batch_ms / 1000.0))
+    t0 = time.perf_counter()
+    for i in range(0, n, batch):
+        flt.process(data[:, 0:3, i:i + batch], data[:, 3:6, i:i + batch])
+    dt = time.perf_counter() - t0
+    per_s = n * devices / dt
+    print(f"{algo}: {n} samples x {devices} device(s) in {dt * 1000:.1f} ms "
+          f"→ {per_s:,.0f} samples/s ({per_s / (rate * devices):.1f}x real time @ {rate:g} Hz)")
+    return per_s
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Orientation fusion throughput benchmark")
+    ap.add_argument("recording", nargs="?", help="REC_*.CSV / SD log to replay (default: synthetic)")
+    ap.add_argument("--rate", type=float, default=1000.0, help="replay sample rate in Hz")
+    ap.add_argument("--devices", type=int, default=1)
+    ap.add_argument("--algo", choices=ORIENTATION_ALGOS, default="madgwick")
+    args = ap.parse_args()
+    try:
+        benchmark(args.recording, args.rate, args.devices, algo=args.algo)
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,145 @@
+# =========================
+# File: dsp/spo2.py
+# =========================
+"""
+Incremental SpO2 estimator (ratio of ratios) from RED and IR.
+
+For each beat window (boundaries come from HeartRateEstimator beats):
+    AC = running max − running min        DC = running mean
+    R  = (AC_red / DC_red) / (AC_ir / DC_ir)
+    SpO2 = -45.060·R² + 30.354·R + 94.845  (Maxim MAX3010x calibration)
+
+Only O(1) accumulators are kept per channel (max, min, sum, count); a batch
+is folded in with one NumPy reduction per window segment. A signal-quality
+index (SQI, 0..1) scores each window; only windows with SQI ≥ SQI_MIN move
+the smoothed estimate.
+
+No-finger samples (firmware sends 0 below NO_FINGER_THRESHOLD) pause the
+estimator: the partial window is dropped, but the smoothed SpO2, R history
+and SQI are kept, so readings resume immediately when the finger returns.
+"""
+import numpy as np
+
+SPO2_COEFFS      = (-45.060, 30.354, 94.845)   # a·R² + b·R + c
+R_RANGE          = (0.3, 2.0)      # physiologically plausible ratio
+PI_RANGE         = (0.0005, 0.2)   # perfusion index AC/DC (IR)
+WINDOW_S         = (0.25, 2.5)     # beat window duration bounds
+SQI_MIN          = 0.5
+SPO2_ALPHA       = 0.3             # EMA over accepted beats
+R_DEV_SCALE      = 0.15            # R jitter that halves the consistency score
+
+
+def spo2_from_ratio(r):
+    a, b, c = SPO2_COEFFS
+    return float(np.clip(a * r * r + b * r + c, 0.0, 100.0))
+
+
+class SpO2Estimator:
+    def __init__(self, fs):
+        self.fs = float(fs)
+        self.reset()
+
+    def reset(self):
+        self._n = 0                      # finger-on sample counter (same clock as HR)
+        self._open_window()
+        self._r_ema = None
+        self.spo2 = None
+        self.sqi = 0.0
+        self.ratio = None
+        self.paused = False
+
+    def _open_window(self, aligned=False):
+        self._mx = np.full(2, -np.inf)    # [red, ir]
+        self._mn = np.full(2, np.inf)
+        self._sum = np.zeros(2)
+        self._cnt = 0
+        self._aligned = aligned           # window opened on a beat boundary
+
+    def process(self, ir, red, beats=()):
+        """
+        ir, red: raw sample arrays (same length). beats: iterable of
+        (sample_index, ...) from HeartRateEstimator.process on the same IR
+        batch. Returns [(sample_index, spo2, sqi, ratio)] for each closed window.
+        """
+        ir = np.asarray(ir, dtype=np.float64).reshape(-1)
+        red = np.asarray(red, dtype=np.float64).reshape(-1)
+        valid = (ir > 0) & (red > 0)
+        if valid.all():
+            self.paused = False
+            return self._process_run(ir, red, beats)
+
+        # Finger-off samples: fold each finger-on run separately, pausing
+        # (dropping the partial window) at every gap.
+        beats = list(beats)
+        out = []
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], valid.astype(np.int8), [0]))))
+        for a, b in zip(edges[0::2], edges[1::2]):
+            if a > 0:
+                self._pause()           # a gap precedes this run
+            self.paused = False
+            lo, hi = self._n, self._n + (b - a)
+            run_beats = [bt for bt in beats if lo <= bt[0] < hi]
+            out += self._process_run(ir[a:b], red[a:b], run_beats)
+        if not valid[-1]:
+            self._pause()
+        return out
+
+    def _process_run(self, ir, red, beats):
+        x = np.vstack((red, ir))         # (2, N)
+        start = self._n
+        stops = sorted(int(b[0]) for b in beats)
+        out = []
+        pos = 0
+        for b in stops:
+            # Beats can lag the batch by up to two samples (peak confirmation)
+            cut = min(max(b - start, 0), x.shape[1])
+            self._fold(x[:, pos:cut])
+            pos = cut
+            res = self._close_window(start + cut)
+            if res is not None:
+                out.append(res)
+        self._fold(x[:, pos:])
+        self._n += x.shape[1]
+        return out
+
+    def _pause(self):
+        self.paused = True
+        self._open_window()
+
+    def _fold(self, seg):
+        if seg.shape[1] == 0:
+            return
+        np.maximum(self._mx, seg.max(axis=1), out=self._mx)
+        np.minimum(self._mn, seg.min(axis=1), out=self._mn)
+        self._sum += seg.sum(axis=1)
+        self._cnt += seg.shape[1]
+
+    def _close_window(self, at):
+        """Close the current beat window at sample `at`; returns a result or None."""
+        cnt, aligned = self._cnt, self._aligned
+        ac = self._mx - self._mn
+        dc = self._sum / max(cnt, 1)
+        self._open_window(aligned=True)
+
+        dur = cnt / self.fs
+        if not aligned or cnt < 2 or not (WINDOW_S[0] <= dur <= WINDOW_S[1]) or np.any(dc <= 0) or ac[1] <= 0:
+            return None
+        pi_red, pi_ir = ac / dc
+        r = pi_red / pi_ir
+        self.ratio = r
+
+        # --- signal-quality index ---
+        q_pi = 1.0 if PI_RANGE[0] <= pi_ir <= PI_RANGE[1] else 0.0
+        q_r = 1.0 if R_RANGE[0] <= r <= R_RANGE[1] else 0.0
+        if self._r_ema is None:
+            q_cons = 0.5
+        else:
+            q_cons = 1.0 / (1.0 + abs(r - self._r_ema) / R_DEV_SCALE)
+        self.sqi = q_pi * q_r * q_cons
+
+        if q_pi and q_r:
+            self._r_ema = r if self._r_ema is None else self._r_ema + SPO2_ALPHA * (r - self._r_ema)
+        if self.sqi >= SQI_MIN or (self.spo2 is None and q_pi and q_r):
+            est = spo2_from_ratio(r)
+            self.spo2 = est if self.spo2 is None else self.spo2 + SPO2_ALPHA * (est - self.spo2)
+        return (at, self.spo2, self.sqi, r)
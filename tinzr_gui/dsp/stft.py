@@ -0,0 +1,87 @@
+# =========================
+# File: dsp/stft.py
+# =========================
+"""
+Incremental short-time Fourier transform for one channel.
+
+Samples go into a double-written ring (every sample stored at i and i+nfft),
+so the latest nfft samples are always one contiguous view — no np.roll and
+no copies. Every `hop` samples a new column is produced:
+    frame = (ring_view − mean) · window      (precomputed Hann, reused buffer)
+    col   = 20·log10(|rfft(frame)| + eps)     (reused output array)
+Only the new columns are computed; history lives in whatever consumes them
+(e.g. a scrolling image).
+"""
+import numpy as np
+
+DB_FLOOR_EPS = 1e-9
+
+
+class StreamingSTFT:
+    def __init__(self, nfft=64, hop=8, fs=10.0):
+        self.nfft = int(nfft)
+        self.hop = max(1, int(hop))
+        self.fs = float(fs)
+        self.window = np.hanning(self.nfft)
+        # Scale so a full-scale sine reads as its amplitude
+        self._win_gain = 2.0 / self.window.sum()
+        self._ring = np.zeros(2 * self.nfft)
+        self._frame = np.empty(self.nfft)
+        self._mag = np.empty(self.nfft // 2 + 1)
+        self.freqs = np.fft.rfftfreq(self.nfft, d=1.0 / self.fs)
+        self.reset()
+
+    @property
+    def bins(self):
+        return self._mag.size
+
+    def reset(self):
+        self._ring[:] = 0.0
+        self._pos = 0          # next write index in [0, nfft)
+        self._filled = 0       # samples seen, capped at nfft
+        self._since_hop = 0
+
+    def _push(self, x):
+        """Write a chunk of ≤ nfft samples into the double ring."""
+        n, N = x.size, self.nfft
+        first = min(n, N - self._pos)
+        self._ring[self._pos:self._pos + first] = x[:first]
+        self._ring[self._pos + N:self._pos + N + first] = x[:first]
+        if first < n:
+            rest = n - first
+            self._ring[:rest] = x[first:]
+            self._ring[N:N + rest] = x[first:]
+        self._pos = (self._pos + n) % N
+        self._filled = min(N, self._filled + n)
+
+    def _column(self):
+        view = self._ring[self._pos:self._pos + self.nfft]   # oldest → newest
+        np.subtract(view, view.mean(), out=self._frame)
+        self._frame *= self.window
+        np.abs(np.fft.rfft(self._frame), out=self._mag)
+        self._mag *= self._win_gain
+        np.add(self._mag, DB_FLOOR_EPS, out=self._mag)
+        np.log10(self._mag, out=self._mag)
+        self._mag *= 20.0
+        return self._mag
+
+    def process(self, samples, on_column):
+        """
+        Feed samples; calls on_column(col_db) for every completed hop once the
+        window is full. col_db is a reused array — copy it if you keep it.
+        Returns the number of columns produced.
+        """
+        x = np.asarray(samples, dtype=np.float64).reshape(-1)
+        cols = 0
+        i = 0
+        while i < x.size:
+            take = min(x.size - i, self.hop - self._since_hop)
+            self._push(x[i:i + take])
+            i += take
+            self._since_hop += take
+            if self._since_hop >= self.hop:
+                self._since_hop = 0
+                if self._filled >= self.nfft:
+                    on_column(self._column())
+                    cols += 1
+        return cols
@@ -0,0 +1,37 @@
+# =========================
+# File: dsp/streams.py
+# =========================
+"""
+Tiny publish/subscribe hub for derived sample streams.
+
+Producers publish (channels, N) NumPy blocks under a stream name
+("acc.filt", "ppg.filt", ...); any number of consumers (live plots,
+the recorder, further DSP stages) subscribe by name. Callbacks run
+synchronously on the Tk thread, in subscription order.
+"""
+
+
+class StreamHub:
+    def __init__(self):
+        self._subs = {}   # name -> [callback(block)]
+
+    def subscribe(self, name, callback):
+        self._subs.setdefault(name, []).append(callback)
+        return (name, callback)
+
+    def unsubscribe(self, token):
+        name, callback = token
+        try:
+            self._subs.get(name, []).remove(callback)
+        except ValueError:
+            pass
+
+    def has_subscribers(self, name) -> bool:
+        return bool(self._subs.get(name))
+
+    def publish(self, name, block):
+        for cb in list(self._subs.get(name, ())):
+            try:
+                cb(block)
+            except Exception as e:
+                print(f"stream {name} subscriber error: {e}")
@@ -6,6 +6,7 @@ import tkinter as tk
 from tkinter import ttk
 
 REFRESH_INTERVAL_MS = 10 * 60 * 1000  # 10 minutes
+BAT_SEGMENTS = 5
 
 def _clamp(v, lo, hi): return max(lo, min(hi, v))
 
@@ -73,6 +74,12 @@ class BatteryTab(ttk.Frame):
         self.refresh_icon.bind("<Enter>", lambda e: self.refresh_icon.configure(foreground=hover_fg))
         self.refresh_icon.bind("<Leave>", lambda e: self.refresh_icon.configure(foreground=base_fg))
 
+        # Battery drawing items (created once; _draw_icon only updates them)
+        self._icon_items = None
+        self._icon_size = None
+        self._seg_colors = None
+        self._icon_layouts = {}
+
         self._draw_icon(0)
 
         # Listen for BLE battery messages from anywhere in the app (virtual events)
@@ -202,14 +209,11 @@ class BatteryTab(ttk.Frame):
             pass
         return "#f1f5f9"  # SB_SURFACE fallback
 
-    def _draw_icon(self, percent):
-        c = self.canvas
-        # Delete only the battery drawing, keep everything else
-        c.delete("bat")
-
-        # Current canvas size
-        w = int(float(c.cget("width")))
-        h = int(float(c.cget("height")))
+    def _icon_layout(self, w, h):
+        """Scaled coordinates for body, cap and segments (cached per canvas size)."""
+        lay = self._icon_layouts.get((w, h))
+        if lay is not None:
+            return lay
 
         # Base design size (original coordinates)
         BW, BH = 120.0, 48.0
@@ -219,26 +223,57 @@ class BatteryTab(ttk.Frame):
         def X(x): return x * sx
         def Y(y): return y * sy
 
-        stroke = "#1f2937"  # gray-800
-        stroke_w = max(1, int(2 * s))
-
-        # body (scaled)
+        # body / cap (scaled)
         x0, y0, x1, y1 = X(10), Y(10), X(100), Y(38)
-        c.create_rectangle(x0, y0, x1, y1, outline=stroke, width=stroke_w, tags="bat")
-
-        # cap (scaled)
-        c.create_rectangle(X(100), Y(16), X(110), Y(32), outline=stroke, width=stroke_w, tags="bat")
+        body = (x0, y0, x1, y1)
+        cap = (X(100), Y(16), X(110), Y(32))
 
         # segments (scaled)
-        segs = 5
         inner_pad = X(8)  # horizontal inset inside body
-        seg_w = (x1 - x0 - inner_pad) / segs
-        filled = _clamp((percent + (100//segs - 1)) // (100//segs), 0, segs)
-        color_on = self._fill_color(percent)
-        color_off = "#e5e7eb"  # gray-200
-
-        for i in range(segs):
+        seg_w = (x1 - x0 - inner_pad) / BAT_SEGMENTS
+        segs = []
+        for i in range(BAT_SEGMENTS):
             sx0 = x0 + X(4) + i * seg_w
             sx1 = sx0 + seg_w - X(2)
-            c.create_rectangle(sx0, y0 + Y(4), sx1, y1 - Y(4),
-                               outline="", fill=(color_on if i < filled else color_off), tags="bat")
+            segs.append((sx0, y0 + Y(4), sx1, y1 - Y(4)))
+
+        lay = {"body": body, "cap": cap, "segs": segs, "stroke_w": max(1, int(2 * s))}
+        self._icon_layouts[(w, h)] = lay
+        return lay
+
+    def _draw_icon(self, percent):
+        c = self.canvas
+
+        # Current canvas size
+        w = int(float(c.cget("width")))
+        h = int(float(c.cget("height")))
+        lay = self._icon_layout(w, h)
+
+        stroke = "#1f2937"  # gray-800
+        if self._icon_items is None:
+            # First call: create every item once (tagged "bat")
+            body = c.create_rectangle(*lay["body"], outline=stroke, width=lay["stroke_w"], tags="bat")
+            cap = c.create_rectangle(*lay["cap"], outline=stroke, width=lay["stroke_w"], tags="bat")
+            segs = [c.create_rectangle(*box, outline="", fill="", tags="bat") for box in lay["segs"]]
+            self._icon_items = (body, cap, segs)
+            self._icon_size = (w, h)
+            self._seg_colors = [None] * BAT_SEGMENTS
+        elif self._icon_size != (w, h):
+            # Canvas resized: move items, no re-creation
+            body, cap, segs = self._icon_items
+            c.coords(body, *lay["body"]); c.itemconfig(body, width=lay["stroke_w"])
+            c.coords(cap, *lay["cap"]);   c.itemconfig(cap, width=lay["stroke_w"])
+            for iid, box in zip(segs, lay["segs"]):
+                c.coords(iid, *box)
+            self._icon_size = (w, h)
+
+        # Segment fills: only touch the ones whose color changed
+        filled = _clamp((percent + (100//BAT_SEGMENTS - 1)) // (100//BAT_SEGMENTS), 0, BAT_SEGMENTS)
+        color_on = self._fill_color(percent)
+        color_off = "#e5e7eb"  # gray-200
+        segs = self._icon_items[2]
+        for i, iid in enumerate(segs):
+            color = color_on if i < filled else color_off
+            if self._seg_colors[i] != color:
+                c.itemconfig(iid, fill=color)
+                self._seg_colors[i] = color
@@ -2,32 +2,59 @@
 # File: modules/imu.py
 # =========================
 import tkinter as tk
-from tkinter import ttk
+from tkinter import filedialog, ttk
 from collections import deque
 
+import numpy as np
+
 # Reuse the same pretty toggle switch from the LED tab
 from modules.led import ToggleSwitch
-
-try:
-    from matplotlib.figure import Figure
-    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-    _HAVE_MPL = True
-except Exception:
-    _HAVE_MPL = False
+from modules.plots import PLOT_BACKENDS, DEFAULT_PLOT_BACKEND, channels, have_matplotlib, make_backend
+from modules.spectrogram import SpectrogramView
+from dsp.activity import ActivityMeter, intensity
+from dsp.filterbank import FilterBank
+from dsp.heart_rate import HeartRateEstimator
+from dsp.orientation import OrientationFilter
+from dsp.spo2 import SpO2Estimator
+from dsp.streams import StreamHub
+from recording.recorder import RECORDINGS_DIR, Recorder
+from recording.replay import ReplaySource
+from recording.sdlog import plain
 
 # ---- plotting / buffer params (defaults) ----
 DEFAULT_HISTORY_SAMPLES = 300   # ~30s @ 10 Hz
 REDRAW_EVERY_MS         = 100   # redraw throttle
 CENTER_WINDOW           = 100   # samples for rolling centering
-
-# Fixed y-limits per channel (tweak as you like)
-ACC_YLIM = (-30, 30)        # g
-GYR_YLIM = (-500, 500)      # dps
-
-# PPG auto-scale guard rails
-PPG_MIN_RANGE       = 50.0   # if data is flat, enforce at least this range
-PPG_MARGIN_RATIO    = 0.10   # 10% margin top & bottom
-PPG_WINDOW_FRACTION = 1.0    # use full visible window for autoscale (1.0 = all points)
+PPG_SAMPLE_RATE_HZ      = 10.0  # firmware PPG_INTERVAL_MS = 100 (set 40.0 for 25 ms)
+IMU_SAMPLE_RATE_HZ      = 10.0  # firmware IMU_INTERVAL_MS = 100
+
+# Raw (uncentered) streams published on ImuTab.streams: name -> (fs, plot keys)
+RAW_STREAMS = {
+    "acc.raw":  (IMU_SAMPLE_RATE_HZ, ("ax", "ay", "az")),
+    "gyro.raw": (IMU_SAMPLE_RATE_HZ, ("gx", "gy", "gz")),
+    "ppg.raw":  (PPG_SAMPLE_RATE_HZ, ("ir", "red", "grn")),
+}
+
+# Filtered streams published on ImuTab.streams: name -> (preset, fs, plot keys)
+FILTERED_STREAMS = {
+    "acc.filt":  ("acc",  IMU_SAMPLE_RATE_HZ, ("ax", "ay", "az")),
+    "gyro.filt": ("gyro", IMU_SAMPLE_RATE_HZ, ("gx", "gy", "gz")),
+    "ppg.filt":  ("ppg",  PPG_SAMPLE_RATE_HZ, ("ir", "red", "grn")),
+}
+
+# Recorder source tags for the filtered streams (written next to the raw lines)
+FILTERED_STREAM_SOURCES = {"acc.filt": "ACCF", "gyro.filt": "GYRF", "ppg.filt": "PPGF"}
+RECORD_FILTERED_STREAMS = True
+
+# Orientation fusion: (3, N) roll/pitch/yaw in degrees, recorded as ORI lines
+# and plotted (keys below) in place of the gyro lanes when picked
+ORIENT_STREAM    = "orient"
+ORIENT_KEYS      = ("roll", "pitch", "yaw")
+ORIENT_SOURCE    = "ORI"
+ORIENT_ALGO      = "madgwick"   # or "mahony"
+
+# Activity summaries (one ACT line per epoch): vm_g, enmo_mg, counts, steps, total
+ACTIVITY_SOURCE  = "ACT"
 
 # ---------- helpers ----------
 def _mean(dq: deque):
@@ -49,13 +76,39 @@ class ImuTab(ttk.Frame):
        │       PPG (IR/RED/GREEN)         │
        └───────────────────────────────────┘
     """
-    def __init__(self, master, ble, *_, **__):
+    def __init__(self, master, ble, *_, recorder=None, **__):
         super().__init__(master, padding=12, style="Card.TFrame")
         self.ble = ble
+        self.recorder = recorder or Recorder()
+
+        self._replay = None        # ReplaySource while a recording is open
+        self._replay_playing = False
+
+        # --- derived streams: HR (IR) + SpO2 (RED/IR); raw samples batched per tick ---
+        self.hr = HeartRateEstimator(PPG_SAMPLE_RATE_HZ)
+        self.spo2 = SpO2Estimator(PPG_SAMPLE_RATE_HZ)
+        self.orient = OrientationFilter(IMU_SAMPLE_RATE_HZ, algo=ORIENT_ALGO)
+        self.activity = ActivityMeter(IMU_SAMPLE_RATE_HZ)
+        self._imu_batch = []   # (ax, ay, az, gx, gy, gz)
+        self._ppg_batch = []   # (ir, red, green)
 
         # ---- settings / state ----
         self.history_len = DEFAULT_HISTORY_SAMPLES
 
+        # --- filter banks → filtered streams (plots + recorder subscribe) ---
+        self.streams = StreamHub()
+        self.filters = {name: FilterBank.preset(preset, fs, 3)
+                        for name, (preset, fs, _keys) in FILTERED_STREAMS.items()}
+        self.filt_hist = {k: deque(maxlen=self.history_len)
+                          for _p, _fs, keys in FILTERED_STREAMS.values() for k in keys}
+        for name, (_p, _fs, keys) in FILTERED_STREAMS.items():
+            self.streams.subscribe(name, lambda block, keys=keys: self._on_filtered(keys, block))
+            if RECORD_FILTERED_STREAMS:
+                self.streams.subscribe(name, lambda block, name=name: self._record_block(name, block))
+        self.orient_hist = {k: deque(maxlen=self.history_len) for k in ORIENT_KEYS}
+        self.streams.subscribe(ORIENT_STREAM, self._on_orient)
+        self.streams.subscribe(ORIENT_STREAM, lambda block: self._record_block(ORIENT_STREAM, block))
+
         # --- accel histories & rolling windows ---
         self.ax_hist = deque(maxlen=self.history_len)
         self.ay_hist = deque(maxlen=self.history_len)
@@ -81,79 +134,16 @@ class ImuTab(ttk.Frame):
         self.grn_win   = deque(maxlen=CENTER_WINDOW)
 
         # --- plot (acc+gyro top row; ppg bottom spanning both) ---
-        self._canvas = None
-        if _HAVE_MPL:
-            fig = Figure(figsize=(6, 3), dpi=100)
-            fig.subplots_adjust(top=0.95)
-
-            # 2x2 grid (PPG spans bottom row)
-            outer = fig.add_gridspec(
-                2, 2,
-                height_ratios=[1, 1],
-                width_ratios=[1, 1],
-                hspace=0.35,
-                wspace=0.25
-            )
-
-            acc_gs = outer[0, 0].subgridspec(3, 1, hspace=0.0)
-            gyr_gs = outer[0, 1].subgridspec(3, 1, hspace=0.0)
-            ppg_gs = outer[1, :].subgridspec(3, 1, hspace=0.0)
-
-            # Accel axes (share x within)
-            self.ax_acc_ax = fig.add_subplot(acc_gs[0])
-            self.ax_acc_ay = fig.add_subplot(acc_gs[1], sharex=self.ax_acc_ax)
-            self.ax_acc_az = fig.add_subplot(acc_gs[2], sharex=self.ax_acc_ax)
-
-            # Gyro axes
-            self.ax_gyr_gx = fig.add_subplot(gyr_gs[0])
-            self.ax_gyr_gy = fig.add_subplot(gyr_gs[1], sharex=self.ax_gyr_gx)
-            self.ax_gyr_gz = fig.add_subplot(gyr_gs[2], sharex=self.ax_gyr_gx)
-
-            # PPG axes
-            self.ax_ppg_ir  = fig.add_subplot(ppg_gs[0])
-            self.ax_ppg_red = fig.add_subplot(ppg_gs[1], sharex=self.ax_ppg_ir)
-            self.ax_ppg_grn = fig.add_subplot(ppg_gs[2], sharex=self.ax_ppg_ir)
-
-            # Y labels / limits — keep axis labels, remove tick marks & numbers
-            for ax, lab in [(self.ax_acc_ax, "ax"), (self.ax_acc_ay, "ay"), (self.ax_acc_az, "az")]:
-                ax.set_ylabel(lab, fontsize=7, labelpad=4)
-                ax.set_ylim(*ACC_YLIM)
-                ax.grid(False)
-                ax.tick_params(left=False, labelleft=False, bottom=False, labelbottom=False)
-
-            for ax, lab in [(self.ax_gyr_gx, "gx"), (self.ax_gyr_gy, "gy"), (self.ax_gyr_gz, "gz")]:
-                ax.set_ylabel(lab, fontsize=7, labelpad=4)
-                ax.set_ylim(*GYR_YLIM)
-                ax.grid(False)
-                ax.tick_params(left=False, labelleft=False, bottom=False, labelbottom=False)
-
-            # --- PPG axis label colors ---
-            self.ax_ppg_ir.set_ylabel("IR",   fontsize=7, labelpad=4, color="#000000")
-            self.ax_ppg_red.set_ylabel("Red", fontsize=7, labelpad=4, color="#ef4444")
-            self.ax_ppg_grn.set_ylabel("Green", fontsize=7, labelpad=4, color="#22c55e")
-            for ax in (self.ax_ppg_ir, self.ax_ppg_red, self.ax_ppg_grn):
-                ax.set_ylim(-100, 100)
-                ax.grid(False)
-                ax.tick_params(left=False, labelleft=False, bottom=False, labelbottom=False)
-
-            # Lines (one per axis)
-            (self.l_ax,)   = self.ax_acc_ax.plot([], [])
-            (self.l_ay,)   = self.ax_acc_ay.plot([], [])
-            (self.l_az,)   = self.ax_acc_az.plot([], [])
-
-            (self.l_gx,)   = self.ax_gyr_gx.plot([], [])
-            (self.l_gy,)   = self.ax_gyr_gy.plot([], [])
-            (self.l_gz,)   = self.ax_gyr_gz.plot([], [])
-
-            # --- PPG line colors ---
-            (self.l_ir,)   = self.ax_ppg_ir.plot([], [], color="#000000")
-            (self.l_red,)  = self.ax_ppg_red.plot([], [], color="#ef4444")
-            (self.l_grn,)  = self.ax_ppg_grn.plot([], [], color="#22c55e")
-
-            canvas = FigureCanvasTkAgg(fig, master=self)
-            canvas.draw()
-            canvas.get_tk_widget().pack(fill="both", expand=True)
-            self._canvas = canvas
+        # Backend is pluggable at runtime: native Tk canvas (fast live view)
+        # or matplotlib (Agg). Both live inside plot_host, above the controls.
+        self.plot_host = ttk.Frame(self, style="Card.TFrame")
+        self.plot_host.pack(fill="both", expand=True)
+        self._plot = None
+        self._spec = None          # SpectrogramView, built on first use
+        self._spec_shown = False
+        self.backend_var = tk.StringVar(value=DEFAULT_PLOT_BACKEND)
+        self.show_orient = tk.BooleanVar(value=False)
+        self._set_backend(DEFAULT_PLOT_BACKEND)
 
         # --- controls (single line: toggles + points-to-show + Clear) ---
         ctr = ttk.Frame(self, style="Card.TFrame"); ctr.pack(fill="x", pady=(8, 0))
@@ -199,14 +189,127 @@ class ImuTab(ttk.Frame):
         # Clear button comes after (same row)
         ttk.Button(ctr, text="Clear", command=self._clear).pack(side="left", padx=(12, 0))
 
+        # Plot backend picker (matplotlib only offered when installed; imported once picked)
+        choices = [b for b in PLOT_BACKENDS if b != "matplotlib" or have_matplotlib()]
+        if len(choices) > 1:
+            ttk.Label(ctr, text="Plot:", style="Lbl.TLabel").pack(side="left", padx=(12, 0))
+            cb = ttk.Combobox(ctr, textvariable=self.backend_var, values=choices,
+                              state="readonly", width=10)
+            cb.pack(side="left", padx=(6, 0))
+            cb.bind("<<ComboboxSelected>>", lambda e: self._set_backend(self.backend_var.get()))
+
+        # Replay a recorded session instead of the live stream
+        ttk.Button(ctr, text="Open…", command=self._open_replay).pack(side="left", padx=(12, 0))
+
+        # --- second row: recording + derived values ---
+        info = ttk.Frame(self, style="Card.TFrame"); info.pack(fill="x", pady=(6, 0))
+        self._rec_on = tk.BooleanVar(value=False)
+        ToggleSwitch(
+            info, variable=self._rec_on,
+            command=lambda: self._toggle_rec(self._rec_on.get()),
+            width=40, height=20
+        ).pack(side="left")
+        ttk.Label(info, text="Record").pack(side="left", padx=(6, 12))
+        # Long sessions: keep only the per-epoch / per-beat summaries (no raw samples)
+        self.rec_summary_only = tk.BooleanVar(value=False)
+        ttk.Checkbutton(info, text="Summaries only", variable=self.rec_summary_only
+                        ).pack(side="left")
+        self.hr_lbl = ttk.Label(info, text="HR: -- bpm", style="Lbl.TLabel")
+        self.hr_lbl.pack(side="left", padx=(12, 0))
+        self.spo2_lbl = ttk.Label(info, text="SpO2: -- %", style="Lbl.TLabel")
+        self.spo2_lbl.pack(side="left", padx=(12, 0))
+        self.orient_lbl = ttk.Label(info, text="R/P/Y: --", style="Lbl.TLabel")
+        self.orient_lbl.pack(side="left", padx=(12, 0))
+        self.act_lbl = ttk.Label(info, text="Steps: --", style="Lbl.TLabel")
+        self.act_lbl.pack(side="left", padx=(12, 0))
+
+        # Plot the filter-bank output instead of the rolling-mean-centered raw data
+        self.show_filtered = tk.BooleanVar(value=False)
+        ttk.Checkbutton(info, text="Filtered", variable=self.show_filtered,
+                        command=self._mark_dirty).pack(side="left", padx=(16, 0))
+
+        # Roll/pitch/yaw lanes in place of the gyro ones
+        ttk.Checkbutton(info, text="Orientation", variable=self.show_orient,
+                        command=self._apply_channels).pack(side="left", padx=(12, 0))
+
+        # Swap the time plot for a live spectrogram of one raw channel
+        self.show_spec = tk.BooleanVar(value=False)
+        ttk.Checkbutton(info, text="Spectrogram", variable=self.show_spec,
+                        command=lambda: self._toggle_spectrogram(self.show_spec.get())
+                        ).pack(side="left", padx=(12, 0))
+
+        # --- replay bar (shown while a recording is open) ---
+        self.replay_bar = ttk.Frame(self, style="Card.TFrame")
+        self._play_btn = ttk.Button(self.replay_bar, text="▶", width=3, command=self._toggle_play)
+        self._play_btn.pack(side="left")
+        self.replay_pos = tk.DoubleVar(value=0.0)
+        self._scrubber = ttk.Scale(self.replay_bar, from_=0.0, to=1.0, variable=self.replay_pos,
+                                   command=lambda v: self._scrub(float(v)))
+        self._scrubber.pack(side="left", fill="x", expand=True, padx=(8, 8))
+        self.replay_lbl = ttk.Label(self.replay_bar, text="", style="Lbl.TLabel")
+        self.replay_lbl.pack(side="left")
+        ttk.Button(self.replay_bar, text="Close", command=self._close_replay).pack(side="left", padx=(8, 0))
+
         # --- event subscriptions ---
         self.bind_all("<<BLE:imu>>", self._on_imu_evt, add="+")
         self.bind_all("<<BLE:ppg>>", self._on_ppg_evt, add="+")
 
         # --- redraw ticker ---
         self._redraw_pending = False
-        if _HAVE_MPL:
-            self.after(REDRAW_EVERY_MS, self._redraw_timer)
+        self.after(REDRAW_EVERY_MS, self._redraw_timer)
+
+    # ===== plot backend =====
+    def _set_backend(self, name: str):
+        if self._plot is not None and self._plot.name == name:
+            return
+        if self._plot is not None:
+            self._plot.destroy()
+        self._plot = make_backend(name, self.plot_host, channels(self.show_orient.get()))
+        self.backend_var.set(self._plot.name)
+        if not self._spec_shown:
+            self._plot.widget.pack(fill="both", expand=True)
+        self._redraw_pending = True
+
+    def _toggle_spectrogram(self, on: bool):
+        if on == self._spec_shown:
+            return
+        if on:
+            if self._spec is None:
+                sources = {k: (name, row, fs) for name, (fs, keys) in RAW_STREAMS.items()
+                           for row, k in enumerate(keys)}
+                self._spec = SpectrogramView(self.plot_host, self.streams, sources)
+            if self._plot is not None:
+                self._plot.widget.pack_forget()
+            self._spec.pack(fill="both", expand=True)
+            self._spec.start()
+        else:
+            self._spec.stop()
+            self._spec.pack_forget()
+            if self._plot is not None:
+                self._plot.widget.pack(fill="both", expand=True)
+        self._spec_shown = on
+        self._redraw_pending = True
+
+    def _mark_dirty(self):
+        self._redraw_pending = True
+
+    def _apply_channels(self):
+        if self._plot is not None:
+            self._plot.set_channels(channels(self.show_orient.get()))
+        self._redraw_pending = True
+
+    def _series(self):
+        """Histories in plots.channels() order."""
+        if self.show_filtered.get():
+            f = self.filt_hist
+            series = [f["ax"], f["ay"], f["az"], f["gx"], f["gy"], f["gz"], f["ir"], f["red"], f["grn"]]
+        else:
+            series = [self.ax_hist, self.ay_hist, self.az_hist,
+                      self.gx_hist, self.gy_hist, self.gz_hist,
+                      self.ir_hist, self.red_hist, self.grn_hist]
+        if self.show_orient.get():
+            series[3:6] = [self.orient_hist[k] for k in ORIENT_KEYS]
+        return series
 
     # ===== BLE toggle callbacks =====
     def _toggle_imu(self, on: bool):
@@ -221,6 +324,27 @@ class ImuTab(ttk.Frame):
         except Exception:
             pass
 
+    def _toggle_rec(self, on: bool):
+        if on:
+            try:
+                path = self.recorder.start(device=getattr(self.winfo_toplevel(), "selected_addr", None))
+                self._log(f"Recording -> {path}")
+            except OSError as e:
+                self._log(f"Recording failed: {e}")
+                self._rec_on.set(False)
+        else:
+            path = self.recorder.stop()
+            if path:
+                self._log(f"Recording saved: {path}")
+
+    def _log(self, line: str):
+        """Report in the app's log console (stdout if the tab runs outside AppShell)."""
+        console = getattr(self.winfo_toplevel(), "console", None)
+        if console is not None:
+            console.append(line)
+        else:
+            print(line)
+
     # ===== callbacks =====
     def _apply_history_len(self):
         try:
@@ -241,30 +365,34 @@ class ImuTab(ttk.Frame):
         self.ir_hist  = _resize_deque(self.ir_hist,  n)
         self.red_hist = _resize_deque(self.red_hist, n)
         self.grn_hist = _resize_deque(self.grn_hist, n)
+        for k in self.filt_hist:
+            self.filt_hist[k] = _resize_deque(self.filt_hist[k], n)
+        for k in self.orient_hist:
+            self.orient_hist[k] = _resize_deque(self.orient_hist[k], n)
 
         self._redraw_pending = True
 
     # ===== Public direct handlers (optional) =====
     def handle_imu_line(self, text: str):
-        if not self._imu_on.get():  # gate UI
+        if not self._imu_on.get() or self._replay is not None:  # gate UI
             return
         if not text: return
         self._handle_imu_common(text)
 
     def handle_ppg_line(self, text: str):
-        if not self._ppg_on.get():  # gate UI
+        if not self._ppg_on.get() or self._replay is not None:  # gate UI
             return
         if not text: return
         self._handle_ppg_common(text)
 
     # --- Tk event handlers ---
     def _on_imu_evt(self, evt):
-        if not self._imu_on.get():  # gate UI
+        if not self._imu_on.get() or self._replay is not None:  # gate UI
             return
         self._handle_imu_common(str(getattr(evt, "data", "")))
 
     def _on_ppg_evt(self, evt):
-        if not self._ppg_on.get():  # gate UI
+        if not self._ppg_on.get() or self._replay is not None:  # gate UI
             return
         self._handle_ppg_common(str(getattr(evt, "data", "")))
 
@@ -279,6 +407,12 @@ class ImuTab(ttk.Frame):
             gx, gy, gz = float(parts[4]), float(parts[5]), float(parts[6])
         except Exception:
             return
+        if not self.rec_summary_only.get():
+            self._record("IMU", payload.strip())
+        self._push_imu(raw_ax, raw_ay, raw_az, gx, gy, gz)
+
+    def _push_imu(self, raw_ax, raw_ay, raw_az, gx, gy, gz):
+        self._imu_batch.append((raw_ax, raw_ay, raw_az, gx, gy, gz))
 
         # update rolling windows
         self.ax_win.append(raw_ax); self.ay_win.append(raw_ay); self.az_win.append(raw_az)
@@ -311,6 +445,12 @@ class ImuTab(ttk.Frame):
             raw_ir = float(parts[1]); raw_red = float(parts[2]); raw_grn = float(parts[3])
         except Exception:
             return
+        if not self.rec_summary_only.get():
+            self._record("PPG", payload.strip())
+        self._push_ppg(raw_ir, raw_red, raw_grn)
+
+    def _push_ppg(self, raw_ir, raw_red, raw_grn):
+        self._ppg_batch.append((raw_ir, raw_red, raw_grn))
 
         # update rolling windows
         self.ir_win.append(raw_ir); self.red_win.append(raw_red); self.grn_win.append(raw_grn)
@@ -339,98 +479,177 @@ class ImuTab(ttk.Frame):
         # ppg
         self.ir_hist.clear(); self.red_hist.clear(); self.grn_hist.clear()
         self.ir_win.clear();  self.red_win.clear();  self.grn_win.clear()
-        if _HAVE_MPL:
-            self._update_lines()
-            self._canvas.draw_idle()
+        # derived
+        self._imu_batch.clear(); self._ppg_batch.clear()
+        self.hr.reset(); self.spo2.reset(); self.orient.reset(); self.activity.reset()
+        for fb in self.filters.values(): fb.reset()
+        for dq in self.filt_hist.values(): dq.clear()
+        for dq in self.orient_hist.values(): dq.clear()
+        self.hr_lbl.config(text="HR: -- bpm")
+        self.spo2_lbl.config(text="SpO2: -- %")
+        self.orient_lbl.config(text="R/P/Y: --")
+        self.act_lbl.config(text="Steps: --")
+        if self._spec is not None:
+            self._spec.reset()
+        if self._plot is not None:
+            self._plot.update(self._series(), self.history_len)
+
+    def _run_derived(self):
+        """Run this tick's samples through the filter banks and HR / SpO2 (one batch each)."""
+        if self._imu_batch:
+            imu = np.asarray(self._imu_batch, dtype=np.float64).T   # (6, N)
+            self._imu_batch.clear()
+            self.streams.publish("acc.raw", imu[0:3])
+            self.streams.publish("gyro.raw", imu[3:6])
+            self.streams.publish("acc.filt", self.filters["acc.filt"].process(imu[0:3]))
+            self.streams.publish("gyro.filt", self.filters["gyro.filt"].process(imu[3:6]))
+            self.streams.publish(ORIENT_STREAM, self.orient.process(imu[0:3], imu[3:6]))
+            epochs = self.activity.process(imu[0:3])
+            for _e, vm, enmo, counts, steps, total in epochs:
+                self._record(ACTIVITY_SOURCE, f"{ACTIVITY_SOURCE},{vm:.3f},{enmo:.1f},{counts},{steps},{total}")
+            if epochs:
+                _e, _vm, enmo, _c, _s, total = epochs[-1]
+                self.act_lbl.config(text=f"Steps: {total} ({intensity(enmo)})")
+        if not self._ppg_batch:
+            return
+        ppg = np.asarray(self._ppg_batch, dtype=np.float64).T       # (3, N)
+        self._ppg_batch.clear()
+        self.streams.publish("ppg.raw", ppg)
+        self.streams.publish("ppg.filt", self.filters["ppg.filt"].process(ppg))
+        ir, red = ppg[0], ppg[1]
+
+        beats = self.hr.process(ir)
+        for _idx, bpm, ibi in beats:
+            self._record("HR", f"HR,{bpm:.1f},{ibi:.3f}")
+        if beats:
+            self.hr_lbl.config(text=f"HR: {self.hr.bpm:.0f} bpm")
+
+        windows = self.spo2.process(ir, red, beats)
+        for _idx, spo2, sqi, ratio in windows:
+            if spo2 is not None:
+                self._record("SPO2", f"SPO2,{spo2:.1f},{sqi:.2f},{ratio:.3f}")
+        if self.spo2.paused:
+            self.spo2_lbl.config(text="SpO2: -- % (no finger)")
+        elif windows and self.spo2.spo2 is not None:
+            self.spo2_lbl.config(text=f"SpO2: {self.spo2.spo2:.0f} % (q {self.spo2.sqi:.1f})")
+
+    # ===== filtered-stream subscribers =====
+    def _on_filtered(self, keys, block):
+        for k, row in zip(keys, block):
+            self.filt_hist[k].extend(row.tolist())
+        if self.show_filtered.get():
+            self._redraw_pending = True
+
+    def _on_orient(self, block):
+        for k, row in zip(ORIENT_KEYS, block):
+            self.orient_hist[k].extend(row.tolist())
+        if self.show_orient.get():
+            self._redraw_pending = True
+        roll, pitch, yaw = block[:, -1]
+        self.orient_lbl.config(text=f"R/P/Y: {roll:+.0f}° {pitch:+.0f}° {yaw:+.0f}°")
+
+    def _record(self, source, line, ms=None):
+        """Recorder.write(), except while a replay is open (its samples are already in a log)."""
+        if self._replay is None:
+            self.recorder.write(source, line, ms)
+
+    def _record_block(self, name, block):
+        if not self.recorder.active or self._replay is not None or self.rec_summary_only.get():
+            return
+        if name == ORIENT_STREAM:
+            src, fs = ORIENT_SOURCE, IMU_SAMPLE_RATE_HZ
+        else:
+            src, fs = FILTERED_STREAM_SOURCES[name], FILTERED_STREAMS[name][1]
+        # The block is this tick's batch: date its samples back from now at the stream rate
+        last = self.recorder.millis()
+        n = block.shape[1]
+        for i, col in enumerate(block.T):
+            self._record(src, src + "," + ",".join(f"{v:.3f}" for v in col),
+                         ms=last - (n - 1 - i) * 1000.0 / fs)
+
+    # ===== replay =====
+    def _open_replay(self):
+        path = filedialog.askopenfilename(
+            parent=self, title="Open recording", initialdir=RECORDINGS_DIR,
+            filetypes=[("TinZr logs", "*.CSV *.csv"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            replay = ReplaySource(path)
+        except (OSError, ValueError) as e:
+            self._log(f"Cannot open {path}: {e}")
+            return
+        self._close_replay()
+        self._replay = replay
+        self._scrubber.configure(from_=replay.t_start, to=max(replay.t_end, replay.t_start + 1))
+        self.replay_bar.pack(fill="x", pady=(6, 0))
+        self._scrub(replay.t_start)
+
+    def _close_replay(self):
+        if self._replay is None:
+            return
+        self._replay_playing = False
+        self._play_btn.config(text="▶")
+        self._replay.close()
+        self._replay = None
+        self.replay_bar.pack_forget()
+        self._clear()
+
+    def _toggle_play(self):
+        if self._replay is None:
+            return
+        if self._replay.at_end:
+            self._scrub(self._replay.t_start)
+        self._replay_playing = not self._replay_playing
+        self._play_btn.config(text="⏸" if self._replay_playing else "▶")
+
+    def _replay_window_ms(self):
+        """Time span that fills the plot history at the slower of the two sample rates."""
+        return self.history_len * 1000.0 / min(IMU_SAMPLE_RATE_HZ, PPG_SAMPLE_RATE_HZ)
+
+    def _scrub(self, t_ms):
+        """Jump to t_ms: reload only the window that fills the plot history."""
+        if self._replay is None:
+            return
+        self._replay.seek(t_ms)
+        self._clear()
+        self._feed(self._replay.window(self._replay_window_ms()))
+        self._update_replay_label()
+
+    def _feed(self, blocks):
+        imu, ppg = blocks.get("IMU"), blocks.get("PPG")
+        if imu is not None and len(imu) and plain(imu).shape[1] >= 7:
+            for row in plain(imu)[:, 1:7].tolist():
+                self._push_imu(*row)
+        if ppg is not None and len(ppg) and plain(ppg).shape[1] >= 4:
+            for row in plain(ppg)[:, 1:4].tolist():
+                self._push_ppg(*row)
+
+    def _update_replay_label(self):
+        r = self._replay
+        self.replay_pos.set(r.t)
+        self.replay_lbl.config(text=f"{(r.t - r.t_start) / 1000.0:7.1f} / {(r.t_end - r.t_start) / 1000.0:.1f} s")
 
     def _redraw_timer(self):
-        if self._redraw_pending and self._canvas:
+        if self._replay_playing and self._replay is not None:
+            self._feed(self._replay.advance(REDRAW_EVERY_MS))
+            self._update_replay_label()
+            if self._replay.at_end:
+                self._replay_playing = False
+                self._play_btn.config(text="▶")
+        self._run_derived()
+        if self._redraw_pending and self._plot is not None and not self._spec_shown:
             self._redraw_pending = False
-            self._update_lines()
-            self._canvas.draw_idle()
+            self._plot.update(self._series(), self.history_len)
         self.after(REDRAW_EVERY_MS, self._redraw_timer)
 
-    def _update_lines(self):
-        if not _HAVE_MPL:
-            return
-
-        # --- set line data with per-series x length ---
-        # accel
-        xs_ax = list(range(len(self.ax_hist)))
-        xs_ay = list(range(len(self.ay_hist)))
-        xs_az = list(range(len(self.az_hist)))
-        self.l_ax.set_data(xs_ax, list(self.ax_hist))
-        self.l_ay.set_data(xs_ay, list(self.ay_hist))
-        self.l_az.set_data(xs_az, list(self.az_hist))
-
-        # gyro
-        xs_gx = list(range(len(self.gx_hist)))
-        xs_gy = list(range(len(self.gy_hist)))
-        xs_gz = list(range(len(self.gz_hist)))
-        self.l_gx.set_data(xs_gx, list(self.gx_hist))
-        self.l_gy.set_data(xs_gy, list(self.gy_hist))
-        self.l_gz.set_data(xs_gz, list(self.gz_hist))
-
-        # ppg
-        xs_ir  = list(range(len(self.ir_hist)))
-        xs_red = list(range(len(self.red_hist)))
-        xs_grn = list(range(len(self.grn_hist)))
-        self.l_ir.set_data(xs_ir, list(self.ir_hist))
-        self.l_red.set_data(xs_red, list(self.red_hist))
-        self.l_grn.set_data(xs_grn, list(self.grn_hist))
-
-        # --- x limits ---
-        def _set_xlim(ax, n):
-            ax.set_xlim(max(0, n - self.history_len), max(self.history_len, n))
-
-        _set_xlim(self.ax_acc_az, len(self.ax_hist))
-        _set_xlim(self.ax_gyr_gz, len(self.gx_hist))
-        _set_xlim(self.ax_ppg_grn, len(self.ir_hist))
-
-        # --- reassert fixed y-lims for acc & gyro ---
-        for ax in (self.ax_acc_ax, self.ax_acc_ay, self.ax_acc_az):
-            ax.set_ylim(*ACC_YLIM)
-        for ax in (self.ax_gyr_gx, self.ax_gyr_gy, self.ax_gyr_gz):
-            ax.set_ylim(*GYR_YLIM)
-
-        # --- always autoscale PPG ---
-        self._autoscale_ppg_axis(self.ax_ppg_ir,  self.ir_hist)
-        self._autoscale_ppg_axis(self.ax_ppg_red, self.red_hist)
-        self._autoscale_ppg_axis(self.ax_ppg_grn, self.grn_hist)
-
-    # ---- PPG autoscale helpers ----
-    def _visible_slice(self, axis, data: deque):
-        if not data:
-            return []
-        x0, x1 = axis.get_xlim()
-        n = len(data)
-        i0 = max(0, int(x0))
-        i1 = min(n, int(x1) + 1)
-        seg = list(data)[i0:i1]
-        return seg if seg else list(data)
-
-    def _smooth_set_ylim(self, axis, target_lo, target_hi, alpha=0.35):
-        cur_lo, cur_hi = axis.get_ylim()
-        new_lo = cur_lo + alpha * (target_lo - cur_lo)
-        new_hi = cur_hi + alpha * (target_hi - cur_hi)
-        axis.set_ylim(new_lo, new_hi)
-
-    def _autoscale_ppg_axis(self, axis, data: deque):
-        ys = self._visible_slice(axis, data)
-        if not ys:
-            return
-        y_min, y_max = min(ys), max(ys)
-        rng = max(PPG_MIN_RANGE, (y_max - y_min))
-        mid = 0.5 * (y_max + y_min)
-        half = 0.5 * rng * (1.0 + 2.0 * PPG_MARGIN_RATIO)
-        lo, hi = (mid - half), (mid + half)
-        self._smooth_set_ylim(axis, lo, hi, alpha=0.35)
-
     # ===== Cleanup =====
     def destroy(self):
-        try:
-            if self._canvas:
-                self._canvas.get_tk_widget().destroy()
-        except Exception:
-            pass
+        self.recorder.stop()
+        if self._replay is not None:
+            self._replay.close()
+            self._replay = None
+        if self._plot is not None:
+            self._plot.destroy()
+            self._plot = None
         return super().destroy()
@@ -2,9 +2,12 @@
 # File: modules/led.py
 # =========================
 import math
+import os
 import tkinter as tk
 from tkinter import ttk
 
+import startup
+
 # Optional: pull colors from your shell so the box matches your theme
 try:
     from ui.shell import SB_SURFACE, SB_SUBTEXT
@@ -29,6 +32,11 @@ BR_KNOB_R            = 7      # brightness knob radius
 # Place 0° (red) at the RIGHT side like typical HSV wheels
 HUE_OFFSET_DEG       = -90.0
 
+# Pre-rendered ring image cache (keyed by geometry + theme colors)
+RING_CACHE_DIR       = os.path.join(os.path.expanduser("~"), ".cache", "tinzr_gui")
+RING_CACHE_VERSION   = 1
+_RING_IMAGES         = {}     # key -> tk.PhotoImage, shared by every ColorRing
+
 
 # ---------- HSV → RGB helper ----------
 def hsv_to_rgb_bytes(h, s=1.0, v=1.0):
@@ -55,6 +63,45 @@ def hsv_to_rgb_bytes(h, s=1.0, v=1.0):
     return r, g, b
 
 
+# ---------- Ring pre-rendering (NumPy → PPM) ----------
+def _render_ring_ppm(total, r_hue, ring_width, r_bright, bg_rgb, br_rgb):
+    """
+    Rasterize the hue ring + tapered brightness arc over a solid background.
+    Same geometry as the old per-degree arc items, with 1px anti-aliased edges.
+    Returns a binary PPM (P6) that tk.PhotoImage loads natively.
+    """
+    np = startup.timed_import("numpy")
+    c = total // 2
+    ys, xs = np.mgrid[0:total, 0:total].astype(np.float64) + 0.5
+    dx, dy = xs - c, ys - c
+    r = np.hypot(dx, dy)
+    ang = (np.degrees(np.arctan2(dy, dx)) + 90.0) % 360.0   # 0° at top, clockwise
+
+    out = np.empty((total, total, 3), dtype=np.float64)
+    out[:] = bg_rgb
+
+    # Hue ring: stroke of ring_width centered on r_hue (like a Tk arc outline)
+    cov = np.clip(ring_width / 2.0 + 0.5 - np.abs(r - r_hue), 0.0, 1.0)[..., None]
+    h6 = ((ang + HUE_OFFSET_DEG) % 360.0) / 60.0
+    def chan(n):  # HSV→RGB with s=v=1
+        k = (n + h6) % 6.0
+        return 1.0 - np.clip(np.minimum(k, 4.0 - k), 0.0, 1.0)
+    hue_rgb = np.stack([chan(5), chan(3), chan(1)], axis=-1) * 255.0
+    out = out * (1.0 - cov) + hue_rgb * cov
+
+    # Brightness arc: thickness grows linearly from start → end
+    start = 270 - BR_ARC_DEG / 2
+    end   = 270 + BR_ARC_DEG / 2
+    t = (ang - start) / (end - start)
+    width = BR_MIN_THICK + np.clip(t, 0.0, 1.0) * (BR_MAX_THICK - BR_MIN_THICK)
+    cov = np.clip(width / 2.0 + 0.5 - np.abs(r - r_bright), 0.0, 1.0)
+    cov = (cov * ((t >= 0.0) & (t <= 1.0)))[..., None]
+    out = out * (1.0 - cov) + np.asarray(br_rgb, dtype=np.float64) * cov
+
+    header = f"P6 {total} {total} 255\n".encode("ascii")
+    return header + np.round(out).astype(np.uint8).tobytes()
+
+
 # ---------- Canvas-based pill toggle switch ----------
 class ToggleSwitch(ttk.Frame):
 	"""
@@ -94,6 +141,15 @@ class ToggleSwitch(ttk.Frame):
 		self.canvas.configure(cursor="hand2")
 		self.canvas.focus_set()
 
+		# Retained items: created once, then only recolored / moved
+		self._layout_cache = {}
+		self._drawn = None  # (is_on, w, h) last applied to the items
+		lay = self._layout()
+		self._track = self.canvas.create_polygon(lay["track"], smooth=True,
+		                                         fill=self._off_bg, outline=self._border, width=1)
+		self._knob_item = self.canvas.create_oval(*lay["knob_off"],
+		                                          fill=self._knob, outline=self._border, width=1)
+
 		# Redraw when var changes
 		self.variable.trace_add("write", lambda *_: self._redraw())
 
@@ -114,9 +170,10 @@ class ToggleSwitch(ttk.Frame):
 	def _toggle_key(self, _ev=None):
 		self._toggle_click()
 
-	def _rounded_rect(self, x1, y1, x2, y2, r, **kw):
-		"""Draw a rounded rectangle as a single polygon curve."""
-		points = [
+	@staticmethod
+	def _rounded_rect_points(x1, y1, x2, y2, r):
+		"""Control points of a rounded rectangle drawn as one smoothed polygon."""
+		return [
 			x1+r, y1,
 			x2-r, y1,
 			x2, y1,
@@ -130,28 +187,34 @@ class ToggleSwitch(ttk.Frame):
 			x1, y1+r,
 			x1, y1,
 		]
-		return self.canvas.create_polygon(points, smooth=True, **kw)
+
+	def _layout(self):
+		"""Track points + knob boxes for the current size (computed once per size)."""
+		key = (self.width_px, self.height_px)
+		lay = self._layout_cache.get(key)
+		if lay is None:
+			w, h, p = self.width_px, self.height_px, self.pad_px
+			knob_d = h - 2*p
+			x_right = w - h + p
+			lay = {
+				"track":    self._rounded_rect_points(1, 1, w-1, h-1, self.radius_px-1),
+				"knob_off": (p, p, p + knob_d, h - p),
+				"knob_on":  (x_right, p, x_right + knob_d, h - p),
+			}
+			self._layout_cache[key] = lay
+		return lay
 
 	def _redraw(self):
-		self.canvas.delete("all")
 		is_on = bool(self.variable.get())
-		bg = self._on_bg if is_on else self._off_bg
-
-		# Track
-		self._rounded_rect(1, 1, self.width_px-1, self.height_px-1, self.radius_px-1,
-		                   fill=bg, outline=self._border, width=1)
-
-		# Knob position
-		x_left  = self.pad_px
-		x_right = self.width_px - self.height_px + self.pad_px
-		x = x_right if is_on else x_left
-
-		# Knob (circle)
-		self.canvas.create_oval(
-			x, self.pad_px,
-			x + self.height_px - 2*self.pad_px, self.height_px - self.pad_px,
-			fill=self._knob, outline=self._border, width=1
-		)
+		state = (is_on, self.width_px, self.height_px)
+		if state == self._drawn:
+			return  # variable rewritten with the same value: nothing to do
+		lay = self._layout()
+		if self._drawn is None or self._drawn[1:] != state[1:]:
+			self.canvas.coords(self._track, *lay["track"])
+		self.canvas.itemconfig(self._track, fill=self._on_bg if is_on else self._off_bg)
+		self.canvas.coords(self._knob_item, *lay["knob_on" if is_on else "knob_off"])
+		self._drawn = state
 
 
 # ---------- ColorRing with outer BrightnessArc ----------
@@ -202,10 +265,14 @@ class ColorRing(tk.Canvas):
         self.sat   = 1.0
         self._drag_mode = None  # 'hue' | 'bright' | None
 
-        # Draw static pieces
-        self._draw_hue_ring()
+        # Draw static pieces: one cached image item; vector arcs only as fallback
+        self._ring_image = self._load_ring_image(bg)
+        if self._ring_image is not None:
+            self._ring_item = self.create_image(0, 0, anchor="nw", image=self._ring_image)
+        else:
+            self._draw_hue_ring()
+            self._draw_brightness_arc()
         self._draw_center_disc()
-        self._draw_brightness_arc()
 
         # Knobs
         self._hue_knob = self.create_oval(0, 0, 0, 0, outline="#0f172a", width=2, fill="#ffffff")
@@ -238,6 +305,55 @@ class ColorRing(tk.Canvas):
         return int(round(self.value * 255.0))
 
     # ---- Drawing ----
+    def _ring_cache_key(self, bg):
+        r, g, b = (v >> 8 for v in self.winfo_rgb(bg))
+        return (f"ring_v{RING_CACHE_VERSION}_{self.size}_{self.r_outer_hue}_{self.ring_width}_"
+                f"{self.r_bright}_{r:02x}{g:02x}{b:02x}_{BR_COLOR.lstrip('#')}_{int(HUE_OFFSET_DEG)}"), (r, g, b)
+
+    def _load_ring_image(self, bg):
+        """
+        Hue ring + brightness arc as a single PhotoImage.
+        Memory cache → disk cache (~/.cache/tinzr_gui) → render with NumPy.
+        Returns None if nothing works (caller draws vector arcs instead).
+        """
+        try:
+            key, bg_rgb = self._ring_cache_key(bg)
+        except tk.TclError:
+            return None
+        img = _RING_IMAGES.get(key)
+        if img is not None:
+            return img
+
+        path = os.path.join(RING_CACHE_DIR, key + ".ppm")
+        if os.path.isfile(path):
+            try:
+                img = tk.PhotoImage(master=self, file=path)
+            except tk.TclError:
+                img = None  # corrupt cache entry; re-render below
+
+        if img is None:
+            try:
+                br_rgb = tuple(v >> 8 for v in self.winfo_rgb(BR_COLOR))
+                ppm = _render_ring_ppm(self.size, self.r_outer_hue, self.ring_width,
+                                       self.r_bright, bg_rgb, br_rgb)
+            except Exception:
+                return None
+            try:
+                os.makedirs(RING_CACHE_DIR, exist_ok=True)
+                tmp = path + f".{os.getpid()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(ppm)
+                os.replace(tmp, path)
+                img = tk.PhotoImage(master=self, file=path)
+            except (OSError, tk.TclError):
+                try:
+                    img = tk.PhotoImage(master=self, data=ppm)
+                except tk.TclError:
+                    return None
+
+        _RING_IMAGES[key] = img
+        return img
+
     def _draw_hue_ring(self):
         pad = (self.size - self.base_size) // 2
         x1, y1 = pad + 2, pad + 2
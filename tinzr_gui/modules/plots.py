@@ -0,0 +1,305 @@
+# =========================
+# File: modules/plots.py
+# =========================
+"""
+Plot backends for the Sensors tab.
+
+Both draw the same 9 lanes (acc + gyro on top, PPG across the bottom; the
+gyro column can show roll/pitch/yaw instead, see channels()):
+  - TkPlotBackend:  one tk.Canvas line item per channel, updated with coords()
+                    from NumPy-scaled pixel arrays. Cheap enough for 9 ch @ 50 Hz.
+  - MplPlotBackend: the original matplotlib figure (FigureCanvasTkAgg); nicer
+                    for static views / screenshots, but pays a full Agg raster.
+
+Backend API:
+  backend = make_backend(name, master, chans)  # name in PLOT_BACKENDS, chans = channels(...)
+  backend.widget.pack(...)
+  backend.set_channels(chans)            # relabel / rescale the lanes
+  backend.update(series, history_len)    # series: 9 sequences in chans order
+  backend.destroy()
+"""
+import importlib.util
+import os
+import tkinter as tk
+
+import numpy as np
+
+import startup
+
+# Fixed y-limits per channel (tweak as you like)
+ACC_YLIM = (-30, 30)        # g
+GYR_YLIM = (-500, 500)      # dps
+ORI_YLIM = (-180, 180)      # deg
+
+# PPG auto-scale guard rails
+PPG_MIN_RANGE       = 50.0   # if data is flat, enforce at least this range
+PPG_MARGIN_RATIO    = 0.10   # 10% margin top & bottom
+PPG_WINDOW_FRACTION = 1.0    # use full visible window for autoscale (1.0 = all points)
+PPG_YLIM_ALPHA      = 0.35   # smoothing of the autoscaled limits
+
+# (key, label, group, line color, label color)
+CHANNELS = [
+    ("ax",  "ax",    "acc", "#1f77b4", None),
+    ("ay",  "ay",    "acc", "#1f77b4", None),
+    ("az",  "az",    "acc", "#1f77b4", None),
+    ("gx",  "gx",    "gyr", "#1f77b4", None),
+    ("gy",  "gy",    "gyr", "#1f77b4", None),
+    ("gz",  "gz",    "gyr", "#1f77b4", None),
+    ("ir",  "IR",    "ppg", "#000000", "#000000"),
+    ("red", "Red",   "ppg", "#ef4444", "#ef4444"),
+    ("grn", "Green", "ppg", "#22c55e", "#22c55e"),
+]
+# Roll/pitch/yaw from the orientation stream, shown in place of the gyro lanes
+ORIENT_CHANNELS = [
+    ("roll",  "roll",  "ori", "#1f77b4", None),
+    ("pitch", "pitch", "ori", "#1f77b4", None),
+    ("yaw",   "yaw",   "ori", "#1f77b4", None),
+]
+GROUP_YLIM = {"acc": ACC_YLIM, "gyr": GYR_YLIM, "ori": ORI_YLIM, "ppg": None}   # None → autoscale
+
+PLOT_BACKENDS = ("tk", "matplotlib")
+# TINZR_PLOT_BACKEND=matplotlib picks the Agg view by default
+DEFAULT_PLOT_BACKEND = os.environ.get("TINZR_PLOT_BACKEND", "tk")
+
+
+def _load_mpl():
+    """Import matplotlib's Figure + Tk canvas on demand → (Figure, FigureCanvasTkAgg) or (None, None)."""
+    try:
+        Figure = startup.timed_import("matplotlib.figure").Figure
+        FigureCanvasTkAgg = startup.timed_import("matplotlib.backends.backend_tkagg").FigureCanvasTkAgg
+        return Figure, FigureCanvasTkAgg
+    except Exception:
+        return None, None
+
+
+def have_matplotlib() -> bool:
+    """Whether matplotlib is installed; only looks it up (the import waits for make_backend)."""
+    try:
+        return importlib.util.find_spec("matplotlib") is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def ppg_target_ylim(ys):
+    """Autoscale target for a PPG lane: min/max with a margin and a minimum span."""
+    y_min, y_max = float(np.min(ys)), float(np.max(ys))
+    rng = max(PPG_MIN_RANGE, (y_max - y_min))
+    mid = 0.5 * (y_max + y_min)
+    half = 0.5 * rng * (1.0 + 2.0 * PPG_MARGIN_RATIO)
+    return (mid - half), (mid + half)
+
+
+def _smooth(cur, target, alpha=PPG_YLIM_ALPHA):
+    return (cur[0] + alpha * (target[0] - cur[0]),
+            cur[1] + alpha * (target[1] - cur[1]))
+
+
+def _as_array(seq):
+    """deque/list → float64 array without an intermediate list."""
+    return np.fromiter(seq, dtype=np.float64, count=len(seq))
+
+
+def channels(orientation=False):
+    """Lane layout: CHANNELS, or with roll/pitch/yaw in place of the gyro lanes."""
+    if orientation:
+        return CHANNELS[:3] + ORIENT_CHANNELS + CHANNELS[6:]
+    return CHANNELS
+
+
+def make_backend(name, master, chans=CHANNELS):
+    """Build the named backend; falls back to the Tk canvas if matplotlib is missing."""
+    if name == "matplotlib":
+        Figure, FigureCanvasTkAgg = _load_mpl()
+        if Figure is not None:
+            return MplPlotBackend(master, Figure, FigureCanvasTkAgg, chans)
+    return TkPlotBackend(master, chans=chans)
+
+
+# ===================== native Tk canvas =====================
+class TkPlotBackend:
+    name = "tk"
+
+    PAD      = 6     # outer padding (px)
+    HGAP     = 14    # gap between acc and gyro columns
+    VGAP     = 14    # gap between top row and PPG row
+    LABEL_W  = 30    # left margin for lane labels
+
+    def __init__(self, master, width=600, height=300, chans=CHANNELS):
+        self.widget = tk.Canvas(master, width=width, height=height, bg="#ffffff",
+                                highlightthickness=0, bd=0)
+        c = self.widget
+        self._frames = []
+        self._labels = []
+        self._lines = []
+        for _ in chans:
+            self._frames.append(c.create_rectangle(0, 0, 0, 0, outline="#9ca3af"))
+            self._labels.append(c.create_text(0, 0, anchor="e", font=("Segoe UI", 7)))
+            self._lines.append(c.create_line(0, 0, 0, 0, width=1, state="hidden"))
+
+        self._lanes = None              # per-channel (x0, y0, x1, y1) pixel box
+        self._size = None
+        self._xcache = {}               # (history_len, lane width) → x pixel array
+        self._last = None               # last series/history, for re-layout on resize
+        self.set_channels(chans)
+        c.bind("<Configure>", self._on_configure)
+
+    def set_channels(self, chans):
+        c = self.widget
+        self.channels = list(chans)
+        for i, (_key, label, _grp, color, lcolor) in enumerate(self.channels):
+            c.itemconfig(self._labels[i], text=label, fill=lcolor or "#000000")
+            c.itemconfig(self._lines[i], fill=color)
+        self._ylim = [GROUP_YLIM[grp] or (-100.0, 100.0) for _k, _l, grp, _c, _lc in self.channels]
+
+    # ---- layout ----
+    def _layout(self, w, h):
+        P, L = self.PAD, self.LABEL_W
+        top_h = (h - 2 * P - self.VGAP) / 2.0
+        col_w = (w - 2 * P - self.HGAP) / 2.0
+        lane_h = top_h / 3.0
+
+        def lanes(x0, y0, width):
+            return [(x0 + L, y0 + i * lane_h, x0 + width, y0 + (i + 1) * lane_h) for i in range(3)]
+
+        acc = lanes(P, P, col_w)
+        gyr = lanes(P + col_w + self.HGAP, P, col_w)
+        ppg = lanes(P, P + top_h + self.VGAP, w - 2 * P)
+        self._lanes = acc + gyr + ppg
+        self._xcache.clear()
+
+        c = self.widget
+        for i, (x0, y0, x1, y1) in enumerate(self._lanes):
+            c.coords(self._frames[i], x0, y0, x1, y1)
+            c.coords(self._labels[i], x0 - 4, (y0 + y1) / 2.0)
+
+    def _on_configure(self, ev):
+        size = (int(ev.width), int(ev.height))
+        if size == self._size or size[0] < 50 or size[1] < 50:
+            return
+        self._size = size
+        self._layout(*size)
+        if self._last is not None:
+            self.update(*self._last)
+
+    def _xs(self, history_len, x0, x1):
+        key = (history_len, x0, x1)
+        xs = self._xcache.get(key)
+        if xs is None:
+            # Same x mapping as the matplotlib view: sample i at i / history_len of the lane
+            xs = x0 + np.arange(history_len, dtype=np.float64) * ((x1 - x0) / max(1, history_len))
+            self._xcache[key] = xs
+        return xs
+
+    # ---- drawing ----
+    def update(self, series, history_len):
+        self._last = (series, history_len)
+        if self._lanes is None:
+            return  # not mapped yet; <Configure> will draw
+        c = self.widget
+        for i, data in enumerate(series):
+            line = self._lines[i]
+            n = min(len(data), history_len)
+            if n < 2:
+                c.itemconfig(line, state="hidden")
+                continue
+            ys = _as_array(data)[-n:]
+            x0, y0, x1, y1 = self._lanes[i]
+
+            lim = GROUP_YLIM[self.channels[i][2]]
+            if lim is None:
+                vis = ys[-max(2, int(n * PPG_WINDOW_FRACTION)):]
+                lim = self._ylim[i] = _smooth(self._ylim[i], ppg_target_ylim(vis))
+            lo, hi = lim
+            span = (hi - lo) or 1.0
+
+            pts = np.empty(2 * n, dtype=np.float64)
+            pts[0::2] = self._xs(history_len, x0, x1)[:n]
+            pts[1::2] = np.clip(y1 - (ys - lo) * ((y1 - y0) / span), y0, y1)
+            c.coords(line, pts.tolist())
+            c.itemconfig(line, state="normal")
+
+    def destroy(self):
+        try:
+            self.widget.destroy()
+        except Exception:
+            pass
+
+
+# ===================== matplotlib (Agg) =====================
+class MplPlotBackend:
+    name = "matplotlib"
+
+    def __init__(self, master, Figure, FigureCanvasTkAgg, chans=CHANNELS):
+        fig = Figure(figsize=(6, 3), dpi=100)
+        fig.subplots_adjust(top=0.95)
+
+        # 2x2 grid (PPG spans bottom row)
+        outer = fig.add_gridspec(
+            2, 2,
+            height_ratios=[1, 1],
+            width_ratios=[1, 1],
+            hspace=0.35,
+            wspace=0.25
+        )
+        acc_gs = outer[0, 0].subgridspec(3, 1, hspace=0.0)
+        gyr_gs = outer[0, 1].subgridspec(3, 1, hspace=0.0)
+        ppg_gs = outer[1, :].subgridspec(3, 1, hspace=0.0)
+
+        self.axes = []
+        for gs in (acc_gs, gyr_gs, ppg_gs):
+            first = fig.add_subplot(gs[0])
+            self.axes += [first,
+                          fig.add_subplot(gs[1], sharex=first),
+                          fig.add_subplot(gs[2], sharex=first)]
+
+        # Keep axis labels, remove tick marks & numbers
+        self.lines = []
+        for ax in self.axes:
+            ax.grid(False)
+            ax.tick_params(left=False, labelleft=False, bottom=False, labelbottom=False)
+            (line,) = ax.plot([], [])
+            self.lines.append(line)
+        self._default_colors = [line.get_color() for line in self.lines]
+
+        self.canvas = FigureCanvasTkAgg(fig, master=master)
+        self.set_channels(chans)  # first paint happens once the tab is mapped
+        self.widget = self.canvas.get_tk_widget()
+
+    def set_channels(self, chans):
+        """Y labels / limits and line colors per lane."""
+        self.channels = list(chans)
+        for ax, line, default, (_key, label, grp, color, lcolor) in zip(
+                self.axes, self.lines, self._default_colors, self.channels):
+            if lcolor:
+                ax.set_ylabel(label, fontsize=7, labelpad=4, color=lcolor)
+            else:
+                ax.set_ylabel(label, fontsize=7, labelpad=4)
+            ax.set_ylim(*(GROUP_YLIM[grp] or (-100, 100)))
+            line.set_color(color if lcolor else default)
+        self.canvas.draw_idle()
+
+    def update(self, series, history_len):
+        for i, (line, data) in enumerate(zip(self.lines, series)):
+            ys = _as_array(data)
+            line.set_data(np.arange(len(ys)), ys)
+
+        # --- x limits (shared within each group) ---
+        for i in (0, 3, 6):
+            n = len(series[i])
+            self.axes[i].set_xlim(max(0, n - history_len), max(history_len, n))
+
+        # --- fixed y-lims for acc & gyro; always autoscale PPG ---
+        for ax, data, (_k, _l, grp, _c, _lc) in zip(self.axes, series, self.channels):
+            lim = GROUP_YLIM[grp]
+            if lim is not None:
+                ax.set_ylim(*lim)
+            elif len(data):
+                ax.set_ylim(*_smooth(ax.get_ylim(), ppg_target_ylim(_as_array(data))))
+
+        self.canvas.draw_idle()
+
+    def destroy(self):
+        try:
+            self.widget.destroy()
+        except Exception:
+            pass
@@ -0,0 +1,161 @@
+# =========================
+# File: modules/spectrogram.py
+# =========================
+"""
+Live spectrogram sub-view for the Sensors tab.
+
+One channel at a time is fed through dsp.stft.StreamingSTFT (subscribed to
+the ImuTab raw streams on its StreamHub). Each new STFT column is written as
+a single 1-px column into a circular tk.PhotoImage; two canvas image items
+showing the same image are shifted so the newest column sits at the right
+edge. Per column that is one PhotoImage.put + two coords() calls — the
+image is never re-plotted.
+"""
+import tkinter as tk
+from tkinter import ttk
+
+import numpy as np
+
+from dsp.stft import StreamingSTFT
+from modules.plots import CHANNELS
+
+STFT_NFFT    = 64     # 6.4 s window @ 10 Hz
+STFT_HOP     = 4      # one column every 0.4 s @ 10 Hz
+SPEC_COLUMNS = 300    # columns kept on screen (~2 min @ 10 Hz / hop 4)
+SPEC_ROW_PX  = 5      # vertical pixels per frequency bin
+SPEC_DB_RANGE = 60.0  # dB shown below the (slowly decaying) peak
+SPEC_PEAK_DECAY = 0.02
+AXIS_W       = 44     # frequency-axis label strip (px)
+
+# Viridis anchors, interpolated to a 256-entry LUT of "{#rrggbb}" row strings
+_CMAP_ANCHORS = [
+    (0.00, (68, 1, 84)), (0.25, (59, 82, 139)), (0.50, (33, 145, 140)),
+    (0.75, (94, 201, 98)), (1.00, (253, 231, 37)),
+]
+
+
+def _build_lut(n=256):
+    pos = np.array([p for p, _c in _CMAP_ANCHORS])
+    rgb = np.array([c for _p, c in _CMAP_ANCHORS], dtype=np.float64)
+    t = np.linspace(0.0, 1.0, n)
+    chans = [np.interp(t, pos, rgb[:, i]).round().astype(int) for i in range(3)]
+    return ["{#%02x%02x%02x}" % (r, g, b) for r, g, b in zip(*chans)]
+
+
+_LUT = _build_lut()
+
+
+class SpectrogramView(ttk.Frame):
+    """sources: channel key -> (stream name, row in block, fs)."""
+
+    def __init__(self, master, hub, sources, nfft=STFT_NFFT, hop=STFT_HOP):
+        super().__init__(master, style="Card.TFrame")
+        self.hub = hub
+        self.sources = sources
+        self.nfft, self.hop = nfft, hop
+        self._token = None
+        self._stft = None
+
+        labels = {k: lbl for k, lbl, *_ in CHANNELS}
+        self._keys = [k for k, *_ in CHANNELS if k in sources]
+        self._names = [labels[k] for k in self._keys]
+
+        top = ttk.Frame(self, style="Card.TFrame"); top.pack(fill="x")
+        ttk.Label(top, text="Channel:", style="Lbl.TLabel").pack(side="left")
+        self.channel_var = tk.StringVar(value=self._names[-3] if len(self._names) >= 3 else self._names[0])
+        cb = ttk.Combobox(top, textvariable=self.channel_var, values=self._names,
+                          state="readonly", width=8)
+        cb.pack(side="left", padx=(6, 0))
+        cb.bind("<<ComboboxSelected>>", lambda e: self._select(self._key()))
+        self.peak_lbl = ttk.Label(top, text="Peak: -- Hz", style="Lbl.TLabel")
+        self.peak_lbl.pack(side="left", padx=(12, 0))
+
+        body = ttk.Frame(self, style="Card.TFrame"); body.pack(fill="both", expand=True, pady=(6, 0))
+        self.height = (nfft // 2 + 1) * SPEC_ROW_PX
+        self.axis = tk.Canvas(body, width=AXIS_W, height=self.height, bg="#ffffff",
+                              highlightthickness=0, bd=0)
+        self.axis.pack(side="left", fill="y")
+        self.canvas = tk.Canvas(body, width=SPEC_COLUMNS, height=self.height, bg="#000000",
+                                highlightthickness=0, bd=0)
+        self.canvas.pack(side="left")
+
+        self.image = tk.PhotoImage(width=SPEC_COLUMNS, height=self.height)
+        self._items = (self.canvas.create_image(0, 0, image=self.image, anchor="nw"),
+                       self.canvas.create_image(0, 0, image=self.image, anchor="nw"))
+        self._select(self._key())
+
+    def _key(self):
+        name = self.channel_var.get()
+        return self._keys[self._names.index(name)] if name in self._names else self._keys[0]
+
+    # ---- lifecycle ----
+    def start(self):
+        """Subscribe to the selected channel's stream (no STFT work while stopped)."""
+        if self._token is None:
+            stream = self.sources[self._cur][0]
+            self._token = self.hub.subscribe(stream, self._on_block)
+
+    def stop(self):
+        if self._token is not None:
+            self.hub.unsubscribe(self._token)
+            self._token = None
+
+    def reset(self):
+        if self._stft is not None:
+            self._stft.reset()
+        self.image.blank()
+        self._col = 0
+        self._peak_db = None
+        self._place()
+        self.peak_lbl.config(text="Peak: -- Hz")
+
+    def _select(self, key):
+        running = self._token is not None
+        self.stop()
+        self._cur = key
+        _stream, self._row, fs = self.sources[key]
+        self._stft = StreamingSTFT(self.nfft, self.hop, fs)
+        self._draw_axis(fs)
+        self.reset()
+        if running:
+            self.start()
+
+    def _draw_axis(self, fs):
+        a = self.axis
+        a.delete("all")
+        nyq = fs / 2.0
+        for frac in (0.0, 0.25, 0.5, 0.75, 1.0):
+            y = (1.0 - frac) * (self.height - 1)
+            a.create_line(AXIS_W - 4, y, AXIS_W, y, fill="#9ca3af")
+            a.create_text(AXIS_W - 6, min(max(y, 6), self.height - 6), text=f"{frac * nyq:g} Hz",
+                          anchor="e", font=("Segoe UI", 7))
+
+    # ---- data path ----
+    def _on_block(self, block):
+        self._stft.process(block[self._row], self._append_column)
+
+    def _append_column(self, col_db):
+        top = float(col_db[1:].max())   # skip DC (frames are mean-removed)
+        if self._peak_db is None or top > self._peak_db:
+            self._peak_db = top
+        else:
+            self._peak_db += SPEC_PEAK_DECAY * (top - self._peak_db)
+        lo = self._peak_db - SPEC_DB_RANGE
+        idx = np.clip((col_db - lo) * (255.0 / SPEC_DB_RANGE), 0, 255).astype(np.intp)
+        rows = np.repeat(idx[::-1], SPEC_ROW_PX)          # high frequencies on top
+        self.image.put(" ".join([_LUT[i] for i in rows]), to=(self._col, 0))
+        self._place()
+        self._col = (self._col + 1) % SPEC_COLUMNS
+
+        k = int(np.argmax(col_db[1:])) + 1
+        self.peak_lbl.config(text=f"Peak: {self._stft.freqs[k]:.2f} Hz")
+
+    def _place(self):
+        """Shift the two image copies so column self._col lands at the right edge."""
+        right = SPEC_COLUMNS - 1 - self._col
+        self.canvas.coords(self._items[0], right, 0)
+        self.canvas.coords(self._items[1], right - SPEC_COLUMNS, 0)
+
+    def destroy(self):
+        self.stop()
+        return super().destroy()
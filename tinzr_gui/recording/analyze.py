@@ -0,0 +1,156 @@
+# =========================
+# File: recording/analyze.py
+# =========================
+"""
+Offline batch analysis of recorded sessions.
+
+Works on both firmware SD logs (LOG#####.CSV from sd_start/sd_append) and
+host recordings (REC_*.CSV from recording.recorder), which share the
+`millis,source,vals` layout (parsed by recording.sdlog). Each file is summarized independently, so a
+directory of thousands of files is spread over a ProcessPoolExecutor and
+scales with the number of cores.
+
+Per-session summary (SUMMARY_COLUMNS):
+  duration, sample counts / rates, loss rate (gaps in the millis clock vs the
+  median interval), HR and SpO2 (recorded HR/SPO2 lines if present, else
+  recomputed from the PPG samples), battery start/end and slope (V/h).
+"""
+import csv
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from dsp.heart_rate import HeartRateEstimator
+from dsp.spo2 import SpO2Estimator
+from recording.sdlog import plain, read_sdlog
+
+LOG_PATTERNS     = ("*.CSV", "*.csv")
+ANALYZED_SOURCES = ("IMU", "PPG", "HR", "SPO2", "BAT")
+GAP_FACTOR       = 1.5        # interval > 1.5× median counts as lost samples
+
+SUMMARY_COLUMNS = (
+    "file", "duration_s", "imu_n", "imu_hz", "ppg_n", "ppg_hz", "loss_pct",
+    "hr_bpm", "spo2_pct", "bat_start_v", "bat_end_v", "bat_slope_v_h", "error",
+)
+
+
+def find_logs(paths):
+    """Expand files / directories (recursively) into a sorted list of CSV logs."""
+    out = []
+    for p in paths:
+        if os.path.isdir(p):
+            for pat in LOG_PATTERNS:
+                out += glob.glob(os.path.join(p, "**", pat), recursive=True)
+        else:
+            out.append(p)
+    return sorted(set(out))
+
+
+def _read_sources(path):
+    """{source: (millis (N,), values (N, k))} for the sources the summary uses."""
+    logs = read_sdlog(path, sources=ANALYZED_SOURCES)
+    return {src: (rec["millis"], plain(rec)[:, 1:]) for src, rec in logs.items()}
+
+
+def rate_and_loss(t):
+    """(sample rate Hz, lost samples) from a millis clock."""
+    if t.size < 3:
+        return None, 0
+    d = np.diff(t)
+    d = d[d > 0]
+    if d.size == 0:
+        return None, 0
+    med = float(np.median(d))
+    gaps = d[d > GAP_FACTOR * med]
+    lost = int(np.sum(np.round(gaps / med) - 1))
+    return 1000.0 / med, lost
+
+
+def summarize_file(path):
+    """One SUMMARY_COLUMNS dict for one log; errors are reported in the row."""
+    row = dict.fromkeys(SUMMARY_COLUMNS)
+    row["file"] = path
+    try:
+        _summarize(_read_sources(path), row)
+    except Exception as e:   # one bad file must not sink a batch of thousands
+        row["error"] = f"{type(e).__name__}: {e}"
+    return row
+
+
+def _summarize(src, row):
+    t_all = [t for t, _v in src.values() if t.size]
+    if t_all:
+        row["duration_s"] = (max(t[-1] for t in t_all) - min(t[0] for t in t_all)) / 1000.0
+
+    n_tot, lost_tot = 0, 0
+    for name, key in (("IMU", "imu"), ("PPG", "ppg")):
+        t, _v = src.get(name, (np.empty(0), None))
+        hz, lost = rate_and_loss(t)
+        row[f"{key}_n"] = int(t.size)
+        row[f"{key}_hz"] = hz
+        n_tot += t.size
+        lost_tot += lost
+    if n_tot:
+        row["loss_pct"] = 100.0 * lost_tot / (n_tot + lost_tot)
+
+    # HR / SpO2: prefer what was recorded live, else recompute from PPG
+    if "HR" in src and src["HR"][1].size:
+        row["hr_bpm"] = float(np.mean(src["HR"][1][:, 0]))
+    if "SPO2" in src and src["SPO2"][1].size:
+        row["spo2_pct"] = float(np.mean(src["SPO2"][1][:, 0]))
+    if (row["hr_bpm"] is None or row["spo2_pct"] is None) and row["ppg_hz"]:
+        ir, red = src["PPG"][1][:, 0], src["PPG"][1][:, 1]
+        hr = HeartRateEstimator(row["ppg_hz"])
+        beats = hr.process(ir)
+        if beats and row["hr_bpm"] is None:
+            row["hr_bpm"] = float(np.mean([b[1] for b in beats]))
+        if row["spo2_pct"] is None:
+            est = [w[1] for w in SpO2Estimator(row["ppg_hz"]).process(ir, red, beats) if w[1] is not None]
+            if est:
+                row["spo2_pct"] = float(est[-1])
+
+    if "BAT" in src and src["BAT"][1].size:
+        t, v = src["BAT"][0] / 3.6e6, src["BAT"][1][:, 0]   # hours, volts
+        row["bat_start_v"], row["bat_end_v"] = float(v[0]), float(v[-1])
+        if v.size >= 2 and t[-1] > t[0]:
+            row["bat_slope_v_h"] = float(np.polyfit(t, v, 1)[0])
+
+
+def analyze(paths, workers=None):
+    """Summaries for every log under `paths`, computed on a process pool (input order kept)."""
+    files = find_logs(paths)
+    if not files:
+        return []
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(files) == 1:
+        return [summarize_file(p) for p in files]
+    # Small files: hand each worker several at a time to amortize the IPC
+    chunk = max(1, len(files) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        return list(ex.map(summarize_file, files, chunksize=chunk))
+
+
+def _fmt(v):
+    if v is None:
+        return "-"
+    if isinstance(v, float):
+        return f"{v:.3f}"
+    return str(v)
+
+
+def format_table(rows, columns=SUMMARY_COLUMNS):
+    cells = [[os.path.basename(r["file"]) if c == "file" else _fmt(r[c]) for c in columns] for r in rows]
+    widths = [max([len(c)] + [len(row[i]) for row in cells]) for i, c in enumerate(columns)]
+    lines = ["  ".join(c.ljust(w) for c, w in zip(columns, widths)).rstrip()]
+    lines += ["  ".join(v.ljust(w) for v, w in zip(row, widths)).rstrip() for row in cells]
+    return "\n".join(lines)
+
+
+def write_csv(rows, path, columns=SUMMARY_COLUMNS):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(columns)
+        for r in rows:
+            w.writerow(["" if r[c] is None else r[c] for c in columns])
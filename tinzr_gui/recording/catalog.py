@@ -0,0 +1,287 @@
+# =========================
+# File: recording/catalog.py
+# =========================
+"""
+SQLite catalog of recorded / imported sessions.
+
+One row per session file (device address, wall-clock time range, duration,
+loss rate) plus one row per (source, field) with n / min / max / mean, so
+questions like "sessions from device X with HR above 100" are an indexed
+query instead of opening every file:
+
+    cat = Catalog()
+    cat.scan("/media/SD")                                   # SD logs, incremental
+    cat.find(device="AA:BB:..", conditions=[("HR", "bpm", "max", ">", 100)])
+
+Files are (re)indexed only when their size or mtime changed. Recorder closes
+are hooked with attach_recorder(), which indexes the new file on a worker
+thread (each call opens its own connection, so that is safe).
+
+    python -m recording.catalog scan DIR... | find [--device A] [--where HR.bpm.max>100]
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from recording.analyze import find_logs, rate_and_loss
+from recording.recorder import RECORDINGS_DIR
+from recording.sdlog import plain, read_sdlog
+
+CATALOG_PATH = os.environ.get("TINZR_CATALOG", os.path.join(RECORDINGS_DIR, "catalog.sqlite"))
+LOSS_SOURCES = ("IMU", "PPG")
+STATS = ("min", "max", "mean")
+OPS = ("<", "<=", ">", ">=", "=")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id          INTEGER PRIMARY KEY,
+    path        TEXT UNIQUE NOT NULL,
+    device      TEXT,
+    started_at  REAL,          -- unix time
+    ended_at    REAL,
+    duration_s  REAL,
+    loss_pct    REAL,
+    size        INTEGER,
+    mtime       REAL,
+    indexed_at  REAL
+);
+CREATE TABLE IF NOT EXISTS channels (
+    session_id  INTEGER NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    source      TEXT NOT NULL,
+    field       TEXT NOT NULL,
+    n           INTEGER,
+    min         REAL,
+    max         REAL,
+    mean        REAL,
+    PRIMARY KEY (session_id, source, field)
+);
+CREATE INDEX IF NOT EXISTS sessions_device ON sessions(device, started_at);
+CREATE INDEX IF NOT EXISTS sessions_time   ON sessions(started_at);
+CREATE INDEX IF NOT EXISTS channels_field  ON channels(source, field, mean);
+"""
+
+_REC_NAME = re.compile(r"REC_(\d{8}_\d{6})")
+
+
+def _started_at(path, duration_s):
+    """Wall-clock start: from a REC_YYYYmmdd_HHMMSS name, else mtime − duration."""
+    m = _REC_NAME.search(os.path.basename(path))
+    if m:
+        try:
+            return time.mktime(time.strptime(m.group(1), "%Y%m%d_%H%M%S"))
+        except ValueError:
+            pass
+    return os.path.getmtime(path) - (duration_s or 0.0)
+
+
+def session_summary(path):
+    """(session dict, [(source, field, n, min, max, mean)]) for one log."""
+    logs = read_sdlog(path)
+    chans = []
+    t0, t1 = None, None
+    n_tot, lost_tot = 0, 0
+    for src, rec in sorted(logs.items()):
+        if rec.size == 0:
+            continue
+        block = plain(rec)
+        t = block[:, 0]
+        t0 = t[0] if t0 is None else min(t0, t[0])
+        t1 = t[-1] if t1 is None else max(t1, t[-1])
+        for name, col in zip(rec.dtype.names[1:], block[:, 1:].T):
+            chans.append((src, name, int(col.size), float(col.min()), float(col.max()), float(col.mean())))
+        if src in LOSS_SOURCES:
+            _hz, lost = rate_and_loss(t)
+            n_tot += t.size
+            lost_tot += lost
+    duration = (t1 - t0) / 1000.0 if t0 is not None else 0.0
+    start = _started_at(path, duration)
+    st = os.stat(path)
+    sess = {
+        "path": os.path.abspath(path),
+        "started_at": start,
+        "ended_at": start + duration,
+        "duration_s": duration,
+        "loss_pct": 100.0 * lost_tot / (n_tot + lost_tot) if n_tot else None,
+        "size": st.st_size,
+        "mtime": st.st_mtime,
+    }
+    return sess, chans
+
+
+class Catalog:
+    def __init__(self, path=CATALOG_PATH):
+        self.path = path
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        db = self._connect()
+        try:
+            db.executescript(_SCHEMA)
+        finally:
+            db.close()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10.0)
+        db.execute("PRAGMA foreign_keys = ON")
+        db.row_factory = sqlite3.Row
+        return db
+
+    # ---- indexing ----
+    def is_current(self, path):
+        """True if `path` is indexed and unchanged (same size and mtime)."""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        db = self._connect()
+        try:
+            row = db.execute("SELECT size, mtime FROM sessions WHERE path = ?", (path,)).fetchone()
+        finally:
+            db.close()
+        return row is not None and row["size"] == st.st_size and row["mtime"] == st.st_mtime
+
+    def add(self, path, device=None):
+        """(Re)index one session file; keeps a previously known device if none is given."""
+        sess, chans = session_summary(path)
+        db = self._connect()
+        try:
+            with db:
+                old = db.execute("SELECT id, device FROM sessions WHERE path = ?", (sess["path"],)).fetchone()
+                dev = device if device is not None else (old["device"] if old else None)
+                if old:
+                    db.execute("DELETE FROM sessions WHERE id = ?", (old["id"],))
+                cur = db.execute(
+                    "INSERT INTO sessions (path, device, started_at, ended_at, duration_s, loss_pct,"
+                    " size, mtime, indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (sess["path"], dev, sess["started_at"], sess["ended_at"], sess["duration_s"],
+                     sess["loss_pct"], sess["size"], sess["mtime"], time.time()))
+                sid = cur.lastrowid
+                db.executemany("INSERT INTO channels VALUES (?, ?, ?, ?, ?, ?, ?)",
+                               [(sid,) + c for c in chans])
+            return sid
+        finally:
+            db.close()
+
+    def scan(self, paths, device=None):
+        """Index every log under `paths` that is new or changed; returns (added, skipped, errors)."""
+        added, skipped, errors = 0, 0, []
+        for p in find_logs([paths] if isinstance(paths, str) else paths):
+            try:
+                if self.is_current(p):
+                    skipped += 1
+                    continue
+                self.add(p, device)
+                added += 1
+            except (OSError, ValueError, sqlite3.Error) as e:
+                errors.append((p, str(e)))
+        return added, skipped, errors
+
+    def remove_missing(self):
+        """Drop sessions whose file no longer exists."""
+        db = self._connect()
+        try:
+            with db:
+                gone = [r["id"] for r in db.execute("SELECT id, path FROM sessions")
+                        if not os.path.exists(r["path"])]
+                db.executemany("DELETE FROM sessions WHERE id = ?", [(i,) for i in gone])
+            return len(gone)
+        finally:
+            db.close()
+
+    def attach_recorder(self, recorder):
+        """Index each recording when it closes (background thread, Tk stays responsive)."""
+        def on_close(rec):
+            path, device = rec.path, rec.device
+            def work():
+                try:
+                    self.add(path, device)
+                except Exception as e:
+                    print(f"catalog: indexing {path} failed: {e}")
+            threading.Thread(target=work, name="catalog-index", daemon=True).start()
+        recorder.on_close.append(on_close)
+
+    # ---- queries ----
+    def find(self, device=None, since=None, until=None, conditions=(), limit=None):
+        """
+        Sessions (newest first) matching all filters. conditions are
+        (source, field, stat, op, value), e.g. ("HR", "bpm", "max", ">", 100).
+        """
+        sql = ["SELECT * FROM sessions s WHERE 1 = 1"]
+        args = []
+        if device is not None:
+            sql.append("AND s.device = ?"); args.append(device)
+        if since is not None:
+            sql.append("AND s.ended_at >= ?"); args.append(since)
+        if until is not None:
+            sql.append("AND s.started_at <= ?"); args.append(until)
+        for source, field, stat, op, value in conditions:
+            if stat not in STATS or op not in OPS:
+                raise ValueError(f"bad condition {(source, field, stat, op, value)!r}")
+            sql.append(f"AND EXISTS (SELECT 1 FROM channels c WHERE c.session_id = s.id"
+                       f" AND c.source = ? AND c.field = ? AND c.{stat} {op} ?)")
+            args += [source, field, value]
+        sql.append("ORDER BY s.started_at DESC")
+        if limit is not None:
+            sql.append("LIMIT ?"); args.append(int(limit))
+        db = self._connect()
+        try:
+            return [dict(r) for r in db.execute(" ".join(sql), args)]
+        finally:
+            db.close()
+
+    def channels(self, session_id):
+        db = self._connect()
+        try:
+            return [dict(r) for r in db.execute(
+                "SELECT source, field, n, min, max, mean FROM channels WHERE session_id = ?"
+                " ORDER BY source, field", (session_id,))]
+        finally:
+            db.close()
+
+
+# ===================== CLI =====================
+_WHERE = re.compile(r"^(\w+)\.(\w+)\.(min|max|mean)(<=|>=|<|>|=)(-?[\d.]+)$")
+
+
+def _parse_where(text):
+    m = _WHERE.match(text.replace(" ", ""))
+    if not m:
+        raise ValueError(f"expected SOURCE.field.stat<op>value, got {text!r}")
+    src, field, stat, op, val = m.groups()
+    return src, field, stat, op, float(val)
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    ap = argparse.ArgumentParser(description="TinZr session catalog")
+    ap.add_argument("--db", default=CATALOG_PATH)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sp = sub.add_parser("scan", help="index new / changed logs")
+    sp.add_argument("paths", nargs="+")
+    sp.add_argument("--device", help="device address for these files (SD card imports)")
+    fp = sub.add_parser("find", help="query sessions")
+    fp.add_argument("--device")
+    fp.add_argument("--where", action="append", default=[], help="e.g. HR.bpm.max>100")
+    args = ap.parse_args()
+
+    cat = Catalog(args.db)
+    if args.cmd == "scan":
+        t0 = time.perf_counter()
+        added, skipped, errors = cat.scan(args.paths, args.device)
+        for p, e in errors:
+            print(f"{p}: {e}", file=sys.stderr)
+        print(f"{added} indexed, {skipped} unchanged, {len(errors)} failed in {time.perf_counter() - t0:.2f} s")
+        sys.exit(1 if errors else 0)
+    try:
+        conds = [_parse_where(w) for w in args.where]
+    except ValueError as e:
+        ap.error(str(e))
+    t0 = time.perf_counter()
+    rows = cat.find(device=args.device, conditions=conds)
+    for r in rows:
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(r["started_at"]))
+        loss = "-" if r["loss_pct"] is None else f"{r['loss_pct']:.1f}%"
+        print(f"{when}  {r['duration_s']:8.1f} s  loss {loss:>6}  {r['device'] or '-':17}  {r['path']}")
+    print(f"{len(rows)} session(s) in {(time.perf_counter() - t0) * 1000:.1f} ms", file=sys.stderr)
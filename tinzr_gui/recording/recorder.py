@@ -0,0 +1,132 @@
+# =========================
+# File: recording/recorder.py
+# =========================
+"""
+Host-side session recorder.
+
+Writes the same CSV layout as the firmware SD logger (sd_start/sd_append),
+so one reader handles both:
+
+    millis,source,vals
+    1234,IMU,IMU,0.012,-0.004,9.81,0.10,-0.20,0.00,24.50
+    1250,PPG,PPG,51234,40211,1203
+    2101,HR,HR,72.4,0.829
+    3000,ACT,ACT,1.021,35.2,17,2,20
+
+`millis` is milliseconds since the recording started. Derived streams
+(HR, ACT, …) are written as their own source next to the raw lines.
+
+A sparse time index goes to a sidecar (REC_x.IDX, see recording.timeindex):
+every INDEX_INTERVAL_S the millis, byte offset and per-source sample counts
+of the next line, so readers can seek without scanning.
+"""
+import os
+import time
+
+RECORDINGS_DIR   = os.environ.get("TINZR_RECORDINGS_DIR",
+                                  os.path.join(os.path.expanduser("~"), "TinZr", "recordings"))
+CSV_HEADER       = "millis,source,vals"
+FLUSH_INTERVAL_S = 1.0   # same cadence as the firmware's SD flush
+INDEX_INTERVAL_S = 5.0   # time-index granularity
+INDEX_HEADER     = "millis,offset,counts"
+
+
+def index_path(path):
+    """Sidecar time-index path for a log (REC_x.CSV → REC_x.IDX)."""
+    return os.path.splitext(path)[0] + ".IDX"
+
+
+def format_index_entry(millis, offset, counts):
+    return f"{int(millis)},{int(offset)}," + ";".join(f"{k}={v}" for k, v in counts.items())
+
+
+class Recorder:
+    def __init__(self, directory=RECORDINGS_DIR):
+        self.directory = directory
+        self.path = None
+        self.device = None
+        self._f = None
+        self._idx = None
+        self._t0 = 0.0
+        self._last_flush = 0.0
+        self.on_close = []   # callables(recorder) run after a recording is closed
+
+    @property
+    def active(self) -> bool:
+        return self._f is not None
+
+    def start(self, device=None):
+        """Open a new REC_YYYYmmdd_HHMMSS.CSV; returns its path."""
+        if self.active:
+            return self.path
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(self.directory, f"REC_{stamp}.CSV")
+        n = 1
+        while os.path.exists(path):
+            path = os.path.join(self.directory, f"REC_{stamp}_{n}.CSV"); n += 1
+        self._f = open(path, "w", encoding="utf-8", newline="\n")
+        self._f.write(CSV_HEADER + "\n")
+        self._bytes = len(CSV_HEADER) + 1
+        self._counts = {}
+        self._next_index_ms = 0
+        self._index_ms = 0
+        try:
+            self._idx = open(index_path(path), "w", encoding="ascii", newline="\n")
+            self._idx.write(INDEX_HEADER + "\n")
+        except OSError:
+            self._idx = None   # the log still works without an index (readers rebuild it)
+        self.path = path
+        self.device = device
+        self._t0 = self._last_flush = time.monotonic()
+        return path
+
+    def millis(self) -> int:
+        """Milliseconds since the recording started (0 when not recording)."""
+        return int((time.monotonic() - self._t0) * 1000) if self._f is not None else 0
+
+    def write(self, source: str, line: str, ms=None):
+        """Append one stream line (e.g. source="IMU", line="IMU,ax,...").
+
+        `ms` dates a sample that was batched before being written (default:
+        now). It is kept at or after the last index entry, so seeking never
+        skips it.
+        """
+        if self._f is None:
+            return
+        now = time.monotonic()
+        if ms is None:
+            ms = int((now - self._t0) * 1000)
+        else:
+            ms = max(int(ms), self._index_ms)
+        text = f"{ms},{source},{line}\n"
+        if ms >= self._next_index_ms and self._idx is not None:
+            self._idx.write(format_index_entry(ms, self._bytes, self._counts) + "\n")
+            self._index_ms = ms
+            step = int(INDEX_INTERVAL_S * 1000)
+            self._next_index_ms = (ms // step + 1) * step
+        self._f.write(text)
+        self._bytes += len(text) if text.isascii() else len(text.encode("utf-8"))
+        self._counts[source] = self._counts.get(source, 0) + 1
+        if now - self._last_flush > FLUSH_INTERVAL_S:
+            self._last_flush = now
+            self._f.flush()
+            if self._idx is not None:
+                self._idx.flush()
+
+    def stop(self):
+        if self._f is None:
+            return None
+        try:
+            self._f.close()
+            if self._idx is not None:
+                self._idx.close()
+        finally:
+            self._f = None
+            self._idx = None
+        for cb in list(self.on_close):
+            try:
+                cb(self)
+            except Exception as e:
+                print(f"recorder on_close error: {e}")
+        return self.path
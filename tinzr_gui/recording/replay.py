@@ -0,0 +1,58 @@
+# =========================
+# File: recording/replay.py
+# =========================
+"""
+Replay source over a recorded session (REC_*.CSV or firmware LOG*.CSV).
+
+Holds a play cursor in log millis. seek() is O(log n) through the time
+index; window() returns the samples just before the cursor (to refill the
+live plots when scrubbing) and advance() returns the samples the cursor
+passed over, so playback feeds the same handlers as live BLE data. Only the
+bytes of the requested window are ever read.
+"""
+from recording.timeindex import RecordingReader
+
+REPLAY_SOURCES = ("IMU", "PPG")
+
+
+class ReplaySource:
+    def __init__(self, path, sources=REPLAY_SOURCES):
+        self.reader = RecordingReader(path)
+        self.sources = sources
+        self.t = self.reader.t_start
+        self.speed = 1.0
+
+    @property
+    def path(self):
+        return self.reader.path
+
+    @property
+    def t_start(self):
+        return self.reader.t_start
+
+    @property
+    def t_end(self):
+        return self.reader.t_end
+
+    @property
+    def at_end(self):
+        return self.t >= self.t_end
+
+    def seek(self, t_ms):
+        self.t = int(min(max(t_ms, self.t_start), self.t_end))
+        return self.t
+
+    def window(self, span_ms):
+        """{source: records} with millis in (t − span, t]."""
+        return self.reader.read_window(self.t - int(span_ms) + 1, self.t, self.sources)
+
+    def advance(self, dt_ms):
+        """Move the cursor by dt_ms × speed; returns the samples passed over."""
+        step = max(1, int(round(dt_ms * self.speed)))
+        t0, self.t = self.t, min(self.t + step, self.t_end)
+        if self.t <= t0:
+            return {}
+        return self.reader.read_window(t0 + 1, self.t, self.sources)
+
+    def close(self):
+        self.reader.close()
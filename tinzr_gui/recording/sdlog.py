@@ -0,0 +1,180 @@
+# =========================
+# File: recording/sdlog.py
+# =========================
+"""
+Fast reader for `millis,source,vals` logs (firmware SD LOG#####.CSV and host
+REC_*.CSV), splitting the interleaved sources into per-source NumPy arrays:
+
+    1234,IMU,IMU,0.012,-0.004,9.81,0.10,-0.20,0.00,24.50
+    1250,PPG,PPG,51234,40211,1203
+ →  {"IMU": rec[millis, ax, ay, az, gx, gy, gz, temp], "PPG": rec[millis, ir, red, green], ...}
+
+The file is mmap'ed and walked in CHUNK_BYTES pieces cut at a newline.
+Tokenizing is done on the raw bytes with NumPy (newline/comma positions,
+searchsorted for each line's fields), the source tag is keyed by the 4
+bytes after the first comma, and each source's numbers in a chunk are
+parsed by one np.fromstring(sep=",") call — no per-line Python work on the
+fast path. Working memory is bounded by the chunk size; iter_chunks() lets
+consumers (replay, analysis) stream without holding the whole log.
+
+Result arrays are float64 structured arrays (zero-copy views), so both
+arr["ir"] and the plain 2-D block (plain(arr)) are available.
+"""
+import mmap
+import os
+
+import numpy as np
+
+CHUNK_BYTES = 8 << 20
+
+# Field names per source tag (first field is always millis)
+SOURCE_FIELDS = {
+    "IMU":  ("ax", "ay", "az", "gx", "gy", "gz", "temp"),
+    "PPG":  ("ir", "red", "green"),
+    "BAT":  ("volts",),
+    "HR":   ("bpm", "ibi_s"),
+    "SPO2": ("spo2", "sqi", "ratio"),
+    "ACT":  ("vm_g", "enmo_mg", "counts", "steps", "total_steps"),
+    "ORI":  ("roll", "pitch", "yaw"),
+    "ACCF": ("ax", "ay", "az"),
+    "GYRF": ("gx", "gy", "gz"),
+    "PPGF": ("ir", "red", "green"),
+}
+
+_NL, _COMMA, _CR, _ZERO, _NINE = 10, 44, 13, 48, 57
+
+
+def _fields(src, k):
+    names = SOURCE_FIELDS.get(src)
+    if names is None or len(names) != k:
+        names = tuple(f"v{i}" for i in range(k))
+    return ("millis",) + names
+
+
+def concat_ranges(starts, ends):
+    """Concatenated np.arange(s, e) for every (s, e) pair, without a Python loop."""
+    lens = ends - starts
+    total = int(lens.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    offs = np.repeat(starts - np.concatenate(([0], np.cumsum(lens)[:-1])), lens)
+    return np.arange(total, dtype=np.int64) + offs
+
+
+def _parse_slow(buf, s, c1, c3, e):
+    """Per-line fallback for a group that has non-numeric tokens: drop bad lines."""
+    rows = []
+    for a, b, c, d in zip(s.tolist(), c1.tolist(), c3.tolist(), e.tolist()):
+        try:
+            rows.append([float(bytes(buf[a:b]))] + [float(t) for t in bytes(buf[c + 1:d]).split(b",")])
+        except ValueError:
+            continue
+    return np.asarray(rows, dtype=np.float64).reshape(len(rows), -1)
+
+
+def parse_chunk(buf):
+    """
+    Parse one chunk of whole lines (bytes/memoryview/uint8 array).
+    Returns {source: (N, 1 + k) float64 block} in file order per source.
+    """
+    b = np.frombuffer(buf, dtype=np.uint8)
+    if b.size == 0:
+        return {}
+    if b[-1] != _NL:
+        b = np.append(b, np.uint8(_NL))         # unterminated last line
+    ends = np.flatnonzero(b == _NL)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+
+    commas = np.flatnonzero(b == _COMMA)
+    first = np.searchsorted(commas, starts)     # index of each line's first comma
+    ncom = np.searchsorted(commas, ends) - first
+    lead = b[np.minimum(starts, b.size - 1)]
+    ok = (ncom >= 3) & (lead >= _ZERO) & (lead <= _NINE)   # skips header / blank lines
+    if not ok.any():
+        return {}
+    starts, ends, first, ncom = starts[ok], ends[ok], first[ok], ncom[ok]
+    c1, c2, c3 = commas[first], commas[first + 1], commas[first + 2]
+
+    # Group lines by (source tag, column count); the tag is keyed on its first 4 bytes
+    tag_len = np.minimum(c2 - c1 - 1, 4)
+    key = np.zeros(starts.size, dtype=np.uint64)
+    for i in range(4):
+        byte = b[np.minimum(c1 + 1 + i, b.size - 1)].astype(np.uint64)
+        key |= np.where(i < tag_len, byte, 0).astype(np.uint64) << np.uint64(8 * i)
+    key = key << np.uint64(32) | ncom.astype(np.uint64)
+
+    groups = {}
+    for g in np.unique(key):
+        sel = np.flatnonzero(key == g)
+        src = bytes(b[c1[sel[0]] + 1:c2[sel[0]]]).decode("ascii", "replace")
+        if src in groups and groups[src].size >= sel.size:
+            continue                             # odd column count: keep the majority width
+        groups[src] = sel
+
+    out = {}
+    for src, sel in groups.items():
+        k = int(ncom[sel[0]]) - 2                # values after the payload tag
+        s, a, d, e = starts[sel], c1[sel], c3[sel], ends[sel]
+        # Per line: "millis," then "v1,...,vk" + its line terminator, in one gather
+        idx = concat_ranges(np.column_stack((s, d + 1)).ravel(), np.column_stack((a + 1, e + 1)).ravel())
+        text = b[idx]
+        text[(text == _NL) | (text == _CR)] = _COMMA
+        try:
+            vals = np.fromstring(text.tobytes(), dtype=np.float64, sep=",")
+        except ValueError:   # non-numeric token somewhere in the group
+            vals = np.empty(0)
+        if vals.size == sel.size * (k + 1):
+            out[src] = vals.reshape(sel.size, k + 1)
+        else:
+            out[src] = _parse_slow(b, s, a, d, e)
+    return out
+
+
+def iter_chunks(path, chunk_bytes=CHUNK_BYTES):
+    """Yield parse_chunk() results for successive newline-aligned chunks of a log."""
+    size = os.path.getsize(path)
+    if size == 0:
+        return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        pos = 0
+        while pos < size:
+            end = min(pos + chunk_bytes, size)
+            if end < size:
+                cut = mm.rfind(b"\n", pos, end)
+                end = cut + 1 if cut >= pos else (mm.find(b"\n", end) + 1 or size)
+            view = memoryview(mm)[pos:end]
+            try:
+                yield parse_chunk(view)
+            finally:
+                view.release()
+            pos = end
+
+
+def read_sdlog(path, sources=None, chunk_bytes=CHUNK_BYTES):
+    """
+    Whole log → {source: structured float64 array (millis + SOURCE_FIELDS)}.
+    `sources` limits the output to those tags. A source's column count is
+    fixed by its first chunk; later rows of another width are dropped.
+    """
+    parts = {}
+    for chunk in iter_chunks(path, chunk_bytes):
+        for src, block in chunk.items():
+            if sources is not None and src not in sources:
+                continue
+            lst = parts.setdefault(src, [])
+            if not lst or lst[0].shape[1] == block.shape[1]:
+                lst.append(block)
+    return {src: as_records(src, np.concatenate(lst) if len(lst) > 1 else lst[0])
+            for src, lst in parts.items()}
+
+
+def as_records(src, block):
+    """(N, 1 + k) float64 block → structured view with named fields (no copy)."""
+    block = np.ascontiguousarray(block, dtype=np.float64)
+    names = _fields(src, block.shape[1] - 1)
+    return block.view([(n, np.float64) for n in names]).reshape(-1)
+
+
+def plain(rec):
+    """Structured array from read_sdlog → (N, 1 + k) float64 view (no copy)."""
+    return rec.view(np.float64).reshape(rec.size, -1)
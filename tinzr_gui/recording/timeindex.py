@@ -0,0 +1,208 @@
+# =========================
+# File: recording/timeindex.py
+# =========================
+"""
+Sparse time index for `millis,source,vals` logs + windowed random access.
+
+The index is a small sidecar next to the log (REC_x.CSV → REC_x.IDX):
+
+    millis,offset,counts
+    0,19,
+    5003,10762,IMU=50;PPG=50
+    10001,21495,IMU=100;PPG=100;HR=11
+
+Each entry is the first line at or after an INDEX_INTERVAL_S boundary:
+its millis, its byte offset, and how many samples of each stream came
+before it (so array positions are known without scanning). The Recorder
+writes it while recording (recording.recorder); build_index() creates it once for firmware SD
+logs. RecordingReader.read_window(t0, t1) bisects the index (O(log n)),
+mmaps just the bytes between the two bracketing entries and parses them
+with recording.sdlog.parse_chunk.
+"""
+import bisect
+import mmap
+import os
+
+import numpy as np
+
+from recording.recorder import INDEX_HEADER, INDEX_INTERVAL_S, format_index_entry, index_path
+from recording.sdlog import as_records, concat_ranges, parse_chunk
+
+CHUNK_BYTES = 8 << 20
+
+_NL, _COMMA = 10, 44
+
+
+class TimeIndex:
+    def __init__(self, millis=(), offsets=(), counts=()):
+        self.millis = list(millis)
+        self.offsets = list(offsets)
+        self.counts = list(counts)      # per entry: {source: samples before offset}
+
+    def __len__(self):
+        return len(self.millis)
+
+    @classmethod
+    def load(cls, path):
+        idx = cls()
+        with open(path, "r", encoding="ascii", errors="replace") as f:
+            for line in f:
+                parts = line.rstrip("\r\n").split(",", 2)
+                if len(parts) < 2 or not parts[0].isdigit():
+                    continue
+                cnt = {}
+                for kv in (parts[2].split(";") if len(parts) > 2 and parts[2] else ()):
+                    k, _, v = kv.partition("=")
+                    if v.isdigit():
+                        cnt[k] = int(v)
+                idx.millis.append(int(parts[0]))
+                idx.offsets.append(int(parts[1]))
+                idx.counts.append(cnt)
+        return idx
+
+    def save(self, path):
+        with open(path, "w", encoding="ascii", newline="\n") as f:
+            f.write(INDEX_HEADER + "\n")
+            for e in zip(self.millis, self.offsets, self.counts):
+                f.write(format_index_entry(*e) + "\n")
+
+    def span(self, t0, t1, size):
+        """Byte range [lo, hi) that contains every line with t0 <= millis <= t1."""
+        i = bisect.bisect_right(self.millis, t0) - 1
+        lo = self.offsets[i] if i >= 0 else 0
+        j = bisect.bisect_right(self.millis, t1)
+        hi = self.offsets[j] if j < len(self.offsets) else size
+        return lo, hi
+
+    def position(self, t):
+        """{source: approximate sample index} at time t (exact at index entries)."""
+        i = bisect.bisect_right(self.millis, t) - 1
+        return dict(self.counts[i]) if i >= 0 else {}
+
+
+def _line_table(b):
+    """(offsets, millis, tag code per line, tag names) for the data lines of one chunk."""
+    ends = np.flatnonzero(b == _NL)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    commas = np.flatnonzero(b == _COMMA)
+    first = np.searchsorted(commas, starts)
+    lead = b[np.minimum(starts, b.size - 1)]
+    ok = (lead >= 48) & (lead <= 57) & (first + 1 < commas.size)
+    ok[ok] &= commas[np.minimum(first[ok] + 1, commas.size - 1)] < ends[ok]
+    starts, first = starts[ok], first[ok]
+    if starts.size == 0:
+        return starts, np.empty(0), np.empty(0, dtype=np.int64), []
+    c1, c2 = commas[first], commas[first + 1]
+    ms = np.fromstring(b[concat_ranges(starts, c1 + 1)].tobytes(), dtype=np.float64, sep=",")
+
+    # Tag per line: group on the first 4 tag bytes, decode once per group
+    key = np.zeros(starts.size, dtype=np.uint64)
+    tag_len = np.minimum(c2 - c1 - 1, 4)
+    for i in range(4):
+        byte = b[np.minimum(c1 + 1 + i, b.size - 1)].astype(np.uint64)
+        key |= np.where(i < tag_len, byte, 0).astype(np.uint64) << np.uint64(8 * i)
+    _uniq, first_of, codes = np.unique(key, return_index=True, return_inverse=True)
+    names = [bytes(b[c1[k] + 1:c2[k]]).decode("ascii", "replace") for k in first_of]
+    return starts, ms, codes.reshape(-1), names
+
+
+def build_index(path, interval_s=INDEX_INTERVAL_S, chunk_bytes=CHUNK_BYTES):
+    """Scan a log once (chunked, vectorized) and return its TimeIndex."""
+    idx = TimeIndex()
+    size = os.path.getsize(path)
+    if size == 0:
+        return idx
+    step = interval_s * 1000.0
+    next_t = None
+    counts = {}
+
+    def tally(codes, names):
+        for name, n in zip(names, np.bincount(codes, minlength=len(names)).tolist()):
+            if n:
+                counts[name] = counts.get(name, 0) + n
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        pos = 0
+        while pos < size:
+            end = min(pos + chunk_bytes, size)
+            if end < size:
+                cut = mm.rfind(b"\n", pos, end)
+                end = cut + 1 if cut >= pos else (mm.find(b"\n", end) + 1 or size)
+            b = np.frombuffer(mm[pos:end], dtype=np.uint8)   # one chunk copy, mmap stays closable
+            if b[-1] != _NL:
+                b = np.append(b, np.uint8(_NL))
+            offs, ms, codes, names = _line_table(b)
+            if ms.size:
+                if next_t is None:
+                    next_t = ms[0]
+                # First line of every interval bucket (the cursor only moves forward)
+                bucket = np.floor((ms - next_t) / step)
+                hits = np.flatnonzero((bucket >= 0) & np.concatenate(([True], bucket[1:] != bucket[:-1])))
+                prev = 0
+                for h in hits.tolist():
+                    if ms[h] < next_t:
+                        continue
+                    tally(codes[prev:h], names)
+                    prev = h
+                    idx.millis.append(int(ms[h]))
+                    idx.offsets.append(int(pos + offs[h]))
+                    idx.counts.append(dict(counts))
+                    next_t += step * (np.floor((ms[h] - next_t) / step) + 1)
+                tally(codes[prev:], names)
+            pos = end
+    return idx
+
+
+class RecordingReader:
+    """Random access to a log by time; uses (or builds and caches) its sidecar index."""
+
+    def __init__(self, path):
+        self.path = path
+        self.size = os.path.getsize(path)
+        ipath = index_path(path)
+        if os.path.exists(ipath) and os.path.getmtime(ipath) >= os.path.getmtime(path) - 5.0:
+            self.index = TimeIndex.load(ipath)
+        else:
+            self.index = build_index(path)
+            try:
+                self.index.save(ipath)
+            except OSError:
+                pass   # read-only SD card: keep it in memory
+        self._f = open(path, "rb")
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        self.t_start = self.index.millis[0] if len(self.index) else 0
+        self.t_end = self._last_millis()
+
+    def _last_millis(self):
+        if self._mm is None:
+            return self.t_start
+        tail = self._mm[max(0, self.size - 4096):]
+        for line in reversed(tail.splitlines()):
+            head = line.split(b",", 1)[0]
+            if head.isdigit():
+                return int(head)
+        return self.t_start
+
+    @property
+    def duration_ms(self):
+        return self.t_end - self.t_start
+
+    def read_window(self, t0, t1, sources=None):
+        """{source: structured array} of the samples with t0 <= millis <= t1."""
+        if self._mm is None:
+            return {}
+        lo, hi = self.index.span(t0, t1, self.size)
+        out = {}
+        for src, block in parse_chunk(memoryview(self._mm)[lo:hi]).items():
+            if sources is not None and src not in sources:
+                continue
+            t = block[:, 0]
+            a, b = np.searchsorted(t, t0, "left"), np.searchsorted(t, t1, "right")
+            out[src] = as_records(src, block[a:b])
+        return out
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._f.close()
@@ -0,0 +1,76 @@
+# =========================
+# File: startup.py
+# =========================
+"""
+Startup-time budget helpers.
+
+- timed_import(name): import a module on demand and remember how long it took
+- mark(label):        timestamp a startup phase (shell built, window interactive…)
+- report():           print an `-X importtime`-style table to stderr
+
+Enabled with `python app.py --startup-report` (or TINZR_STARTUP_REPORT=1).
+When disabled, timed_import() is just importlib.import_module().
+"""
+import importlib
+import os
+import sys
+import time
+
+STARTUP_BUDGET_MS = 1000   # cold start → interactive window
+
+_T0 = time.perf_counter()
+_enabled = ("--startup-report" in sys.argv
+            or os.environ.get("TINZR_STARTUP_REPORT", "") not in ("", "0"))
+_imports = []   # (name, self_us, at_ms)
+_marks   = []   # (label, at_ms)
+
+
+def enable(on: bool = True):
+    global _enabled
+    _enabled = bool(on)
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def _now_ms():
+    return (time.perf_counter() - _T0) * 1000.0
+
+
+def timed_import(name: str):
+    """Import (or fetch the already-imported) module `name`, recording first-time cost."""
+    mod = sys.modules.get(name)
+    if mod is not None:
+        return mod
+    t = time.perf_counter()
+    mod = importlib.import_module(name)
+    if _enabled:
+        us = int((time.perf_counter() - t) * 1e6)
+        _imports.append((name, us, _now_ms()))
+        if any(lbl == "interactive" for lbl, _ in _marks):
+            # Late (on-demand) import after the window came up
+            sys.stderr.write(f"startup: lazy import {name}: {us / 1000.0:.1f} ms\n")
+    return mod
+
+
+def mark(label: str):
+    if _enabled:
+        _marks.append((label, _now_ms()))
+
+
+def report(out=None):
+    if not _enabled:
+        return
+    out = out or sys.stderr
+    out.write("import time: self [us] | at [ms] | imported module\n")
+    for name, us, at in _imports:
+        out.write(f"import time: {us:>9} | {at:>7.1f} | {name}\n")
+    out.write("startup phase:            at [ms] | label\n")
+    for label, at in _marks:
+        out.write(f"startup phase:          {at:>7.1f} | {label}\n")
+    ready = next((at for lbl, at in _marks if lbl == "interactive"), None)
+    if ready is not None:
+        verdict = "OK" if ready <= STARTUP_BUDGET_MS else "OVER BUDGET"
+        out.write(f"startup: interactive after {ready:.0f} ms (budget {STARTUP_BUDGET_MS} ms) {verdict}\n")
+    out.flush()
@@ -0,0 +1,38 @@
+# =========================
+# File: tinzr_analyze.py
+# =========================
+"""
+tinzr-analyze: summarize many recordings (firmware LOG#####.CSV or host
+REC_*.CSV) into one table, in parallel on a process pool.
+
+    python tinzr_analyze.py ~/TinZr/recordings /media/SD [--workers 8] [--csv out.csv]
+"""
+import argparse
+import sys
+import time
+
+from recording.analyze import analyze, format_table, write_csv
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="tinzr-analyze", description=__doc__.strip().splitlines()[0])
+    ap.add_argument("paths", nargs="+", help="log files and/or directories (searched recursively)")
+    ap.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: all cores)")
+    ap.add_argument("--csv", metavar="FILE", help="also write the table as CSV")
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    rows = analyze(args.paths, workers=args.workers)
+    if not rows:
+        print("no logs found", file=sys.stderr)
+        return 1
+    print(format_table(rows))
+    if args.csv:
+        write_csv(rows, args.csv)
+    failed = sum(1 for r in rows if r["error"])
+    print(f"\n{len(rows)} file(s), {failed} failed, {time.perf_counter() - t0:.2f} s", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+# =========================
+# File: ui/console.py
+# =========================
+import tkinter as tk
+from tkinter import ttk
+from collections import deque
+
+DEFAULT_CAPACITY  = 5000   # lines kept in the backing ring (oldest dropped)
+DEFAULT_HEIGHT    = 8      # visible rows
+FLUSH_INTERVAL_MS = 16     # ~1 frame; appends are batched into one render
+
+
+class LogConsole(ttk.Frame):
+    """
+    Virtualized log view.
+    - Lines live in a fixed-capacity ring (deque) → memory stays flat.
+    - The Text widget only ever holds the visible rows; scrolling re-renders
+      a window of the ring instead of growing the Tk text index.
+    - append() is cheap: lines are queued and rendered once per frame.
+    - Search (Enter / ▲ ▼) and Pause/Resume of auto-follow.
+    """
+    def __init__(self, master, capacity=DEFAULT_CAPACITY, height=DEFAULT_HEIGHT,
+                 style="Card.TFrame", label_style="Lbl.TLabel", **kw):
+        super().__init__(master, style=style, **kw)
+
+        self._lines   = deque(maxlen=max(1, int(capacity)))
+        self._pending = []
+        self._total   = 0          # lines ever appended (absolute sequence number)
+        self._top_abs = 0          # absolute index of the first visible line
+        self._rows    = max(1, int(height))
+        self._follow  = True       # stick to the newest line
+        self._paused  = False
+        self._flush_job = None
+        self._match_abs = None     # absolute index of current search hit
+
+        # ---- toolbar: search + pause ----
+        bar = ttk.Frame(self, style=style); bar.pack(fill="x")
+        ttk.Label(bar, text="Log", style=label_style).pack(side="left")
+
+        self.pause_btn = ttk.Button(bar, text="Pause", width=7, command=self.toggle_pause)
+        self.pause_btn.pack(side="right")
+        ttk.Button(bar, text="▼", width=2, command=lambda: self.find_next(backwards=False)).pack(side="right", padx=(0, 6))
+        ttk.Button(bar, text="▲", width=2, command=lambda: self.find_next(backwards=True)).pack(side="right")
+        self.search_var = tk.StringVar()
+        ent = ttk.Entry(bar, textvariable=self.search_var, width=18)
+        ent.pack(side="right", padx=(0, 4))
+        ent.bind("<Return>", lambda e: self.find_next(backwards=False))
+        ent.bind("<Shift-Return>", lambda e: self.find_next(backwards=True))
+
+        # ---- view: Text (visible rows only) + scrollbar over the ring ----
+        body = ttk.Frame(self, style=style); body.pack(fill="both", expand=True, pady=(6, 0))
+        self.sb = ttk.Scrollbar(body, orient="vertical", command=self._on_scrollbar)
+        self.sb.pack(side="right", fill="y")
+        self.text = tk.Text(body, height=self._rows, bg="white", wrap="none")
+        self.text.pack(side="left", fill="both", expand=True)
+        self.text.tag_configure("match", background="#fde68a")
+
+        # Read-only, but keep selection/copy working
+        self.text.bind("<Key>", self._block_edits)
+        self.text.bind("<MouseWheel>", self._on_wheel)
+        self.text.bind("<Button-4>", lambda e: self.scroll_lines(-3))
+        self.text.bind("<Button-5>", lambda e: self.scroll_lines(3))
+        self.text.bind("<Configure>", self._on_resize)
+        self.bind("<Destroy>", self._on_destroy, add="+")
+
+        self._render()
+
+    # ---------------- Public API ----------------
+    def append(self, line: str):
+        """Queue one line; rendering happens at most once per frame."""
+        self._pending.append(str(line))
+        if self._flush_job is None:
+            self._flush_job = self.after(FLUSH_INTERVAL_MS, self._flush)
+
+    def clear(self):
+        self._lines.clear(); self._pending.clear()
+        self._top_abs = self._total
+        self._match_abs = None
+        self._render()
+
+    def toggle_pause(self):
+        self.set_paused(not self._paused)
+
+    def set_paused(self, paused: bool):
+        self._paused = bool(paused)
+        self.pause_btn.config(text="Resume" if self._paused else "Pause")
+        if not self._paused:
+            self._follow = True
+            self._render()
+
+    def scroll_lines(self, n: int):
+        self._set_top(self._top_abs + int(n))
+        return "break"
+
+    def find_next(self, backwards=False):
+        """Search the ring for the pattern (case-insensitive), starting after/before the last hit."""
+        pat = self.search_var.get().lower()
+        if not pat or not self._lines:
+            return
+        first = self._first_abs()
+        n = len(self._lines)
+        cur = self._match_abs if self._match_abs is not None else (self._top_abs if backwards else self._top_abs - 1)
+        start = cur - first
+        step = -1 if backwards else 1
+        for k in range(1, n + 1):
+            i = (start + step * k) % n
+            if pat in self._lines[i].lower():
+                self._match_abs = first + i
+                self._follow = False
+                self._set_top(self._match_abs - self._rows // 2)
+                return
+        self._match_abs = None
+        self._render()
+
+    # ---------------- internals ----------------
+    def _first_abs(self):
+        return self._total - len(self._lines)
+
+    def _max_top(self):
+        return max(self._first_abs(), self._total - self._rows)
+
+    def _flush(self):
+        self._flush_job = None
+        if not self._pending:
+            return
+        self._lines.extend(self._pending)
+        self._total += len(self._pending)
+        self._pending.clear()
+        if self._follow and not self._paused:
+            self._top_abs = self._max_top()
+        self._render()
+
+    def _set_top(self, top_abs):
+        self._top_abs = max(self._first_abs(), min(int(top_abs), self._max_top()))
+        # Scrolled back to the bottom → resume following (unless paused)
+        self._follow = self._top_abs >= self._max_top()
+        self._render()
+
+    def _render(self):
+        first = self._first_abs()
+        # Lines may have been dropped from the ring under a paused/scrolled view
+        self._top_abs = max(first, min(self._top_abs, self._max_top()))
+        i0 = self._top_abs - first
+        rows = [self._lines[i] for i in range(i0, min(len(self._lines), i0 + self._rows))]
+
+        t = self.text
+        t.delete("1.0", "end")
+        t.insert("1.0", "\n".join(rows))
+        if self._match_abs is not None and 0 <= self._match_abs - self._top_abs < len(rows):
+            row = self._match_abs - self._top_abs + 1
+            t.tag_add("match", f"{row}.0", f"{row}.end")
+
+        n = len(self._lines)
+        if n:
+            lo = i0 / n
+            hi = min(1.0, (i0 + self._rows) / n)
+            self.sb.set(lo, hi)
+        else:
+            self.sb.set(0.0, 1.0)
+
+    def _on_scrollbar(self, *args):
+        if not args:
+            return
+        if args[0] == "moveto":
+            frac = float(args[1])
+            self._set_top(self._first_abs() + int(round(frac * len(self._lines))))
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if len(args) > 2 and args[2] == "pages":
+                amount *= max(1, self._rows - 1)
+            self.scroll_lines(amount)
+
+    def _on_wheel(self, ev):
+        delta = -1 if ev.delta > 0 else 1
+        return self.scroll_lines(3 * delta)
+
+    def _on_resize(self, _ev=None):
+        try:
+            line_px = max(1, int(self.text.tk.call("font", "metrics", self.text.cget("font"), "-linespace")))
+        except tk.TclError:
+            return
+        rows = max(1, int(self.text.winfo_height()) // line_px)
+        if rows != self._rows:
+            self._rows = rows
+            if self._follow:
+                self._top_abs = self._max_top()
+            self._render()
+
+    @staticmethod
+    def _block_edits(ev):
+        # Allow copy / select-all; swallow everything else
+        if (ev.state & 0x4) and ev.keysym.lower() in ("c", "a"):
+            return None
+        return "break"
+
+    def _on_destroy(self, _e):
+        if self._flush_job is not None:
+            try: self.after_cancel(self._flush_job)
+            except Exception: pass
+            self._flush_job = None
@@ -4,6 +4,7 @@
 from queue import Queue
 import tkinter as tk
 from tkinter import ttk
+from ui.console import LogConsole
 
 SB_BLUE      = "#2563eb"
 SB_BLUE_DARK = "#1d4ed8"
@@ -129,14 +130,14 @@ class AppShell(tk.Tk):
 
         self.nb = ttk.Notebook(nb_frame, height=420)  # limit the tab area height
         self.nb.pack(fill="both", expand=False)
+        self._lazy_tabs = {}  # placeholder path -> (holder, factory)
+        self.nb.bind("<<NotebookTabChanged>>", self._on_tab_changed)
 
 
         # ---- Log panel ----
-        logf = ttk.Frame(self, padding=12, style="Card.TFrame")
-        logf.pack(fill="both", expand=False, padx=12, pady=6)
-        ttk.Label(logf, text="Log", style="Lbl.TLabel").pack(anchor="w")
-        self.txt = tk.Text(logf, height=8, bg="white")
-        self.txt.pack(fill="both", expand=True, pady=(6, 0))
+        # Bounded, virtualized console: memory stays flat on long streaming sessions
+        self.console = LogConsole(self, padding=12)
+        self.console.pack(fill="both", expand=False, padx=12, pady=6)
 
         # ---- BLE events ----
         self.bind("<<BLE:connected>>", self._on_connected_evt)
@@ -165,6 +166,16 @@ class AppShell(tk.Tk):
     def add_tab(self, frame: ttk.Frame, title: str):
         self.nb.add(frame, text=title)
 
+    def add_lazy_tab(self, title: str, factory):
+        """
+        Add an empty placeholder tab; factory(holder) builds the real content
+        (packed into holder) the first time the tab is selected.
+        """
+        holder = ttk.Frame(self.nb, style="Card.TFrame")
+        self.nb.add(holder, text=title)
+        self._lazy_tabs[str(holder)] = (holder, factory)
+        return holder
+
     def set_ble_devices(self, devices):
         self.devices = devices or []
         labels = [f'{d.get("name","(no-name)")} [{d.get("address","?")}]' for d in self.devices]
@@ -202,7 +213,14 @@ class AppShell(tk.Tk):
 
     # ---------------- UI helpers ----------------
     def _append(self, line: str):
-        self.txt.insert("end", line + "\n"); self.txt.see("end")
+        self.console.append(line)
+
+    def _on_tab_changed(self, _evt=None):
+        entry = self._lazy_tabs.pop(self.nb.select(), None)
+        if entry is None: return
+        holder, factory = entry
+        try: factory(holder)
+        except Exception as e: self._append(f"Tab build error: {e}")
 
     def _on_combo_selected(self, _=None):
         idx = self.cbo.current()